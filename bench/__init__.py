@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарки DunSell: именованные сценарии, замер по системам, сравнение с базой.
+
+    python -m bench --out bench.json
+    python -m bench --baseline bench.json --threshold 15
+"""
+from bench.scenarios import Scenario, SCENARIOS, find_scenarios
+from bench.runner import run_scenario, run_all, compare
+
+__all__ = ["Scenario", "SCENARIOS", "find_scenarios", "run_scenario", "run_all", "compare"]
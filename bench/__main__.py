@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import sys
+from bench.scenarios import SCENARIOS, find_scenarios
+from bench.runner import run_all, compare
+
+
+def _print_table(results):
+    for name, res in results["scenarios"].items():
+        print(f"\n{name}  (карта {res['counts']['map'][0]}x{res['counts']['map'][1]}, врагов {res['counts']['enemies']}, "
+              f"частиц {res['counts']['particles']})")
+        for key, st in res["timings"].items():
+            print(f"  {key:<26} mean {st['mean_ms']:8.3f}  p50 {st['p50_ms']:8.3f}  p95 {st['p95_ms']:8.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Бенчмарки DunSell")
+    parser.add_argument("patterns", nargs="*", help="шаблоны имён сценариев, например 'gen/*' или 'stress/*'")
+    parser.add_argument("--list", action="store_true", help="показать сценарии и выйти")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--repeats", type=int, default=5, help="повторов генерации/загрузки карты")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="", help="записать результаты в JSON")
+    parser.add_argument("--baseline", default="", help="JSON с базовыми результатами для сравнения")
+    parser.add_argument("--threshold", type=float, default=15.0, help="допустимый рост, %%")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p95_ms", "max_ms"])
+    parser.add_argument("--min-ms", type=float, default=0.05, help="не сравнивать замеры короче этого")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for sc in SCENARIOS:
+            print(sc.name)
+        return 0
+
+    scenarios = find_scenarios(args.patterns)
+    if not scenarios:
+        print("нет сценариев под шаблоны:", " ".join(args.patterns), file=sys.stderr)
+        return 2
+    results = run_all(scenarios, args.frames, args.warmup, args.repeats, args.seed,
+                      log=lambda msg: print(msg, file=sys.stderr))
+    _print_table(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.metric, args.min_ms)
+        if regressions:
+            print(f"\nРегрессии (> {args.threshold:.0f}% по {args.metric}):")
+            for name, key, was, now, growth in regressions:
+                print(f"  {name} / {key}: {was:.3f} -> {now:.3f} ms (+{growth:.0f}%)")
+            return 1
+        print(f"\nРегрессий нет (порог {args.threshold:.0f}% по {args.metric}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
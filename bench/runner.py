@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import platform
+import time
+import numpy as np
+import pygame
+from config import SIM_DT
+from headless import HeadlessGame, WanderInput
+from mapgen import FloorDraft, generate_new_floor
+from map_io import load_map, apply_map_to_game
+from systems import SIM_SYSTEMS
+from render import RENDER_PASSES
+
+
+def _summary(samples):
+    # Времена в секундах -> сводка в миллисекундах
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "n": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def _time_setup(scenario, base_settings, repeats, seed):
+    # Генерация этажа или загрузка/применение карты, без игрового цикла
+    timings = {}
+    if scenario.map_path:
+        loads, applies = [], []
+        target = HeadlessGame(base_settings, render=False)
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            data = load_map(scenario.map_path)
+            t1 = time.perf_counter()
+            apply_map_to_game(target.game, data)
+            t2 = time.perf_counter()
+            loads.append(t1 - t0)
+            applies.append(t2 - t1)
+        timings["load_map"] = _summary(loads)
+        timings["apply_map_to_game"] = _summary(applies)
+    else:
+        gens = []
+        for i in range(repeats):
+            draft = FloorDraft(base_settings, seed + i)
+            t0 = time.perf_counter()
+            generate_new_floor(draft)
+            gens.append(time.perf_counter() - t0)
+        timings["generate_new_floor"] = _summary(gens)
+    return timings
+
+
+def run_scenario(scenario, frames=300, warmup=60, repeats=5, seed=1):
+    """Прогоняет сценарий и возвращает сводку времён по каждой системе и отрисовке."""
+    settings = {"seed": seed}
+    settings.update(scenario.settings)
+    if scenario.map_path:
+        settings.update(use_custom_map=True, custom_map_path=scenario.map_path)
+
+    runner = HeadlessGame(settings, WanderInput(seed), render=False)
+    g = runner.game
+    timings = _time_setup(scenario, g.settings, repeats, seed)
+
+    samples = {name: [] for name, _ in SIM_SYSTEMS}
+    samples.update((name, []) for name, _ in RENDER_PASSES)
+    samples["frame"] = []
+    restarts = 0
+    clock = time.perf_counter
+    for tick in range(warmup + frames):
+        # Замер не должен обрываться смертью игрока
+        g.player["hp"] = g.player["hp_max"]
+        if scenario.on_tick:
+            scenario.on_tick(g, tick)
+        events, keys, mouse_pos = runner.input(tick, g)
+        inp = (events, keys, mouse_pos)
+        record = tick >= warmup
+        frame_start = clock()
+        for name, system in SIM_SYSTEMS:
+            t0 = clock()
+            system(g, SIM_DT, inp)
+            if record:
+                samples[name].append(clock() - t0)
+        for name, draw in RENDER_PASSES:
+            t0 = clock()
+            draw(g)
+            if record:
+                samples[name].append(clock() - t0)
+        if record:
+            samples["frame"].append(clock() - frame_start)
+        if g.game_over or g.win:
+            restarts += 1
+            g.new_run()
+
+    for name, values in samples.items():
+        timings[name] = _summary(values)
+    return {
+        "settings": {k: v for k, v in settings.items() if k != "custom_map_path"},
+        "map": os.path.basename(scenario.map_path) if scenario.map_path else None,
+        "frames": frames,
+        "restarts": restarts,
+        "counts": {
+            "map": [g.MAP_W, g.MAP_H],
+            "enemies": len(g.enemies),
+            "treasures": len(g.treasures),
+            "projectiles": len(g.projectiles),
+            "particles": len(g.particles),
+            "float_texts": len(g.float_texts),
+        },
+        "timings": timings,
+    }
+
+
+def run_all(scenarios, frames=300, warmup=60, repeats=5, seed=1, log=None):
+    results = {}
+    for sc in scenarios:
+        if log:
+            log(f"{sc.name} ...")
+        results[sc.name] = run_scenario(sc, frames, warmup, repeats, seed)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "frames": frames,
+            "warmup": warmup,
+            "seed": seed,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(baseline, current, threshold=15.0, metric="p50_ms", min_ms=0.05):
+    """Ищет регрессии current относительно baseline.
+
+    Возвращает список (сценарий, замер, было, стало, рост в %) для замеров,
+    выросших больше чем на threshold процентов. Замеры, которых нет в одном
+    из файлов, и совсем короткие (база меньше min_ms) не сравниваются — на
+    них сравнение упирается в шум таймера.
+    """
+    out = []
+    for name, cur in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for key, stats in cur["timings"].items():
+            base_stats = base["timings"].get(key)
+            if not base_stats or metric not in base_stats or metric not in stats:
+                continue
+            was, now = base_stats[metric], stats[metric]
+            if was < min_ms:
+                continue
+            growth = (now - was) / was * 100.0
+            if growth > threshold:
+                out.append((name, key, was, now, growth))
+    return out
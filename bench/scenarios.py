@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import fnmatch
+from config import SIZES, DIFFS
+from systems import add_particles
+
+MAPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maps")
+
+
+class Scenario:
+    """Именованный сценарий замера.
+
+    settings накладываются поверх настроек Game; map_path — готовая карта
+    вместо генерации; on_tick(g, tick) вызывается перед каждым кадром и
+    создаёт дополнительную нагрузку.
+    """
+
+    def __init__(self, name, settings, map_path=None, on_tick=None):
+        self.name = name
+        self.settings = settings
+        self.map_path = map_path
+        self.on_tick = on_tick
+
+    def __repr__(self):
+        return f"Scenario({self.name!r})"
+
+
+def _size_settings(size_name):
+    n, w, h = next(s for s in SIZES if s[0] == size_name)
+    return {"size_name": n, "map_w": w, "map_h": h}
+
+
+def _particle_storm(g, tick):
+    # Держим пул близко к заполнению: залпы вокруг игрока каждый кадр
+    p = g.player["pos"]
+    for i in range(4):
+        add_particles(g, (p.x + (i - 2) * 60, p.y + (tick % 7 - 3) * 30), (255, 200, 120), n=120, speed=160)
+
+
+def _build():
+    out = []
+    for size_name, _, _ in SIZES:
+        for diff in DIFFS:
+            out.append(Scenario(f"gen/{size_name}/{diff}", dict(_size_settings(size_name), difficulty=diff)))
+    if os.path.isdir(MAPS_DIR):
+        for fname in sorted(os.listdir(MAPS_DIR)):
+            if fname.lower().endswith((".json", ".dsm")):
+                out.append(Scenario(f"map/{fname}", {"difficulty": "Нормальная"}, map_path=os.path.join(MAPS_DIR, fname)))
+    out.append(Scenario("stress/enemy_swarm", dict(_size_settings("Большой"), difficulty="Сложная", enemy_mult=6.0)))
+    out.append(Scenario("stress/particle_storm", dict(_size_settings("Средний"), difficulty="Нормальная"),
+                        on_tick=_particle_storm))
+    return out
+
+
+SCENARIOS = _build()
+
+
+def find_scenarios(patterns=None):
+    """Сценарии, имена которых подходят под любой из shell-шаблонов (все, если шаблонов нет)."""
+    if not patterns:
+        return list(SCENARIOS)
+    return [s for s in SCENARIOS if any(fnmatch.fnmatchcase(s.name, p) for p in patterns)]
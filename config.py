@@ -5,6 +5,13 @@ import pygame
 SCREEN_W, SCREEN_H = 1024, 576
 TILE = 24
 
+# Шаг симуляции, с
+SIM_DT = 1 / 60
+# Не больше шагов за кадр: остальное отставание отбрасывается
+MAX_SIM_STEPS = 5
+# Ограничение частоты отрисовки; симуляция всё равно идёт шагами SIM_DT
+RENDER_FPS = 144
+
 # Палитра
 COL_BG = (18, 18, 22)
 COL_FLOOR = (40, 44, 52)
@@ -20,6 +27,22 @@ COL_DIM = (140, 150, 160)
 # Освещение
 LIGHT_RADIUS = 200
 LIGHT_SOFT = 160
+# Затемнение за пределами света. 24 — как в исходной отрисовке (ровное лёгкое
+# затемнение всего экрана); большие значения дают тьму за кругом света
+LIGHT_DARK_ALPHA = 24
+LIGHT_AMBIENT_ALPHA = 24   # лёгкое затемнение внутри круга
+# Плавность освещения: число ступеней градиента. Маска строится один раз,
+# поэтому настройка влияет только на вид, а не на стоимость кадра
+LIGHT_QUALITIES = {"Низкое": 4, "Среднее": 12, "Высокое": 48}
+
+# Уровни детализации симуляции врагов (px, с): ближние и видимые обновляются
+# каждый кадр, средние — раз в LOD_MID_STEP, дальние — раз в LOD_FAR_STEP
+# и без осевых коллизий. Ближе LOD_FAR_DIST дальний враг переходит в средние.
+LOD_NEAR_DIST = 420        # не меньше дальности плевка (320)
+LOD_FAR_DIST = 1100
+LOD_VIEW_MARGIN = 64       # запас вокруг экрана, в котором враг считается видимым
+LOD_MID_STEP = 0.1
+LOD_FAR_STEP = 0.5
 
 # Сложность
 DIFFS = {
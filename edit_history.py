@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+import numpy as np
+import pygame
+
+# Память под историю правок редактора, байт (оценка по упакованным дельтам)
+EDIT_HISTORY_BUDGET = 32 * 1024 * 1024
+# Примерная цена одной записи об объекте или атрибуте и накладные на правку
+_OP_BYTES = 64
+_TX_BYTES = 96
+
+
+class Transaction:
+    """Одна правка: дельты тайлов и операции над объектами.
+
+    Пока правка открыта, одиночные тайлы копятся в словаре, а пачки от
+    векторных инструментов — массивами в порядке поступления. При закрытии
+    всё сводится в три массива: плоский индекс клетки, значение до правки
+    и после неё.
+    """
+
+    __slots__ = ("pending", "chunks", "idx", "old", "new", "ops", "size")
+
+    def __init__(self):
+        self.pending = {}  # плоский индекс -> [старое, новое]
+        self.chunks = []   # [(idx, old, new), ...]
+        self.idx = self.old = self.new = None
+        self.ops = []
+        self.size = 0
+
+    def flush(self):
+        if self.pending:
+            idx = np.fromiter(self.pending.keys(), dtype=np.uint32, count=len(self.pending))
+            vals = np.array(list(self.pending.values()), dtype=np.uint8).reshape(-1, 2)
+            self.chunks.append((idx, vals[:, 0], vals[:, 1]))
+            self.pending = {}
+
+    def pack(self):
+        self.flush()
+        if self.chunks:
+            idx = np.concatenate([c[0] for c in self.chunks])
+            old = np.concatenate([c[1] for c in self.chunks])
+            new = np.concatenate([c[2] for c in self.chunks])
+            self.chunks = []
+            uniq, first = np.unique(idx, return_index=True)
+            if len(uniq) != len(idx):
+                # Клетка менялась несколько раз: «до» — из первой записи, «после» — из последней
+                _, last = np.unique(idx[::-1], return_index=True)
+                idx, old, new = uniq, old[first], new[len(idx) - 1 - last]
+            # Клетки, вернувшиеся к исходному значению, хранить незачем
+            keep = old != new
+            self.idx, self.old, self.new = (idx[keep], old[keep], new[keep]) if keep.any() else (None, None, None)
+        tiles = 0 if self.idx is None else self.idx.nbytes + self.old.nbytes + self.new.nbytes
+        self.size = _TX_BYTES + tiles + _OP_BYTES * len(self.ops)
+
+    def empty(self):
+        return self.idx is None and not self.ops
+
+
+def _snapshot(value):
+    return value.copy() if isinstance(value, pygame.Rect) else value
+
+
+class EditHistory:
+    """Журнал отмены/повтора для редактора карт.
+
+    Хранит не снимки карты, а дельты каждой правки: изменённые тайлы
+    (индекс, было, стало) и добавление/удаление/перемещение объектов.
+    Всё, что происходит между begin() и commit() (например, мазок кистью
+    от нажатия до отпускания кнопки), отменяется одним шагом. Самые старые
+    правки вытесняются, когда суммарный объём превышает budget.
+
+    on_tiles(idx) вызывается с плоскими индексами тайлов, изменённых при
+    отмене или повторе, — чтобы редактор сбросил кэши отрисовки.
+    """
+
+    def __init__(self, g, on_tiles=None, budget=EDIT_HISTORY_BUDGET):
+        self.g = g
+        self.on_tiles = on_tiles
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.bytes = 0
+        self.current = None
+        self.tiles = g.tiles
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.bytes = 0
+        self.current = None
+        self.tiles = self.g.tiles
+
+    def _sync(self):
+        # Другая сетка тайлов (новая карта, загрузка) — старые дельты к ней неприменимы
+        if self.tiles is not self.g.tiles:
+            self.clear()
+
+    # --- запись ---
+
+    def begin(self):
+        self.commit()
+        self.current = Transaction()
+
+    def _tx(self):
+        self._sync()
+        if self.current is None:
+            self.current = Transaction()
+        return self.current
+
+    def tile(self, tx, ty, old, new):
+        pending = self._tx().pending
+        i = ty * self.g.tiles.w + tx
+        rec = pending.get(i)
+        if rec is None:
+            pending[i] = [old, new]
+        else:
+            rec[1] = new
+
+    def tiles_bulk(self, idx, old, new):
+        # Пачка тайлов из векторной операции: idx — плоские индексы без повторов
+        tx = self._tx()
+        tx.flush()
+        idx = np.asarray(idx, dtype=np.uint32)
+        old = np.broadcast_to(np.asarray(old, dtype=np.uint8), idx.shape).copy()
+        new = np.broadcast_to(np.asarray(new, dtype=np.uint8), idx.shape).copy()
+        tx.chunks.append((idx, old, new))
+
+    def add(self, index, obj):
+        self._tx().ops.append(("add", index, obj))
+
+    def remove(self, index, obj):
+        self._tx().ops.append(("remove", index, obj))
+
+    def move(self, index, obj, old_pos, new_pos):
+        self._tx().ops.append(("move", index, obj, pygame.Vector2(old_pos), pygame.Vector2(new_pos)))
+
+    def attr(self, name, old, new):
+        # exit_rect, shop_rect или spawn (пара spawn_tx, spawn_ty)
+        if old != new:
+            self._tx().ops.append(("attr", name, _snapshot(old), _snapshot(new)))
+
+    def get_attr(self, name):
+        if name == "spawn":
+            return (self.g.spawn_tx, self.g.spawn_ty)
+        return _snapshot(getattr(self.g, name))
+
+    def _set_attr(self, name, value):
+        if name == "spawn":
+            self.g.spawn_tx, self.g.spawn_ty = value
+        else:
+            setattr(self.g, name, _snapshot(value))
+
+    def commit(self):
+        tx, self.current = self.current, None
+        if tx is None or self.tiles is not self.g.tiles:
+            self._sync()
+            return False
+        tx.pack()
+        if tx.empty():
+            return False
+        self.redo_stack.clear()
+        self.undo_stack.append(tx)
+        self.bytes += tx.size
+        while self.bytes > self.budget and len(self.undo_stack) > 1:
+            self.bytes -= self.undo_stack.popleft().size
+        return True
+
+    # --- отмена и повтор ---
+
+    def _apply(self, tx, forward):
+        if tx.idx is not None:
+            self.g.tiles.array().reshape(-1)[tx.idx] = tx.new if forward else tx.old
+            if self.on_tiles is not None:
+                self.on_tiles(tx.idx)
+        for op in (tx.ops if forward else reversed(tx.ops)):
+            kind = op[0]
+            if kind == "add" or kind == "remove":
+                _, index, obj = op
+                if (kind == "add") == forward:
+                    index.add(obj)
+                else:
+                    index.remove(obj)
+            elif kind == "move":
+                _, index, obj, old_pos, new_pos = op
+                index.move(obj, pygame.Vector2(new_pos if forward else old_pos))
+            else:
+                _, name, old, new = op
+                self._set_attr(name, new if forward else old)
+
+    def undo(self):
+        self.commit()
+        if not self.undo_stack:
+            return False
+        tx = self.undo_stack.pop()
+        self.bytes -= tx.size
+        self._apply(tx, forward=False)
+        self.redo_stack.append(tx)
+        return True
+
+    def redo(self):
+        self.commit()
+        if not self.redo_stack:
+            return False
+        tx = self.redo_stack.pop()
+        self._apply(tx, forward=True)
+        self.undo_stack.append(tx)
+        self.bytes += tx.size
+        return True
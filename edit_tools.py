@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# Инструменты редактора для тайловых кистей
+TOOL_BRUSH = 0
+TOOL_RECT = 1         # рамка
+TOOL_FILLED_RECT = 2  # закрашенный прямоугольник
+TOOL_LINE = 3
+TOOL_FILL = 4         # заливка связной области
+
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def rect_cells(w, h, x0, y0, x1, y1, filled=True):
+    # Плоские индексы клеток прямоугольника с углами (x0, y0) и (x1, y1), включительно
+    xa, xb = sorted((x0, x1))
+    ya, yb = sorted((y0, y1))
+    xa, ya = max(xa, 0), max(ya, 0)
+    xb, yb = min(xb, w - 1), min(yb, h - 1)
+    if xa > xb or ya > yb:
+        return _EMPTY
+    mask = np.zeros((h, w), dtype=bool)
+    if filled:
+        mask[ya:yb + 1, xa:xb + 1] = True
+    else:
+        mask[ya, xa:xb + 1] = mask[yb, xa:xb + 1] = True
+        mask[ya:yb + 1, xa] = mask[ya:yb + 1, xb] = True
+    return np.flatnonzero(mask).astype(np.uint32)
+
+
+def line_cells(w, h, x0, y0, x1, y1):
+    # Отрезок по клеткам: шаг по длинной оси, вторая координата округляется,
+    # как в алгоритме Брезенхэма (кроме выбора стороны при ровно половине)
+    n = max(abs(x1 - x0), abs(y1 - y0))
+    if n == 0:
+        xs, ys = np.array([x0]), np.array([y0])
+    else:
+        t = np.arange(n + 1)
+        xs = x0 + (2 * t * (x1 - x0) + n) // (2 * n)
+        ys = y0 + (2 * t * (y1 - y0) + n) // (2 * n)
+    inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    return (ys[inside] * w + xs[inside]).astype(np.uint32)
+
+
+def _run(row):
+    # Длина начального отрезка из True
+    stop = np.flatnonzero(~row)
+    return int(stop[0]) if len(stop) else len(row)
+
+
+def flood_cells(grid, x, y):
+    """Плоские индексы 4-связной области клеток со значением как у (x, y).
+
+    Построчная заливка: каждая строка области берётся целым отрезком,
+    а в соседних строках ищутся начала ещё не пройденных отрезков —
+    число шагов пропорционально числу отрезков, а не клеток.
+    """
+    a = grid.array()
+    h, w = a.shape
+    if not (0 <= x < w and 0 <= y < h):
+        return _EMPTY
+    match = a == a[y, x]
+    seen = np.zeros((h, w), dtype=bool)
+    stack = [(x, y)]
+    while stack:
+        sx, sy = stack.pop()
+        if seen[sy, sx]:
+            continue
+        row = match[sy]
+        left = sx - _run(row[sx::-1]) + 1
+        right = sx + _run(row[sx:])
+        seen[sy, left:right] = True
+        for ny in (sy - 1, sy + 1):
+            if 0 <= ny < h:
+                cand = match[ny, left:right] & ~seen[ny, left:right]
+                if cand.any():
+                    starts = np.flatnonzero(cand & ~np.concatenate(([False], cand[:-1])))
+                    stack.extend((left + int(s), ny) for s in starts)
+    return np.flatnonzero(seen).astype(np.uint32)
+
+
+def set_cells(grid, idx, value):
+    # Присвоение пачкой; возвращает реально изменённые клетки и их прежние значения
+    flat = grid.array().reshape(-1)
+    old = flat[idx]
+    changed = old != value
+    idx = idx[changed]
+    old = old[changed]
+    flat[idx] = value
+    return idx, old
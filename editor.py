@@ -1,10 +1,23 @@
 # -*- coding: utf-8 -*-
 import pygame
 import os
+import numpy as np
 from typing import Tuple
-from config import SCREEN_W, SCREEN_H, TILE, COL_BG, COL_WALL, COL_FLOOR, TREASURE_TYPES, COL_GOLD, draw_round_rect
+from config import (
+    SCREEN_W, SCREEN_H, TILE, COL_BG, TREASURE_TYPES, COL_GOLD, draw_round_rect,
+    WALL_NORMAL, WALL_BREAKABLE
+)
+from grid import Grid
+from text_cache import render_text
+from tile_cache import EditorChunkCache, EDITOR_CHUNK_TILES
+from tile_index import TileIndex
+from edit_history import EditHistory
+from edit_tools import (
+    TOOL_BRUSH, TOOL_RECT, TOOL_FILLED_RECT, TOOL_LINE, TOOL_FILL,
+    rect_cells, line_cells, flood_cells, set_cells
+)
 from mapgen import in_bounds
-from map_io import ensure_maps_dir, save_map, load_map, apply_map_to_game
+from map_io import ensure_maps_dir, save_map, load_map, apply_map_to_game, is_map_file
 
 
 BRUSH_WALL = 1
@@ -15,6 +28,12 @@ BRUSH_ENEMY = 3
 BRUSH_EXIT = 4
 BRUSH_SPAWN = 5
 
+# Кисти, рисующие тайлы: к ним применимы фигуры и заливка
+TILE_BRUSHES = (BRUSH_WALL, BRUSH_BREAKABLE_WALL, BRUSH_FLOOR)
+
+# Атрибут игры, который меняет перетаскивание объекта данного вида
+DRAG_ATTRS = {"exit": "exit_rect", "shop": "shop_rect", "spawn": "spawn"}
+
 
 def run_map_editor(g_factory) -> None:
     pygame.init()
@@ -43,7 +62,7 @@ def run_map_editor(g_factory) -> None:
     # Получаем заготовленный игровой объект для хранения карты
     g = g_factory()
     # Стартуем с полностью пустой карты: без стен и объектов
-    g.tiles = [[0 for _ in range(g.MAP_W)] for __ in range(g.MAP_H)]
+    g.tiles = Grid(g.MAP_W, g.MAP_H, 0)
     g.treasures = []
     g.enemies = []
     g.exit_rect = None
@@ -54,10 +73,34 @@ def run_map_editor(g_factory) -> None:
     painting = False
     paint_button = 1  # 1 - ЛКМ, 3 - ПКМ
     move_mode = False
-    selected = {"kind": None, "index": -1}
+    tool = TOOL_BRUSH
+    # Фигура, которую тянут мышью: {"start": (tx, ty), "end": (tx, ty), "button": 1|3}
+    shape = None
+    selected = {"kind": None, "obj": None}
+    # Индексы клетка -> объект для сокровищ и врагов (выбор, занятость, стирание за O(1))
+    treasure_index = TileIndex(g, "treasures")
+    enemy_index = TileIndex(g, "enemies")
+
+    def invalidate_tiles(idx):
+        # Тайлы с плоскими индексами idx изменены пачкой (фигуры, отмена/повтор)
+        w = g.tiles.w
+        if len(idx) <= 256:
+            for i in idx.tolist():
+                tile_cache.invalidate(i % w, i // w)
+        else:
+            n = EDITOR_CHUNK_TILES
+            ys, xs = np.divmod(idx.astype(np.int64), w)
+            keys = np.unique((ys // n) * (w // n + 1) + xs // n)
+            cys, cxs = np.divmod(keys, w // n + 1)
+            tile_cache.invalidate_chunks(set(zip(cxs.tolist(), cys.tolist())))
+
+    # Отмена/повтор: мазок от нажатия до отпускания кнопки — одна правка
+    history = EditHistory(g, on_tiles=invalidate_tiles)
     # Камера и зум редактора
     cam = pygame.Vector2(0.0, 0.0)
     zoom = 1.0  # 0.25 .. 3.0
+    # Пререндер тайлов по чанкам для каждого зума
+    tile_cache = EditorChunkCache()
     is_panning = False
     pan_start = pygame.Vector2(0.0, 0.0)
     cam_start = pygame.Vector2(0.0, 0.0)
@@ -83,6 +126,11 @@ def run_map_editor(g_factory) -> None:
             ("brush", BRUSH_ENEMY, "Враг"),
             ("brush", BRUSH_EXIT, "Выход"),
             ("brush", BRUSH_SPAWN, "Спавн"),
+            ("tool", TOOL_BRUSH, "Кисть"),
+            ("tool", TOOL_RECT, "Рамка"),
+            ("tool", TOOL_FILLED_RECT, "Прямоугольник"),
+            ("tool", TOOL_LINE, "Линия"),
+            ("tool", TOOL_FILL, "Заливка"),
             ("move", 0, "Перемещение"),
             ("open", 0, "Открыть"),
             ("new", 0, "Новая"),
@@ -106,11 +154,11 @@ def run_map_editor(g_factory) -> None:
         toolbar_rects["_click_map"] = {}
         for kind, bid, label in items:
             r = pygame.Rect(x, 0, btn_w, btn_h)
-            selected_btn = (kind == "brush" and brush == bid) or (kind == "move" and move_mode)
+            selected_btn = (kind == "brush" and brush == bid) or (kind == "move" and move_mode) or (kind == "tool" and tool == bid)
             base = (40, 70, 100) if selected_btn else (40, 40, 50)
             border = (120, 180, 255) if selected_btn else (90, 140, 200)
             draw_round_rect(content, r, base, radius=8, border=2, border_color=border)
-            txt = font.render(label, True, (230, 235, 240))
+            txt = render_text(font, label, (230, 235, 240))
             content.blit(txt, (r.centerx - txt.get_width() // 2, r.centery - txt.get_height() // 2))
             # Кликом по экрану — учёт скролла и вьюпорта
             vis_r = pygame.Rect(r.x - toolbar_scroll + viewport.x, r.y + viewport.y, r.w, r.h)
@@ -125,11 +173,11 @@ def run_map_editor(g_factory) -> None:
         r_show = pygame.Rect(16 + 36 + 8 + 36 + 8, t_y, 260, 30)
         draw_round_rect(panel, r_prev, (50, 50, 60), radius=6, border=2, border_color=(90, 140, 200))
         draw_round_rect(panel, r_next, (50, 50, 60), radius=6, border=2, border_color=(90, 140, 200))
-        panel.blit(font.render("<", True, (230, 235, 240)), (r_prev.centerx - 5, r_prev.centery - 9))
-        panel.blit(font.render(">", True, (230, 235, 240)), (r_next.centerx - 5, r_next.centery - 9))
+        panel.blit(render_text(font, "<", (230, 235, 240)), (r_prev.centerx - 5, r_prev.centery - 9))
+        panel.blit(render_text(font, ">", (230, 235, 240)), (r_next.centerx - 5, r_next.centery - 9))
         draw_round_rect(panel, r_show, (20, 20, 30), radius=6, border=2, border_color=(90, 140, 200))
         t = TREASURE_TYPES[treasure_type]
-        panel.blit(font.render(f"Тип: {t['name']}", True, (230, 235, 240)), (r_show.x + 10, r_show.y + 5))
+        panel.blit(render_text(font, f"Тип: {t['name']}", (230, 235, 240)), (r_show.x + 10, r_show.y + 5))
         pygame.draw.circle(panel, t["color"], (r_show.right - 16, r_show.centery), 8)
 
         screen.blit(panel, (0, 0))
@@ -138,13 +186,15 @@ def run_map_editor(g_factory) -> None:
         return my < 110
 
     def handle_toolbar_click(mx, my):
-        nonlocal brush, treasure_type, move_mode, toolbar_scroll, current_map_name, dirty
+        nonlocal brush, treasure_type, move_mode, tool, toolbar_scroll, current_map_name, dirty
         for (kind, bid), r in toolbar_rects.get("_click_map", {}).items():
             if r.collidepoint(mx, my):
                 if kind == "brush":
                     brush = bid; move_mode = False
                 elif kind == "move":
                     move_mode = not move_mode
+                elif kind == "tool":
+                    tool = bid; move_mode = False
                 elif kind == "open":
                     name = open_map_dialog()
                     if name:
@@ -152,14 +202,18 @@ def run_map_editor(g_factory) -> None:
                         try:
                             data = load_map(path)
                             apply_map_to_game(g, data)
+                            history.clear()
                             current_map_name = name
+                            selected["kind"] = None; selected["obj"] = None
                             dirty = False
                             update_title()
                         except Exception as ex:
                             print("Open failed:", ex)
                 elif kind == "new":
-                    g.tiles = [[0 for _ in range(g.MAP_W)] for __ in range(g.MAP_H)]
-                    g.treasures.clear(); g.enemies.clear(); g.exit_rect = None
+                    g.tiles = Grid(g.MAP_W, g.MAP_H, 0)
+                    g.treasures = []; g.enemies = []; g.exit_rect = None
+                    history.clear()
+                    selected["kind"] = None; selected["obj"] = None
                     current_map_name = ""; dirty = True; update_title()
                 elif kind == "save":
                     perform_save(save_as=False)
@@ -179,7 +233,7 @@ def run_map_editor(g_factory) -> None:
     def open_map_dialog() -> str:
         # Простой диалог выбора файла из maps/
         maps_dir = ensure_maps_dir()
-        files = [f for f in os.listdir(maps_dir) if f.lower().endswith('.json')]
+        files = [f for f in os.listdir(maps_dir) if is_map_file(f)]
         if not files:
             return ""
         idx = 0
@@ -198,12 +252,12 @@ def run_map_editor(g_factory) -> None:
             overlay.fill((0,0,0,160)); screen.blit(overlay, (0,0))
             panel.fill((0,0,0,0))
             draw_round_rect(panel, panel.get_rect(), (0,0,0,220), radius=12, border=2, border_color=(90,140,200))
-            title = font.render("Выберите карту из maps/", True, (230,240,255))
+            title = render_text(font, "Выберите карту из maps/", (230,240,255))
             panel.blit(title, (20, 20))
             base_y = 64
             for i, name in enumerate(files):
                 sel = (i == idx)
-                img = font.render(name, True, (230,235,240) if sel else (150,155,165))
+                img = render_text(font, name, (230,235,240) if sel else (150,155,165))
                 x = 22; y = base_y + i * 26
                 if sel:
                     pygame.draw.rect(panel, (40,70,100), pygame.Rect(x-8, y-4, img.get_width()+16, img.get_height()+8), border_radius=8)
@@ -214,29 +268,34 @@ def run_map_editor(g_factory) -> None:
     # Перемещение объектов
     dragging = {
         "kind": None,   # 'treasure'|'enemy'|'exit'|'spawn'|'shop'
-        "index": -1,
+        "obj": None,    # словарь сокровища/врага
         "offset": pygame.Vector2(0,0),
+        "start": None,  # положение в начале перетаскивания (для истории)
     }
 
     def pick_object_at(tx: int, ty: int):
-        # проверяем выход
-        if g.exit_rect and g.exit_rect.collidepoint(tx*TILE + TILE//2, ty*TILE + TILE//2):
-            dragging["kind"] = "exit"; dragging["index"] = 0; dragging["offset"] = pygame.Vector2(0,0); selected["kind"] = "exit"; selected["index"] = 0; return True
-        # магазин
-        if g.shop_rect and g.shop_rect.collidepoint(tx*TILE + TILE//2, ty*TILE + TILE//2):
-            dragging["kind"] = "shop"; dragging["index"] = 0; dragging["offset"] = pygame.Vector2(0,0); selected["kind"] = "shop"; selected["index"] = 0; return True
-        # проверяем спавн
-        if (g.spawn_tx, g.spawn_ty) == (tx, ty):
-            dragging["kind"] = "spawn"; dragging["index"] = 0; dragging["offset"] = pygame.Vector2(0,0); selected["kind"] = "spawn"; selected["index"] = 0; return True
-        # проверяем сокровища
-        for i, it in enumerate(g.treasures):
-            if int(it["pos"].x // TILE) == tx and int(it["pos"].y // TILE) == ty:
-                dragging["kind"] = "treasure"; dragging["index"] = i; dragging["offset"] = pygame.Vector2(0,0); selected["kind"] = "treasure"; selected["index"] = i; return True
-        # проверяем врагов
-        for i, en in enumerate(g.enemies):
-            if int(en["pos"].x // TILE) == tx and int(en["pos"].y // TILE) == ty:
-                dragging["kind"] = "enemy"; dragging["index"] = i; dragging["offset"] = pygame.Vector2(0,0); selected["kind"] = "enemy"; selected["index"] = i; return True
-        return False
+        kind, obj = None, None
+        cx, cy = tx*TILE + TILE//2, ty*TILE + TILE//2
+        if g.exit_rect and g.exit_rect.collidepoint(cx, cy):
+            kind = "exit"
+        elif g.shop_rect and g.shop_rect.collidepoint(cx, cy):
+            kind = "shop"
+        elif (g.spawn_tx, g.spawn_ty) == (tx, ty):
+            kind = "spawn"
+        else:
+            obj = treasure_index.first_at(tx, ty)
+            if obj is not None:
+                kind = "treasure"
+            else:
+                obj = enemy_index.first_at(tx, ty)
+                if obj is not None:
+                    kind = "enemy"
+        if kind is None:
+            return False
+        dragging["kind"] = kind; dragging["obj"] = obj; dragging["offset"] = pygame.Vector2(0,0)
+        dragging["start"] = pygame.Vector2(obj["pos"]) if obj is not None else history.get_attr(DRAG_ATTRS[kind])
+        selected["kind"] = kind; selected["obj"] = obj
+        return True
 
     def drag_move_to(tx: int, ty: int):
         nonlocal dirty
@@ -246,59 +305,90 @@ def run_map_editor(g_factory) -> None:
             g.shop_rect.x = tx*TILE; g.shop_rect.y = ty*TILE
         elif dragging["kind"] == "spawn":
             g.spawn_tx, g.spawn_ty = tx, ty
-        elif dragging["kind"] == "treasure" and 0 <= dragging["index"] < len(g.treasures):
-            g.treasures[dragging["index"]]["pos"] = pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2)
-        elif dragging["kind"] == "enemy" and 0 <= dragging["index"] < len(g.enemies):
-            g.enemies[dragging["index"]]["pos"] = pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2)
+        elif dragging["kind"] == "treasure":
+            if not treasure_index.move(dragging["obj"], pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2)):
+                return
+        elif dragging["kind"] == "enemy":
+            if not enemy_index.move(dragging["obj"], pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2)):
+                return
         else:
             return
         dirty = True; update_title()
 
     def clear_drag():
-        dragging["kind"] = None; dragging["index"] = -1
+        # Завершённое перетаскивание попадает в историю одним перемещением
+        kind, obj = dragging["kind"], dragging["obj"]
+        if kind in ("treasure", "enemy"):
+            if obj["pos"] != dragging["start"]:
+                history.move(treasure_index if kind == "treasure" else enemy_index, obj, dragging["start"], obj["pos"])
+        elif kind is not None:
+            history.attr(DRAG_ATTRS[kind], dragging["start"], history.get_attr(DRAG_ATTRS[kind]))
+        dragging["kind"] = None; dragging["obj"] = None; dragging["start"] = None
+
+    def set_tile(tx: int, ty: int, value: int):
+        # Все изменения тайлов из редактора — через эту функцию (кэш чанков)
+        nonlocal dirty
+        old = g.tiles.get(tx, ty)
+        if old != value:
+            g.tiles.set(tx, ty, value)
+            history.tile(tx, ty, old, value)
+            tile_cache.invalidate(tx, ty)
+            dirty = True
+
+    def brush_value(button: int) -> int:
+        # Значение тайла для тайловой кисти: ЛКМ рисует, ПКМ стирает
+        if button == 1:
+            return {BRUSH_WALL: WALL_NORMAL, BRUSH_BREAKABLE_WALL: WALL_BREAKABLE, BRUSH_FLOOR: 0}[brush]
+        return WALL_NORMAL if brush == BRUSH_FLOOR else 0
+
+    def set_cells_bulk(idx, value: int):
+        # Пачка тайлов одной операцией: одна запись в историю, сброс только задетых чанков
+        nonlocal dirty
+        idx, old = set_cells(g.tiles, idx, value)
+        if len(idx):
+            history.tiles_bulk(idx, old, value)
+            invalidate_tiles(idx)
+            dirty = True; update_title()
+
+    def shape_cells(sh):
+        (x0, y0), (x1, y1) = sh["start"], sh["end"]
+        if tool == TOOL_LINE:
+            return line_cells(g.MAP_W, g.MAP_H, x0, y0, x1, y1)
+        return rect_cells(g.MAP_W, g.MAP_H, x0, y0, x1, y1, filled=(tool == TOOL_FILLED_RECT))
 
     def paint_at(tx: int, ty: int, button: int):
         nonlocal dirty
         if not in_bounds(g, tx, ty):
             return
-        if button == 1:
-            if brush == BRUSH_WALL:
-                if g.tiles[ty][tx] != WALL_NORMAL:
-                    g.tiles[ty][tx] = WALL_NORMAL; dirty = True
-            elif brush == BRUSH_BREAKABLE_WALL:
-                if g.tiles[ty][tx] != WALL_BREAKABLE:
-                    g.tiles[ty][tx] = WALL_BREAKABLE; dirty = True
-            elif brush == BRUSH_FLOOR:
-                if g.tiles[ty][tx] != 0:
-                    g.tiles[ty][tx] = 0; dirty = True
-            elif brush == BRUSH_TREASURE:
+        if brush in TILE_BRUSHES:
+            set_tile(tx, ty, brush_value(button))
+        elif button == 1:
+            if brush == BRUSH_TREASURE:
                 # не дублировать при удержании — проверим есть ли уже в этой клетке
-                if not any(int(it["pos"].x // TILE) == tx and int(it["pos"].y // TILE) == ty for it in g.treasures):
-                    g.treasures.append({"pos": pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2), "type": treasure_type}); dirty = True
+                if not treasure_index.at(tx, ty):
+                    obj = {"pos": pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2), "type": treasure_type}
+                    treasure_index.add(obj); history.add(treasure_index, obj); dirty = True
             elif brush == BRUSH_ENEMY:
-                if not any(int(en["pos"].x // TILE) == tx and int(en["pos"].y // TILE) == ty for en in g.enemies):
-                    g.enemies.append({"pos": pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2), "hp": 3, "t": 0.0, "kind": "chaser", "state": "wander", "atk_cd": 0.0}); dirty = True
+                if not enemy_index.at(tx, ty):
+                    obj = {"pos": pygame.Vector2(tx*TILE + TILE/2, ty*TILE + TILE/2), "hp": 3, "t": 0.0, "kind": "chaser", "state": "wander", "atk_cd": 0.0}
+                    enemy_index.add(obj); history.add(enemy_index, obj); dirty = True
             elif brush == BRUSH_EXIT:
+                old = history.get_attr("exit_rect")
                 g.exit_rect = pygame.Rect(tx*TILE, ty*TILE, 2*TILE, 2*TILE); dirty = True
+                history.attr("exit_rect", old, g.exit_rect)
             elif brush == BRUSH_SPAWN:
+                history.attr("spawn", (g.spawn_tx, g.spawn_ty), (int(tx), int(ty)))
                 g.spawn_tx, g.spawn_ty = int(tx), int(ty); dirty = True
         elif button == 3:
-            if brush == BRUSH_WALL or brush == BRUSH_BREAKABLE_WALL:
-                if g.tiles[ty][tx] != 0:
-                    g.tiles[ty][tx] = 0; dirty = True
-            elif brush == BRUSH_FLOOR:
-                if g.tiles[ty][tx] != WALL_NORMAL:
-                    g.tiles[ty][tx] = WALL_NORMAL; dirty = True
-            elif brush == BRUSH_TREASURE:
-                before = len(g.treasures)
-                g.treasures = [it for it in g.treasures if not (int(it["pos"].x // TILE) == tx and int(it["pos"].y // TILE) == ty)]
-                if len(g.treasures) != before: dirty = True
+            if brush == BRUSH_TREASURE:
+                for obj in treasure_index.remove_at(tx, ty):
+                    history.remove(treasure_index, obj); dirty = True
             elif brush == BRUSH_ENEMY:
-                before = len(g.enemies)
-                g.enemies = [en for en in g.enemies if not (int(en["pos"].x // TILE) == tx and int(en["pos"].y // TILE) == ty)]
-                if len(g.enemies) != before: dirty = True
+                for obj in enemy_index.remove_at(tx, ty):
+                    history.remove(enemy_index, obj); dirty = True
             elif brush == BRUSH_EXIT:
                 if g.exit_rect is not None:
+                    history.attr("exit_rect", history.get_attr("exit_rect"), None)
                     g.exit_rect = None; dirty = True
             # спавн правой кнопкой не удаляем
         if dirty:
@@ -306,30 +396,25 @@ def run_map_editor(g_factory) -> None:
 
     def draw_ui():
         screen.fill(COL_BG)
-        # Сетка и тайлы (с учётом камеры и зума)
-        for ty in range(g.MAP_H):
-            for tx in range(g.MAP_W):
-                r = pygame.Rect(int((tx*TILE - cam.x) * zoom), int((ty*TILE - cam.y) * zoom), int(TILE * zoom), int(TILE * zoom))
-                if g.tiles[ty][tx] == WALL_NORMAL:
-                    col = COL_WALL
-                elif g.tiles[ty][tx] == WALL_BREAKABLE:
-                    col = COL_BREAKABLE_WALL
-                else:
-                    col = COL_FLOOR
-                pygame.draw.rect(screen, col, r)
-                pygame.draw.rect(screen, (30,30,35), r, 1)
+        # Сетка и тайлы — только видимые чанки из кэша текущего зума
+        tile_cache.draw(g, screen, cam, round(zoom, 6))
+
+        # Сокровища и враги за пределами экрана не рисуются
+        sw, sh = screen.get_size()
 
         # Сокровища
         for it in g.treasures:
             px = int((it["pos"].x - cam.x) * zoom)
             py = int((it["pos"].y - cam.y) * zoom)
-            pygame.draw.circle(screen, TREASURE_TYPES[it["type"]]["color"], (px, py), max(3, int(5 * zoom)))
+            if -16 <= px < sw + 16 and -16 <= py < sh + 16:
+                pygame.draw.circle(screen, TREASURE_TYPES[it["type"]]["color"], (px, py), max(3, int(5 * zoom)))
 
         # Враги
         for e in g.enemies:
             px = int((e["pos"].x - cam.x) * zoom)
             py = int((e["pos"].y - cam.y) * zoom)
-            pygame.draw.circle(screen, (200, 80, 80), (px, py), max(4, int(8 * zoom)), 2)
+            if -32 <= px < sw + 32 and -32 <= py < sh + 32:
+                pygame.draw.circle(screen, (200, 80, 80), (px, py), max(4, int(8 * zoom)), 2)
 
         # Магазин и выход/спавн
         shop_vis = pygame.Rect(int((g.shop_rect.x - cam.x) * zoom), int((g.shop_rect.y - cam.y) * zoom), int(g.shop_rect.w * zoom), int(g.shop_rect.h * zoom))
@@ -339,15 +424,33 @@ def run_map_editor(g_factory) -> None:
             draw_round_rect(screen, exit_vis, (120, 255, 160), radius=6, border=2, border_color=(30, 60, 40))
         pygame.draw.circle(screen, (255,255,255), (int(((g.spawn_tx*TILE + TILE//2) - cam.x) * zoom), int(((g.spawn_ty*TILE + TILE//2) - cam.y) * zoom)), max(3, int(6 * zoom)))
 
+        # Предпросмотр фигуры, которую тянут мышью
+        if shape is not None:
+            (x0, y0), (x1, y1) = shape["start"], shape["end"]
+            col = (255, 230, 120)
+            if tool == TOOL_LINE:
+                size = max(2, int(TILE * zoom))
+                for i in line_cells(g.MAP_W, g.MAP_H, x0, y0, x1, y1).tolist():
+                    cx, cy = i % g.MAP_W, i // g.MAP_W
+                    pygame.draw.rect(screen, col, (int((cx*TILE - cam.x) * zoom), int((cy*TILE - cam.y) * zoom), size, size), 1)
+            else:
+                xa, xb = sorted((x0, x1)); ya, yb = sorted((y0, y1))
+                r = pygame.Rect(int((xa*TILE - cam.x) * zoom), int((ya*TILE - cam.y) * zoom),
+                                int((xb - xa + 1) * TILE * zoom), int((yb - ya + 1) * TILE * zoom))
+                pygame.draw.rect(screen, col, r, 2)
+
         # Панель инструментов (кнопки)
         draw_toolbar()
 
         # Выделение/стрелки на выбранном объекте
         if selected["kind"] is not None:
-            if selected["kind"] == "treasure" and 0 <= selected["index"] < len(g.treasures):
-                cx, cy = g.treasures[selected["index"]]["pos"].x, g.treasures[selected["index"]]["pos"].y
-            elif selected["kind"] == "enemy" and 0 <= selected["index"] < len(g.enemies):
-                cx, cy = g.enemies[selected["index"]]["pos"].x, g.enemies[selected["index"]]["pos"].y
+            if selected["kind"] in ("treasure", "enemy"):
+                index = treasure_index if selected["kind"] == "treasure" else enemy_index
+                obj = selected["obj"]
+                if obj is not None and obj in index:
+                    cx, cy = obj["pos"].x, obj["pos"].y
+                else:
+                    cx = cy = None
             elif selected["kind"] == "exit" and g.exit_rect:
                 cx, cy = g.exit_rect.centerx, g.exit_rect.centery
             elif selected["kind"] == "spawn":
@@ -372,9 +475,9 @@ def run_map_editor(g_factory) -> None:
         pygame.event.pump()
 
     def prompt_filename() -> str:
-        # Модальный ввод имени файла (без .json)
+        # Модальный ввод имени файла (без .json; с .dsm — бинарный формат)
         name = ""
-        allowed = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_ ")
+        allowed = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_ .")
         panel_w, panel_h = 520, 160
         panel = pygame.Surface((panel_w, panel_h), pygame.SRCALPHA)
         while True:
@@ -401,13 +504,13 @@ def run_map_editor(g_factory) -> None:
             # панель
             panel.fill((0,0,0,0))
             draw_round_rect(panel, panel.get_rect(), (0,0,0,200), radius=12, border=2, border_color=(90,140,200))
-            title = font.render("Введите имя карты (без .json):", True, (230,240,255))
+            title = render_text(font, "Имя карты (без .json, .dsm — компактный):", (230,240,255))
             panel.blit(title, (20, 20))
             box = pygame.Rect(20, 60, panel_w - 40, 36)
             draw_round_rect(panel, box, (20,20,30), radius=8, border=2, border_color=(90,140,200))
-            text_img = font.render(name, True, (230,235,240))
+            text_img = render_text(font, name, (230,235,240))
             panel.blit(text_img, (box.x + 10, box.y + 8))
-            hint = font.render("Enter — сохранить, Esc — отмена", True, (180,185,195))
+            hint = render_text(font, "Enter — сохранить, Esc — отмена", (180,185,195))
             panel.blit(hint, (20, 110))
 
             screen.blit(panel, (SCREEN_W//2 - panel_w//2, SCREEN_H//2 - panel_h//2))
@@ -441,13 +544,13 @@ def run_map_editor(g_factory) -> None:
             overlay.fill((0,0,0,160)); screen.blit(overlay, (0,0))
             panel.fill((0,0,0,0))
             draw_round_rect(panel, panel.get_rect(), (0,0,0,220), radius=12, border=2, border_color=(90,140,200))
-            title = font.render("Цель золота для карты:", True, (230,240,255))
+            title = render_text(font, "Цель золота для карты:", (230,240,255))
             panel.blit(title, (20, 20))
             box = pygame.Rect(20, 60, panel_w - 40, 40)
             draw_round_rect(panel, box, (20,20,30), radius=8, border=2, border_color=(90,140,200))
-            txt = font.render(value, True, (230,235,240))
+            txt = render_text(font, value, (230,235,240))
             panel.blit(txt, (box.x + 10, box.y + 10))
-            hint = font.render("Enter — подтвердить, Esc — отмена", True, (180,185,195))
+            hint = render_text(font, "Enter — подтвердить, Esc — отмена", (180,185,195))
             panel.blit(hint, (20, 116))
             screen.blit(panel, (screen.get_width()//2 - panel_w//2, screen.get_height()//2 - panel_h//2))
             pygame.display.flip(); pygame.time.delay(16)
@@ -463,7 +566,7 @@ def run_map_editor(g_factory) -> None:
             name = prompt_filename()
             if not name:
                 return
-            if not name.lower().endswith('.json'):
+            if not is_map_file(name):
                 name += '.json'
             current_map_name = name
         filepath = os.path.join(ensure_maps_dir(), name)
@@ -490,9 +593,9 @@ def run_map_editor(g_factory) -> None:
             overlay.fill((0,0,0,160)); screen.blit(overlay, (0,0))
             panel.fill((0,0,0,0))
             draw_round_rect(panel, panel.get_rect(), (0,0,0,220), radius=12, border=2, border_color=(90,140,200))
-            title = font.render("Сохранить изменения перед выходом?", True, (230,240,255))
+            title = render_text(font, "Сохранить изменения перед выходом?", (230,240,255))
             panel.blit(title, (20, 24))
-            hint = font.render("Enter — сохранить, D — не сохранять, Esc — отмена", True, (180,185,195))
+            hint = render_text(font, "Enter — сохранить, D — не сохранять, Esc — отмена", (180,185,195))
             panel.blit(hint, (20, 100))
             screen.blit(panel, (screen.get_width()//2 - panel_w//2, screen.get_height()//2 - panel_h//2))
             pygame.display.flip(); pygame.time.delay(16)
@@ -541,6 +644,11 @@ def run_map_editor(g_factory) -> None:
                     cam += world_after - world_before
                 elif e.key == pygame.K_s and (pygame.key.get_mods() & pygame.KMOD_CTRL):
                     perform_save(save_as=False)
+                elif e.key in (pygame.K_z, pygame.K_y) and (pygame.key.get_mods() & pygame.KMOD_CTRL):
+                    # Ctrl+Z — отмена, Ctrl+Y или Ctrl+Shift+Z — повтор
+                    redo = e.key == pygame.K_y or (pygame.key.get_mods() & pygame.KMOD_SHIFT)
+                    if history.redo() if redo else history.undo():
+                        dirty = True; update_title()
                 elif e.key == pygame.K_F12:
                     perform_save(save_as=True)
             elif e.type == pygame.MOUSEBUTTONDOWN and e.button in (1, 2, 3):
@@ -556,10 +664,16 @@ def run_map_editor(g_factory) -> None:
                 # Рисование на карте
                 tx = int((mx/zoom + cam.x) // TILE)
                 ty = int((my/zoom + cam.y) // TILE)
+                history.begin()
                 if move_mode and e.button == 1:
                     # Перемещение объектов только в режиме перемещения
                     if not pick_object_at(tx, ty):
-                        selected["kind"] = None; selected["index"] = -1
+                        selected["kind"] = None; selected["obj"] = None
+                elif tool == TOOL_FILL and brush in TILE_BRUSHES:
+                    set_cells_bulk(flood_cells(g.tiles, tx, ty), brush_value(e.button))
+                elif tool != TOOL_BRUSH and brush in TILE_BRUSHES:
+                    # Фигура применяется при отпускании кнопки
+                    shape = {"start": (tx, ty), "end": (tx, ty), "button": e.button}
                 else:
                     paint_button = e.button
                     painting = True
@@ -571,6 +685,9 @@ def run_map_editor(g_factory) -> None:
                 tx = int((mx/zoom + cam.x) // TILE)
                 ty = int((my/zoom + cam.y) // TILE)
                 paint_at(tx, ty, paint_button)
+            elif e.type == pygame.MOUSEMOTION and shape is not None:
+                mx, my = e.pos
+                shape["end"] = (int((mx/zoom + cam.x) // TILE), int((my/zoom + cam.y) // TILE))
             elif e.type == pygame.MOUSEMOTION and dragging["kind"] is not None:
                 mx, my = e.pos
                 if is_over_toolbar(mx, my):
@@ -582,7 +699,11 @@ def run_map_editor(g_factory) -> None:
                 painting = False
                 if e.button == 2:
                     is_panning = False
+                if shape is not None and e.button == shape["button"]:
+                    set_cells_bulk(shape_cells(shape), brush_value(shape["button"]))
+                    shape = None
                 clear_drag()
+                history.commit()
             elif e.type == pygame.MOUSEWHEEL:
                 mx, my = pygame.mouse.get_pos()
                 mods = pygame.key.get_mods()
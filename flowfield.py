@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from config import TILE
+
+# Радиус окна вокруг игрока, в тайлах: дальше преследователи идут напрямую
+FLOW_RADIUS = 24
+
+# Шаги к соседним тайлам: сначала ортогональные, затем диагональные
+STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+_NO_STEP = 255
+_FAR = np.iinfo(np.int32).max
+
+
+class FlowField:
+    """Общее поле путей к игроку для всех преследователей.
+
+    BFS-волна от тайла игрока по проходимым клеткам окна (2 * radius + 1)
+    тайлов; для каждой клетки запоминается шаг к соседу, который ближе к
+    игроку. Поле пересчитывается, только когда игрок сменил тайл или после
+    invalidate() (разрушена стена, новая карта), а запрос врага — это один
+    индекс в bytes, так что цена поиска пути не зависит от числа врагов.
+    """
+
+    def __init__(self, radius=FLOW_RADIUS):
+        self.radius = radius
+        self.tiles = None
+        self.origin = None
+        self.x0 = self.y0 = 0
+        self.w = self.h = 0
+        self.steps = b""
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def update(self, g):
+        ptx = int(g.player["pos"].x // TILE)
+        pty = int(g.player["pos"].y // TILE)
+        if not self.dirty and self.tiles is g.tiles and self.origin == (ptx, pty):
+            return
+        self._compute(g, ptx, pty)
+
+    def _compute(self, g, ptx, pty):
+        r = self.radius
+        x0, y0 = max(0, ptx - r), max(0, pty - r)
+        x1, y1 = min(g.MAP_W, ptx + r + 1), min(g.MAP_H, pty + r + 1)
+        free = ~g.tiles.solid(x0, y0, x1, y1)
+        h, w = free.shape
+        dist = np.full((h, w), _FAR, dtype=np.int32)
+
+        # Волна BFS (4-связность) целыми фронтами
+        ox, oy = ptx - x0, pty - y0
+        if 0 <= ox < w and 0 <= oy < h:
+            frontier = np.zeros((h, w), dtype=bool)
+            frontier[oy, ox] = True
+            reached = frontier.copy()
+            dist[oy, ox] = 0
+            d = 0
+            while frontier.any():
+                d += 1
+                nb = np.zeros_like(frontier)
+                nb[1:] |= frontier[:-1]
+                nb[:-1] |= frontier[1:]
+                nb[:, 1:] |= frontier[:, :-1]
+                nb[:, :-1] |= frontier[:, 1:]
+                frontier = nb & free & ~reached
+                reached |= frontier
+                dist[frontier] = d
+
+        # Для каждой клетки — шаг к самому близкому к игроку соседу.
+        # Диагональ разрешена, только если обе смежные ортогональные клетки
+        # проходимы (без срезания углов стен).
+        dpad = np.full((h + 2, w + 2), _FAR, dtype=np.int32)
+        dpad[1:-1, 1:-1] = dist
+        fpad = np.zeros((h + 2, w + 2), dtype=bool)
+        fpad[1:-1, 1:-1] = free
+        best = dist.copy()
+        step = np.full((h, w), _NO_STEP, dtype=np.uint8)
+        for k, (dx, dy) in enumerate(STEPS):
+            nd = dpad[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+            if dx and dy:
+                ok = fpad[1 + dy:1 + dy + h, 1:-1] & fpad[1:-1, 1 + dx:1 + dx + w]
+                nd = np.where(ok, nd, _FAR)
+            better = nd < best
+            best[better] = nd[better]
+            step[better] = k
+
+        self.tiles = g.tiles
+        self.origin = (ptx, pty)
+        self.x0, self.y0, self.w, self.h = x0, y0, w, h
+        self.steps = step.tobytes()
+        self.dirty = False
+
+    def next_tile(self, x, y):
+        """Тайл, в который нужно идти из точки мира (x, y), или None (вне поля/нет пути)."""
+        tx, ty = int(x // TILE), int(y // TILE)
+        lx, ly = tx - self.x0, ty - self.y0
+        if not (0 <= lx < self.w and 0 <= ly < self.h):
+            return None
+        k = self.steps[ly * self.w + lx]
+        if k == _NO_STEP:
+            return None
+        dx, dy = STEPS[k]
+        return tx + dx, ty + dy
@@ -3,14 +3,23 @@ import pygame
 import random
 from config import (
     SCREEN_W, SCREEN_H, TILE, COL_GOLD, STATE_MENU, STATE_PLAY, STATE_DEAD, STATE_WIN, STATE_MAPS, STATE_OPTIONS,
-    DIFFS, SIZES, TREASURE_TYPES
+    DIFFS, SIZES, TREASURE_TYPES, LIGHT_QUALITIES, WALL_NORMAL
 )
-from mapgen import generate_new_floor
+from grid import Grid
+from mapgen import build_floor, apply_floor, ensure_target_gold_reachable
 from systems import (
     clamp_camera, add_particles, add_float_text, mark_visited_radius,
-    update_particles, update_float_texts
+    update_particles, update_float_texts, reindex_entities
 )
-from map_io import apply_map_to_game, load_map
+from spatial import SpatialHash
+from particles import ParticlePool
+from tile_cache import TileLayer, MinimapCache
+from flowfield import FlowField
+from pregen import FloorPrefetcher
+from profiler import FrameProfiler
+from timestep import FixedStep
+from hud import Hud
+from map_io import apply_map_to_game, load_map, is_map_file, read_map_header
 
 class Game:
     def __init__(self, screen, clock, font_small, font_mid, font_big):
@@ -28,6 +37,11 @@ class Game:
             "difficulty": "Нормальная",
             "treasure_density": 0.015,
             "lighting": True,
+            "lighting_quality": "Среднее",
+            # Число проходов сглаживания пещер при генерации
+            "smooth_passes": 2,
+            # Сид забега: 0 — новый случайный при каждом старте
+            "seed": 0,
             # Режим пользовательской карты
             "use_custom_map": False,  # По умолчанию генерируем карту
             "custom_map_path": "maps/custom_map.json",
@@ -37,6 +51,7 @@ class Game:
         self.menu_items = []
         self.menu_sel = 0
         self.maps_list = []
+        self.maps_info = {}
         self.selected_map_idx = 0
         # Опции перед стартом
         self.opt_items = []
@@ -44,18 +59,33 @@ class Game:
 
         # Камера и интерфейс
         self.cam = pygame.Vector2(0, 0)
+        # Камера до последнего шага и доля шага для интерполяции отрисовки
+        self.cam_prev = None
+        self.render_alpha = 1.0
         self.show_controls = False
         self.show_minimap = False
+        self.hud = Hud()
+        # Оверлей замеров по системам (F3)
+        self.profiler = FrameProfiler()
 
         # Состояние игры
         self.state = STATE_MENU
         self.game_over = False
         self.win = False
 
+        # Фиксированный шаг симуляции
+        self.timestep = FixedStep()
+
+        # Генератор случайных чисел забега (генерация и игровая логика)
+        self.run_seed = 0
+        self.rng = random.Random()
+        # Фоновая генерация следующего этажа
+        self.pregen = FloorPrefetcher()
+
         # Мир
         self.MAP_W, self.MAP_H = self.settings["map_w"], self.settings["map_h"]
-        self.tiles = [[1 for _ in range(self.MAP_W)] for __ in range(self.MAP_H)]
-        self.visited = [[False for _ in range(self.MAP_W)] for __ in range(self.MAP_H)]
+        self.tiles = Grid(self.MAP_W, self.MAP_H, WALL_NORMAL)
+        self.visited = Grid(self.MAP_W, self.MAP_H, 0)
         self.spawn_tx = self.spawn_ty = 0
         self.shop_rect = pygame.Rect(0, 0, TILE*6, TILE*4)
         self.exit_rect = None
@@ -64,6 +94,11 @@ class Game:
         
         # Ломаемые стены
         self.breakable_walls = {}  # {(x, y): hp} - здоровье ломаемых стен
+        # Пререндер слоя тайлов
+        self.tile_layer = TileLayer()
+        self.minimap = MinimapCache()
+        # Поле путей преследователей к игроку
+        self.flow = FlowField()
 
         # Игрок
         self.player = {
@@ -86,11 +121,15 @@ class Game:
         # Объекты
         self.gold = 0
         self.inventory = []
+        # Суммарная стоимость инвентаря: ведётся в pick_up_items и sell_all
+        self.inventory_value = 0
         self.enemies = []
         self.treasures = []
         self.projectiles = []
-        self.particles = []
+        self.particles = ParticlePool()
         self.float_texts = []
+        # Пространственный индекс врагов, снарядов и сокровищ
+        self.spatial = SpatialHash()
 
         # Инициализация меню
         self._build_menu()
@@ -145,6 +184,15 @@ class Game:
             v = max(0.008, min(0.030, v))
             self.settings["treasure_density"] = v
 
+        def change_seed(delta):
+            self.settings["seed"] = max(0, self.settings["seed"] + delta)
+
+        def change_light_quality(delta):
+            keys = list(LIGHT_QUALITIES.keys())
+            idx = keys.index(self.settings["lighting_quality"])
+            idx = (idx + delta) % len(keys)
+            self.settings["lighting_quality"] = keys[idx]
+
         self.opt_items = [
             {"name": "Размер подземелья", "get": lambda: self.settings["size_name"],
              "left": lambda: change_size(-1), "right": lambda: change_size(+1)},
@@ -152,6 +200,10 @@ class Game:
              "left": lambda: change_diff(-1), "right": lambda: change_diff(+1)},
             {"name": "Плотность сокровищ", "get": lambda: f"{self.settings['treasure_density']:.3f}",
              "left": lambda: change_density(-1), "right": lambda: change_density(+1)},
+            {"name": "Сид карты", "get": lambda: str(self.settings["seed"]) if self.settings["seed"] else "случайный",
+             "left": lambda: change_seed(-1), "right": lambda: change_seed(+1)},
+            {"name": "Плавность света", "get": lambda: self.settings["lighting_quality"],
+             "left": lambda: change_light_quality(-1), "right": lambda: change_light_quality(+1)},
             {"name": "СТАРТ", "get": lambda: "", "left": lambda: None, "right": lambda: None},
         ]
 
@@ -167,26 +219,41 @@ class Game:
         self.float_texts.clear()
         self.gold = 0
         self.inventory.clear()
+        self.inventory_value = 0
         self.game_over = False
         self.win = False
         self.exit_open = False
 
+        # Свой поток случайных чисел на забег: один сид — один и тот же забег
+        seed = self.settings.get("seed") or random.randrange(1, 2**31)
+
         # Генерация мира и объектов (или загрузка карты, если выбран режим "custom_map")
+        floor = None
         if self.settings.get("use_custom_map"):
+            self.run_seed = seed
+            self.rng = random.Random(seed)
             try:
                 data = load_map(self.settings.get("custom_map_path", "maps/custom_map.json"))
                 apply_map_to_game(self, data)
+                # Гарантируем достижимость цели по золоту
+                try:
+                    ensure_target_gold_reachable(self, rng=self.rng)
+                except Exception:
+                    pass
             except Exception:
-                generate_new_floor(self)
+                floor = build_floor(self.settings, seed)
         else:
-            generate_new_floor(self)
-
-        # Гарантируем достижимость цели по золоту
-        try:
-            from mapgen import ensure_target_gold_reachable
-            ensure_target_gold_reachable(self)
-        except Exception:
-            pass
+            # Этаж, заранее собранный в фоне, либо синхронная генерация
+            floor = self.pregen.take(self.settings) or build_floor(self.settings, seed)
+        if floor is not None:
+            apply_floor(self, floor)
+        self.particles.seed(self.run_seed)
+        reindex_entities(self)
+        self.flow.invalidate()
+        self.timestep.reset()
+        self.cam_prev = None
+        self.render_alpha = 1.0
+        self.player.pop("prev", None)
 
         # Игрок и камеры
         diff = DIFFS[self.settings["difficulty"]]
@@ -202,7 +269,7 @@ class Game:
         self.player["pos"] = pygame.Vector2(self.spawn_tx*TILE + TILE/2, self.spawn_ty*TILE + TILE/2)
 
         # Туман у старта
-        self.visited = [[False for _ in range(self.MAP_W)] for __ in range(self.MAP_H)]
+        self.visited = Grid(self.MAP_W, self.MAP_H, 0)
         mark_visited_radius(self, self.spawn_tx, self.spawn_ty, 2)
 
         clamp_camera(self)
@@ -212,10 +279,20 @@ class Game:
         import os
         maps_dir = os.path.join(os.getcwd(), "maps")
         self.maps_list = []
+        self.maps_info = {}
         if os.path.isdir(maps_dir):
             for name in sorted(os.listdir(maps_dir)):
-                if name.lower().endswith(".json"):
+                if is_map_file(name):
                     self.maps_list.append(name)
+                    # Для бинарных карт шапка читается без разбора тайлов
+                    header = read_map_header(os.path.join(maps_dir, name))
+                    if header:
+                        self.maps_info[name] = header
+
+    def prefetch_floor(self):
+        # Пока игрок на экране смерти/победы или в опциях — готовим следующий этаж
+        if not self.settings.get("use_custom_map"):
+            self.pregen.request(self.settings)
 
     def missing_gold(self):
         return max(0, self.TARGET_GOLD - self.gold)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from config import WALL_NORMAL, WALL_BREAKABLE
+
+# Таблица «непроходимости» по значению клетки: SOLID[v] == 1 для стен
+SOLID = bytes(1 if v in (WALL_NORMAL, WALL_BREAKABLE) else 0 for v in range(256))
+_SOLID_NP = np.frombuffer(SOLID, dtype=np.uint8).astype(bool)
+
+
+class Grid:
+    """Плоская сетка байтов размером w x h (тайлы, туман войны).
+
+    Логически ведёт себя как прежний список списков: grid[ty][tx] читает и
+    пишет через представление строки. В горячих местах лучше get/set или
+    прямой доступ к cells[ty * w + tx]; array() отдаёт NumPy-представление
+    тех же данных (без копирования) для векторных операций.
+    """
+
+    __slots__ = ("w", "h", "cells", "_view")
+
+    def __init__(self, w, h, fill=0):
+        self.w = w
+        self.h = h
+        self.cells = bytearray([fill]) * (w * h)
+        self._view = memoryview(self.cells)
+
+    @classmethod
+    def from_rows(cls, rows):
+        h = len(rows)
+        w = len(rows[0]) if h else 0
+        grid = cls(w, h)
+        for ty, row in enumerate(rows):
+            grid.cells[ty * w:(ty + 1) * w] = bytes(int(v) for v in row)
+        return grid
+
+    def to_rows(self):
+        w = self.w
+        return [list(self.cells[ty * w:(ty + 1) * w]) for ty in range(self.h)]
+
+    def copy(self):
+        grid = Grid(self.w, self.h)
+        grid.cells[:] = self.cells
+        return grid
+
+    def __len__(self):
+        return self.h
+
+    def __getitem__(self, ty):
+        if not 0 <= ty < self.h:
+            raise IndexError(ty)
+        return self._view[ty * self.w:(ty + 1) * self.w]
+
+    def __iter__(self):
+        for ty in range(self.h):
+            yield self[ty]
+
+    def get(self, tx, ty):
+        return self.cells[ty * self.w + tx]
+
+    def set(self, tx, ty, value):
+        self.cells[ty * self.w + tx] = value
+
+    def fill(self, value):
+        self.cells[:] = bytes([value]) * len(self.cells)
+
+    def array(self):
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.h, self.w)
+
+    def solid(self, x0=0, y0=0, x1=None, y1=None):
+        # Булева маска стен (обычных и ломаемых), при необходимости — только окна [y0:y1, x0:x1]
+        return _SOLID_NP[self.array()[y0:y1, x0:x1]]
+
+    def wall_neighbour_counts(self):
+        # Число стен в окрестности 3x3 (включая саму клетку) для внутренних клеток
+        s = np.pad(self.solid().astype(np.uint8), 1)
+        h, w = self.h, self.w
+        return sum(s[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] for dy in (-1, 0, 1) for dx in (-1, 0, 1))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Безоконный прогон симуляции с фиксированным шагом.
+
+Работает на SDL-драйвере dummy (без дисплея), берёт ввод из сценария и
+крутит мир без ограничения FPS — для нагрузочных тестов, подбора баланса и
+регрессионных замеров.
+
+    python headless.py --ticks 20000 --size Большой --enemy-mult 4 --bot
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import random
+import time
+import pygame
+from config import SCREEN_W, SCREEN_H, SIM_DT, SIZES, DIFFS
+from game_state import Game
+from systems import step_simulation
+from render import draw_play_frame
+
+
+class KeyState(frozenset):
+    """Набор зажатых клавиш с интерфейсом результата pygame.key.get_pressed()."""
+
+    def __getitem__(self, key):
+        return key in self
+
+
+NO_KEYS = KeyState()
+
+
+def key_down(key):
+    return pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode="")
+
+
+def click(pos, button=1):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=button, pos=pos)
+
+
+class ScriptedInput:
+    """Ввод из записанного сценария.
+
+    frames — последовательность кадров (keys, events, mouse_pos): зажатые
+    клавиши, события кадра и позиция мыши на экране. После конца сценария
+    ввод пустой (или сценарий повторяется при loop=True).
+    """
+
+    def __init__(self, frames=(), loop=False):
+        self.frames = list(frames)
+        self.loop = loop
+
+    def __call__(self, tick, g):
+        if not self.frames or (tick >= len(self.frames) and not self.loop):
+            return [], NO_KEYS, (SCREEN_W // 2, SCREEN_H // 2)
+        keys, events, mouse_pos = self.frames[tick % len(self.frames)]
+        return list(events), KeyState(keys), mouse_pos
+
+
+class WanderInput:
+    """Бот для нагрузочных прогонов: бродит по карте и стреляет по ближайшему врагу."""
+
+    MOVES = (
+        (pygame.K_w,), (pygame.K_s,), (pygame.K_a,), (pygame.K_d,),
+        (pygame.K_w, pygame.K_a), (pygame.K_w, pygame.K_d),
+        (pygame.K_s, pygame.K_a), (pygame.K_s, pygame.K_d),
+    )
+
+    def __init__(self, seed=0, turn_every=45, shoot_every=12):
+        self.rng = random.Random(seed)
+        self.turn_every = turn_every
+        self.shoot_every = shoot_every
+        self.keys = NO_KEYS
+
+    def __call__(self, tick, g):
+        if tick % self.turn_every == 0:
+            self.keys = KeyState(self.rng.choice(self.MOVES))
+        events = []
+        mouse_pos = (SCREEN_W // 2, SCREEN_H // 2)
+        if tick % self.shoot_every == 0:
+            ppos = g.player["pos"]
+            near = g.spatial.query("enemies", ppos, 320)
+            if near:
+                target = min(near, key=lambda e: (e["pos"] - ppos).length_squared())["pos"]
+                mouse_pos = (int(target.x - g.cam.x), int(target.y - g.cam.y))
+                events.append(key_down(pygame.K_SPACE))
+        return events, self.keys, mouse_pos
+
+
+class HeadlessGame:
+    """Game без окна: step() продвигает мир ровно на dt."""
+
+    def __init__(self, settings=None, input_source=None, dt=SIM_DT, render=False, auto_restart=True):
+        pygame.display.init()
+        pygame.font.init()
+        screen = pygame.display.set_mode((SCREEN_W, SCREEN_H))
+        self.game = Game(screen, pygame.time.Clock(),
+                         pygame.font.Font(None, 18), pygame.font.Font(None, 24), pygame.font.Font(None, 36))
+        if settings:
+            self.game.settings.update(settings)
+        self.input = input_source or ScriptedInput()
+        self.dt = dt
+        self.render = render
+        self.auto_restart = auto_restart
+        self.ticks = 0
+        self.deaths = 0
+        self.wins = 0
+        self.game.new_run()
+
+    def step(self):
+        g = self.game
+        events, keys, mouse_pos = self.input(self.ticks, g)
+        step_simulation(g, self.dt, events, keys, mouse_pos)
+        if self.render:
+            draw_play_frame(g)
+        self.ticks += 1
+        if g.game_over or g.win:
+            if g.game_over:
+                self.deaths += 1
+            else:
+                self.wins += 1
+            if not self.auto_restart:
+                return False
+            g.new_run()
+        return True
+
+    def run(self, ticks):
+        start = time.perf_counter()
+        done = 0
+        while done < ticks:
+            done += 1
+            if not self.step():
+                break
+        wall = time.perf_counter() - start
+        return {
+            "ticks": done,
+            "sim_seconds": done * self.dt,
+            "wall_seconds": wall,
+            "ticks_per_second": done / wall if wall > 0 else float("inf"),
+            "deaths": self.deaths,
+            "wins": self.wins,
+            "enemies": len(self.game.enemies),
+            "treasures": len(self.game.treasures),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Безоконный прогон DunSell")
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--size", default="Средний", choices=[n for n, _, _ in SIZES])
+    parser.add_argument("--difficulty", default="Нормальная", choices=list(DIFFS.keys()))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--enemy-mult", type=float, default=0.0)
+    parser.add_argument("--map", default="", help="путь к карте вместо генерации")
+    parser.add_argument("--bot", action="store_true", help="бродить и стрелять вместо пустого ввода")
+    parser.add_argument("--render", action="store_true", help="рисовать кадры во внеэкранный буфер")
+    args = parser.parse_args()
+
+    n, w, h = next(s for s in SIZES if s[0] == args.size)
+    settings = {"size_name": n, "map_w": w, "map_h": h, "difficulty": args.difficulty,
+                "seed": args.seed, "enemy_mult": args.enemy_mult}
+    if args.map:
+        settings.update(use_custom_map=True, custom_map_path=args.map)
+    source = WanderInput(args.seed) if args.bot else ScriptedInput()
+    runner = HeadlessGame(settings, source, render=args.render)
+    stats = runner.run(args.ticks)
+    print(f"{stats['ticks']} тиков за {stats['wall_seconds']:.2f} с: "
+          f"{stats['ticks_per_second']:.0f} тиков/с (x{stats['ticks_per_second'] * SIM_DT:.1f} от реального времени), "
+          f"смертей {stats['deaths']}, побед {stats['wins']}, врагов {stats['enemies']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pygame
+from config import COL_RED, COL_GOLD, draw_round_rect
+from text_cache import render_text
+
+
+class Hud:
+    """Верхняя панель: HP, золото, инвентарь и цель.
+
+    Состояние панели хранится кортежем; пока оно не меняется, каждый кадр
+    блитится готовая поверхность. При изменении (подбор, продажа, урон)
+    панель пересобирается и version увеличивается.
+    """
+
+    HEIGHT = 48
+
+    def __init__(self):
+        self.state = None
+        self.version = 0
+        self.surf = None
+
+    def _state(self, g):
+        return (g.screen.get_width(), g.player["hp"], g.player["hp_max"], g.gold,
+                len(g.inventory), g.inventory_value, g.TARGET_GOLD)
+
+    def _compose(self, g):
+        W = g.screen.get_width()
+        panel = pygame.Surface((W, self.HEIGHT), pygame.SRCALPHA)
+        draw_round_rect(panel, pygame.Rect(10, 6, W-20, 36), (0,0,0,120), radius=12)
+        # HP
+        for i in range(g.player["hp_max"]):
+            x = 24 + i*20
+            col = COL_RED if i < g.player["hp"] else (80,80,80)
+            pygame.draw.circle(panel, col, (x, 24), 8)
+        # Золото
+        panel.blit(render_text(g.font, f"Золото: {g.gold}", COL_GOLD), (180, 14))
+        # Инвентарь
+        panel.blit(render_text(g.font, f"В инвентаре: {len(g.inventory)} шт. (~{g.inventory_value})", (200,230,255)), (330, 14))
+        # Цель
+        panel.blit(render_text(g.font, f"Цель: {g.TARGET_GOLD}", (200, 255, 200)), (620, 14))
+        self.surf = panel
+
+    def draw(self, g):
+        state = self._state(g)
+        if state != self.state:
+            self.state = state
+            self.version += 1
+            self._compose(g)
+        g.screen.blit(self.surf, (0, 0))
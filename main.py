@@ -1,16 +1,14 @@
 # -*- coding: utf-8 -*-
+import os
 import pygame
 import random
-from config import SCREEN_W, SCREEN_H, STATE_MENU, STATE_PLAY, STATE_DEAD, STATE_WIN, STATE_MAPS, STATE_EDITOR, STATE_OPTIONS, COL_GOLD
+from time import perf_counter
+from config import SCREEN_W, SCREEN_H, RENDER_FPS, STATE_MENU, STATE_PLAY, STATE_DEAD, STATE_WIN, STATE_MAPS, STATE_EDITOR, STATE_OPTIONS, COL_GOLD
 from editor import run_map_editor
 from game_state import Game
-from systems import (
-    clamp_camera, update_particles, update_float_texts,
-    handle_input, pick_up_items, enemy_ai_and_collisions,
-    update_projectiles, update_visited_by_player, check_exit
-)
+from text_cache import render_text
 from render import (
-    draw_world, draw_lighting, draw_ui,
+    draw_world, draw_lighting, draw_play_frame,
     draw_death_or_win_overlay, compute_death_win_button_rects
 )
 
@@ -61,7 +59,7 @@ def main():
     dt = 0.016
 
     while running:
-        dt = clock.tick(60) / 1000.0
+        dt = clock.tick(RENDER_FPS) / 1000.0
         events = pygame.event.get()
 
         # Общие события (выход)
@@ -101,10 +99,10 @@ def main():
 
             # Рендер меню
             screen.fill((16, 18, 24))
-            title = font_big.render("DunSell", True, (200, 230, 255))
+            title = render_text(font_big, "DunSell", (200, 230, 255))
             screen.blit(title, (SCREEN_W//2 - title.get_width()//2, 80))
 
-            desc = font_mid.render("Выбери настройки и нажми Enter, чтобы начать", True, (140, 150, 160))
+            desc = render_text(font_mid, "Выбери настройки и нажми Enter, чтобы начать", (140, 150, 160))
             screen.blit(desc, (SCREEN_W//2 - desc.get_width()//2, 120))
 
              # Обновление сплэш-надписи раз в несколько секунд
@@ -116,7 +114,7 @@ def main():
                 next_splash_change = now + 4000
 
             # Рисуем сплэш-надпись жёлтым и слегка повёрнутой
-            splash_img = font_mid.render(current_splash, True, COL_GOLD)
+            splash_img = render_text(font_mid, current_splash, COL_GOLD)
             splash_img = pygame.transform.rotate(splash_img, -12)
             splash_x = SCREEN_W//2 + title.get_width()//2 - splash_img.get_width()//2 + 80
             splash_y = 80 - 16
@@ -128,7 +126,7 @@ def main():
                 name = it["name"]
                 val = it["get"]()
                 text = f"{name}: {val}" if val != "" else name
-                img = font_mid.render(text, True, (230, 235, 240) if is_sel else (140, 150, 160))
+                img = render_text(font_mid, text, (230, 235, 240) if is_sel else (140, 150, 160))
                 x = SCREEN_W//2 - img.get_width()//2
                 y = base_y + i * 40
                 if is_sel:
@@ -155,12 +153,14 @@ def main():
                     elif e.key == pygame.K_RETURN:
                         if game.opt_sel == len(game.opt_items) - 1:  # СТАРТ
                             game.new_run()
-                        
+            if game.state == STATE_OPTIONS:
+                game.prefetch_floor()
+
             screen.fill((16, 18, 24))
-            title = font_big.render("Параметры перед стартом", True, (200, 230, 255))
+            title = render_text(font_big, "Параметры перед стартом", (200, 230, 255))
             screen.blit(title, (SCREEN_W//2 - title.get_width()//2, 80))
 
-            desc = font_mid.render("Выберите параметры, затем Enter на \"СТАРТ\"", True, (140, 150, 160))
+            desc = render_text(font_mid, "Выберите параметры, затем Enter на \"СТАРТ\"", (140, 150, 160))
             screen.blit(desc, (SCREEN_W//2 - desc.get_width()//2, 120))
 
             base_y = 180
@@ -169,7 +169,7 @@ def main():
                 name = it["name"]
                 val = it["get"]()
                 text = f"{name}: {val}" if val != "" else name
-                img = font_mid.render(text, True, (230, 235, 240) if is_sel else (140, 150, 160))
+                img = render_text(font_mid, text, (230, 235, 240) if is_sel else (140, 150, 160))
                 x = SCREEN_W//2 - img.get_width()//2
                 y = base_y + i * 40
                 if is_sel:
@@ -191,27 +191,29 @@ def main():
                         game.selected_map_idx = (game.selected_map_idx + 1) % max(1, len(game.maps_list))
                     elif e.key == pygame.K_RETURN and len(game.maps_list) > 0:
                         # Выбираем карту
-                        import os
                         name = game.maps_list[game.selected_map_idx]
                         game.settings["use_custom_map"] = True
                         game.settings["custom_map_path"] = os.path.join("maps", name)
                         game.new_run()
 
             screen.fill((16, 18, 24))
-            title = font_big.render("Мои карты", True, (200, 230, 255))
+            title = render_text(font_big, "Мои карты", (200, 230, 255))
             screen.blit(title, (SCREEN_W//2 - title.get_width()//2, 60))
-            hint = font_small.render("Esc — назад, Enter — выбрать карту", True, (140, 150, 160))
+            hint = render_text(font_small, "Esc — назад, Enter — выбрать карту", (140, 150, 160))
             screen.blit(hint, (SCREEN_W//2 - hint.get_width()//2, 96))
 
             base_y = 140
             if not game.maps_list:
-                empty = font_mid.render("Нет файлов в папке maps", True, (160, 160, 170))
+                empty = render_text(font_mid, "Нет файлов в папке maps", (160, 160, 170))
                 screen.blit(empty, (SCREEN_W//2 - empty.get_width()//2, base_y))
             else:
                 for i, name in enumerate(game.maps_list):
                     is_sel = (i == game.selected_map_idx)
-                    label = name[:-5] if name.lower().endswith('.json') else name
-                    img = font_mid.render(label, True, (230, 235, 240) if is_sel else (140, 150, 160))
+                    label = os.path.splitext(name)[0]
+                    info = game.maps_info.get(name)
+                    if info:
+                        label += f"  ({info['map_w']}x{info['map_h']}, цель {info.get('target_gold', '?')})"
+                    img = render_text(font_mid, label, (230, 235, 240) if is_sel else (140, 150, 160))
                     x = SCREEN_W//2 - img.get_width()//2
                     y = base_y + i * 34
                     if is_sel:
@@ -223,30 +225,25 @@ def main():
 
         # Состояние: игра
         if game.state == STATE_PLAY:
-            handle_input(game, dt, events)
-            update_visited_by_player(game)
-
-            clamp_camera(game)
-            pick_up_items(game)
-            enemy_ai_and_collisions(game, dt)
-            update_projectiles(game, dt)
-            update_particles(game, dt)
-            update_float_texts(game, dt)
-            check_exit(game)
+            profiling = game.profiler.enabled
+            if profiling:
+                frame_start = perf_counter()
+            game.timestep.advance(game, dt, events)
 
             if game.game_over:
                 game.state = STATE_DEAD
             elif game.win:
                 game.state = STATE_WIN
 
-            draw_world(game)
-            draw_lighting(game)
-            draw_ui(game)
+            draw_play_frame(game)
             pygame.display.flip()
+            if profiling:
+                game.profiler.end_frame(perf_counter() - frame_start)
             continue
 
         # Состояния: смерть / победа
         if game.state in (STATE_DEAD, STATE_WIN):
+            game.prefetch_floor()
             buttons = compute_death_win_button_rects(game)
             for e in events:
                 if e.type == pygame.KEYDOWN:
@@ -270,6 +267,7 @@ def main():
             pygame.display.flip()
             continue
 
+    game.pregen.shutdown()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 import json
+import mmap
 import os
+import struct
+import zlib
 import pygame
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from config import TILE
+from grid import Grid
 
 
 def ensure_maps_dir() -> str:
@@ -12,19 +16,116 @@ def ensure_maps_dir() -> str:
     return maps_dir
 
 
+# Бинарный формат карты (.dsm):
+#   заголовок фиксированной длины  <4sHHIIII: сигнатура, версия, флаги,
+#                                  map_w, map_h, длина JSON-шапки, длина тайлов
+#   JSON-шапка (utf-8)             всё, кроме тайлов: магазин, выход, спавн, объекты...
+#   тайлы                          map_w * map_h байт построчно (с флагом — через zlib)
+BINARY_EXT = ".dsm"
+MAP_EXTS = (".json", BINARY_EXT)
+BINARY_MAGIC = b"DSM1"
+BINARY_VERSION = 1
+BINARY_ZLIB = 1
+_BIN_HEAD = struct.Struct("<4sHHIIII")
+
+
+def is_map_file(name: str) -> bool:
+    return name.lower().endswith(MAP_EXTS)
+
+
+def _replace_file(filepath: str, mode: str, write, **kwargs) -> None:
+    # Запись во временный файл рядом и атомарная подмена: неудачное
+    # сохранение не портит уже существующую карту
+    tmp = filepath + ".tmp"
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            write(f)
+        os.replace(tmp, filepath)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
 def save_map(filepath: str, data: Dict[str, Any]) -> None:
     ensure_maps_dir()
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    if filepath.lower().endswith(BINARY_EXT):
+        save_map_binary(filepath, data)
+        return
+    if isinstance(data.get("tiles"), Grid):
+        # Карта, прочитанная из .dsm, хранит тайлы сеткой
+        data = dict(data, tiles=data["tiles"].to_rows())
+    _replace_file(filepath, "w", lambda f: json.dump(data, f, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def save_map_binary(filepath: str, data: Dict[str, Any], compress: bool = True) -> None:
+    tiles = data["tiles"]
+    grid = tiles if isinstance(tiles, Grid) else Grid.from_rows(tiles)
+    header = {k: v for k, v in data.items() if k != "tiles"}
+    header["map_w"], header["map_h"] = grid.w, grid.h
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = bytes(grid.cells)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 6)
+        flags |= BINARY_ZLIB
+    def write(f):
+        f.write(_BIN_HEAD.pack(BINARY_MAGIC, BINARY_VERSION, flags, grid.w, grid.h, len(head), len(payload)))
+        f.write(head)
+        f.write(payload)
+    _replace_file(filepath, "wb", write)
+
+
+def _read_binary(filepath: str, with_tiles: bool) -> Dict[str, Any]:
+    # Файл отображается в память: для шапки читаются только первые байты
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, flags, w, h, head_len, tiles_len = _BIN_HEAD.unpack_from(mm, 0)
+        if magic != BINARY_MAGIC or version > BINARY_VERSION:
+            raise ValueError(f"{filepath}: неизвестный формат карты")
+        start = _BIN_HEAD.size
+        data = json.loads(mm[start:start + head_len].decode("utf-8"))
+        data["map_w"], data["map_h"] = w, h
+        if with_tiles:
+            start += head_len
+            payload = mm[start:start + tiles_len]
+            if flags & BINARY_ZLIB:
+                payload = zlib.decompress(payload)
+            if len(payload) != w * h:
+                raise ValueError(f"{filepath}: повреждены тайлы")
+            grid = Grid(w, h)
+            grid.cells[:] = payload
+            data["tiles"] = grid
+    return data
+
+
+def _is_binary(filepath: str) -> bool:
+    with open(filepath, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
 
 
 def load_map(filepath: str) -> Dict[str, Any]:
+    if _is_binary(filepath):
+        return _read_binary(filepath, with_tiles=True)
     with open(filepath, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def read_map_header(filepath: str) -> Optional[Dict[str, Any]]:
+    # Шапка бинарной карты без декодирования тайлов; для JSON — None
+    try:
+        if _is_binary(filepath):
+            return _read_binary(filepath, with_tiles=False)
+    except (OSError, ValueError, struct.error):
+        pass
+    return None
+
+
+def convert_map(src: str, dst: str) -> None:
+    save_map(dst, load_map(src))
+
+
 def serialize_game_to_map(g) -> Dict[str, Any]:
-    tiles = g.tiles
+    tiles = g.tiles.to_rows()
     treasures = []
     for it in g.treasures:
         tx = int(it["pos"].x // TILE)
@@ -60,7 +161,7 @@ def serialize_game_to_map(g) -> Dict[str, Any]:
         "shop": shop,
         "spawn": spawn,
         "target_gold": g.TARGET_GOLD,
-        "breakable_walls": g.breakable_walls,
+        "breakable_walls": {f"({x}, {y})": hp for (x, y), hp in g.breakable_walls.items()},
     }
 
 
@@ -68,7 +169,8 @@ def apply_map_to_game(g, data: Dict[str, Any]) -> None:
     from mapgen import world_to_tile
     g.MAP_W = int(data.get("map_w", g.MAP_W))
     g.MAP_H = int(data.get("map_h", g.MAP_H))
-    g.tiles = data["tiles"]
+    tiles = data["tiles"]
+    g.tiles = tiles.copy() if isinstance(tiles, Grid) else Grid.from_rows(tiles)
 
     g.treasures.clear()
     for it in data.get("treasures", []):
@@ -123,3 +225,11 @@ def apply_map_to_game(g, data: Dict[str, Any]) -> None:
                 converted_walls[key_str] = hp
         g.breakable_walls = converted_walls
 
+
+if __name__ == "__main__":
+    # Конвертация: python map_io.py maps/DS_map_KingCity.json maps/DS_map_KingCity.dsm
+    import sys
+    if len(sys.argv) != 3:
+        print("usage: python map_io.py SRC DST  (.json <-> .dsm)")
+        sys.exit(1)
+    convert_map(sys.argv[1], sys.argv[2])
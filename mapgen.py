@@ -2,7 +2,10 @@
 import pygame
 import random
 import math
-from config import TILE, TREASURE_TYPES, DIFFS, WALL_NORMAL, WALL_BREAKABLE
+import numpy as np
+from config import TILE, TREASURE_TYPES, DIFFS, WALL_NORMAL
+from grid import Grid, SOLID
+from spatial import SpatialHash
 
 def in_bounds(g, tx, ty):
     return 0 <= tx < g.MAP_W and 0 <= ty < g.MAP_H
@@ -11,75 +14,152 @@ def world_to_tile(x, y):
     return int(x // TILE), int(y // TILE)
 
 def is_wall_at_world(g, x, y):
-    tx, ty = world_to_tile(x, y)
-    if not in_bounds(g, tx, ty): return True
-    return g.tiles[ty][tx] in (WALL_NORMAL, WALL_BREAKABLE)
+    tx = int(x // TILE); ty = int(y // TILE)
+    if tx < 0 or ty < 0 or tx >= g.MAP_W or ty >= g.MAP_H: return True
+    return SOLID[g.tiles.cells[ty * g.MAP_W + tx]] == 1
+
+def _blocked(g, x, y, radius):
+    # Стена в любой из четырёх точек (x±radius, y), (x, y±radius)
+    W = g.MAP_W
+    tx = int(x // TILE); ty = int(y // TILE)
+    tx0 = int((x - radius) // TILE); tx1 = int((x + radius) // TILE)
+    ty0 = int((y - radius) // TILE); ty1 = int((y + radius) // TILE)
+    if tx0 < 0 or ty0 < 0 or tx1 >= W or ty1 >= g.MAP_H: return True
+    cells = g.tiles.cells
+    row = ty * W
+    return (SOLID[cells[row + tx0]] or SOLID[cells[row + tx1]] or
+            SOLID[cells[ty0 * W + tx]] or SOLID[cells[ty1 * W + tx]]) == 1
+
+def can_stand_at(g, x, y, radius=10):
+    # Дешёвая проверка одной точки без скольжения вдоль стен
+    return not _blocked(g, x, y, radius)
 
 def collide_move(g, pos, move, radius=10):
-    new = pos + move
-    test = pygame.Vector2(new.x, pos.y)
-    if (is_wall_at_world(g, test.x - radius, test.y) or
-        is_wall_at_world(g, test.x + radius, test.y) or
-        is_wall_at_world(g, test.x, test.y - radius) or
-        is_wall_at_world(g, test.x, test.y + radius)):
-        test.x = pos.x
-    test2 = pygame.Vector2(test.x, new.y)
-    if (is_wall_at_world(g, test2.x - radius, test2.y) or
-        is_wall_at_world(g, test2.x + radius, test2.y) or
-        is_wall_at_world(g, test2.x, test2.y - radius) or
-        is_wall_at_world(g, test2.x, test2.y + radius)):
-        test2.y = pos.y
-    return test2
-
-def carve_random_walk(g, steps, rooms, room_size):
-    g.tiles = [[WALL_NORMAL for _ in range(g.MAP_W)] for __ in range(g.MAP_H)]
+    nx = pos.x + move.x
+    ny = pos.y + move.y
+    x = pos.x if _blocked(g, nx, pos.y, radius) else nx
+    y = pos.y if _blocked(g, x, ny, radius) else ny
+    return pygame.Vector2(x, y)
+
+class FloorCancelled(Exception):
+    """Генерация этажа прервана: настройки сменились, этаж больше не нужен."""
+
+def check_cancelled(cancelled):
+    # Точка прерывания между этапами генерации (cancelled — функция или None)
+    if cancelled is not None and cancelled():
+        raise FloorCancelled()
+
+def floor_tile_list(g):
+    # Все клетки пола в порядке строк: [(tx, ty), ...]
+    ys, xs = np.nonzero(g.tiles.array() == 0)
+    return list(zip(xs.tolist(), ys.tolist()))
+
+def _legacy_smooth_pass(tiles, solid):
+    # Один проход старого правила «стена с <= 3 стенами в окрестности 3x3
+    # становится полом», с тем же порядком обхода (строка за строкой,
+    # слева направо, на месте). Каждая строка видит уже обновлённую
+    # предыдущую строку и обновлённого левого соседа; зависимость от
+    # левого соседа разворачивается протяжкой значений вправо.
+    H, W = solid.shape
+    if H < 3 or W < 3:
+        return
+    cols = np.arange(W - 1)
+    s8 = solid.view(np.uint8)
+    for y in range(1, H - 1):
+        # Суммы по вертикали 3x1 (верхняя строка уже обновлена)
+        v = s8[y - 1] + s8[y] + s8[y + 1]
+        # S — число стен в 3x3 без учёта обновлений в текущей строке
+        S = v[:-2] + v[1:-1] + v[2:]
+        w = solid[y, 1:-1]
+        # Сосед слева мог только что стать полом (-1). Тогда при S == 4
+        # результат совпадает с результатом соседа, иначе определён сразу.
+        chained = w & (S == 4)
+        val = np.empty(W - 1, dtype=bool)
+        val[0] = False  # граничная клетка x = 0 не меняется
+        val[1:] = w & (S <= 3)
+        det = np.empty(W - 1, dtype=bool)
+        det[0] = True
+        det[1:] = ~chained
+        src = np.where(det, cols, 0)
+        np.maximum.accumulate(src, out=src)
+        flip = val[src][1:]
+        if flip.any():
+            solid[y, 1:-1] &= ~flip
+            tiles[y, 1:-1][flip] = 0
+
+def smooth_walls(grid, passes=2, rule=None, cancelled=None):
+    """Клеточный автомат сглаживания стен по окрестности 3x3.
+
+    Без rule повторяет исходный проход «<= 3 стен -> пол» побайтно
+    (обновление на месте в порядке обхода строк). rule(walls, counts)
+    задаёт своё правило: по булевой маске стен и числу стен в 3x3
+    (включая саму клетку) внутренних клеток возвращает новую маску стен;
+    такие проходы применяются синхронно, а ставшие стенами клетки
+    получают WALL_NORMAL. cancelled проверяется перед каждым проходом.
+    """
+    tiles = grid.array()
+    solid = grid.solid()
+    for _ in range(passes):
+        check_cancelled(cancelled)
+        if rule is None:
+            _legacy_smooth_pass(tiles, solid)
+            continue
+        s8 = solid.view(np.uint8)
+        v = s8[:-2] + s8[1:-1] + s8[2:]
+        counts = v[:, :-2] + v[:, 1:-1] + v[:, 2:]
+        inner = solid[1:-1, 1:-1]
+        new = np.asarray(rule(inner.copy(), counts), dtype=bool)
+        t = tiles[1:-1, 1:-1]
+        t[inner & ~new] = 0
+        t[~inner & new] = WALL_NORMAL
+        solid[1:-1, 1:-1] = new
+
+def carve_random_walk(g, steps, rooms, room_size, smooth_passes=2, smooth_rule=None, rng=random):
+    g.tiles = Grid(g.MAP_W, g.MAP_H, WALL_NORMAL)
+    tiles = g.tiles.array()
+    cells = g.tiles.cells
+    W = g.MAP_W
     cx, cy = g.MAP_W // 2, g.MAP_H // 2
 
     # Комнаты
     for _ in range(rooms):
-        rw = random.randint(room_size, room_size + 5)
-        rh = random.randint(room_size, room_size + 5)
-        rx = max(2, min(g.MAP_W - rw - 2, cx + random.randint(-12, 12)))
-        ry = max(2, min(g.MAP_H - rh - 2, cy + random.randint(-8, 8)))
-        for yy in range(ry, ry + rh):
-            for xx in range(rx, rx + rw):
-                g.tiles[yy][xx] = 0
+        rw = rng.randint(room_size, room_size + 5)
+        rh = rng.randint(room_size, room_size + 5)
+        rx = max(2, min(g.MAP_W - rw - 2, cx + rng.randint(-12, 12)))
+        ry = max(2, min(g.MAP_H - rh - 2, cy + rng.randint(-8, 8)))
+        tiles[ry:ry + rh, rx:rx + rw] = 0
 
     x, y = cx, cy
+    choice = rng.choice
+    dirs = [(1,0), (-1,0), (0,1), (0,-1)]
+    x_max, y_max = g.MAP_W - 2, g.MAP_H - 2
     for _ in range(steps):
-        g.tiles[y][x] = 0
-        dir = random.choice([(1,0), (-1,0), (0,1), (0,-1)])
-        x = max(1, min(g.MAP_W - 2, x + dir[0]))
-        y = max(1, min(g.MAP_H - 2, y + dir[1]))
-        g.tiles[y][x] = 0
+        cells[y * W + x] = 0
+        dx, dy = choice(dirs)
+        x += dx; y += dy
+        if x < 1: x = 1
+        elif x > x_max: x = x_max
+        if y < 1: y = 1
+        elif y > y_max: y = y_max
+        cells[y * W + x] = 0
 
     # Сглаживание
-    for _ in range(2):
-        for yy in range(1, g.MAP_H - 1):
-            for xx in range(1, g.MAP_W - 1):
-                n = 0
-                for dy in (-1,0,1):
-                    for dx in (-1,0,1):
-                        if g.tiles[yy+dy][xx+dx] in (WALL_NORMAL, WALL_BREAKABLE):
-                            n += 1
-                if n <= 3:
-                    g.tiles[yy][xx] = 0
+    cancelled = getattr(g, "cancelled", None)
+    smooth_walls(g.tiles, passes=smooth_passes, rule=smooth_rule, cancelled=cancelled)
+    check_cancelled(cancelled)
 
     # Стартовая комната
-    for sy in range(cy - 4, cy + 5):
-        for sx in range(cx - 5, cx + 6):
-            if in_bounds(g, sx, sy):
-                g.tiles[sy][sx] = 0
+    tiles[max(0, cy - 4):cy + 5, max(0, cx - 5):cx + 6] = 0
 
     # Магазин у спавна
     g.shop_rect.x = (cx - 3) * TILE
     g.shop_rect.y = (cy - 2) * TILE
     return cx, cy
 
-def spawn_treasures_by_density(g, density):
+def spawn_treasures_by_density(g, density, rng=random):
     g.treasures.clear()
-    floor_tiles = [(tx, ty) for ty in range(g.MAP_H) for tx in range(g.MAP_W) if g.tiles[ty][tx] == 0]
-    random.shuffle(floor_tiles)
+    floor_tiles = floor_tile_list(g)
+    rng.shuffle(floor_tiles)
     num = int(len(floor_tiles) * density)
     weights = [t["weight"] for t in TREASURE_TYPES]
     i = 0
@@ -89,18 +169,18 @@ def spawn_treasures_by_density(g, density):
             continue
         g.treasures.append({
             "pos": pygame.Vector2(tx * TILE + TILE / 2, ty * TILE + TILE / 2),
-            "type": random.choices(range(len(TREASURE_TYPES)), weights=weights)[0]
+            "type": rng.choices(range(len(TREASURE_TYPES)), weights=weights)[0]
         })
         i += 1
 
-def ensure_target_gold_reachable(g):
+def ensure_target_gold_reachable(g, rng=random):
     # Гарантируем, что суммарная ценность сокровищ на карте >= TARGET_GOLD
     from config import TREASURE_TYPES
     current = sum(TREASURE_TYPES[it["type"]]["value"] for it in g.treasures)
     if current >= g.TARGET_GOLD:
         return
-    floor_tiles = [(tx, ty) for ty in range(g.MAP_H) for tx in range(g.MAP_W) if g.tiles[ty][tx] == 0]
-    random.shuffle(floor_tiles)
+    floor_tiles = floor_tile_list(g)
+    rng.shuffle(floor_tiles)
     # Размещаем самые ценные сначала
     value_sorted = sorted(list(enumerate(TREASURE_TYPES)), key=lambda kv: kv[1]["value"], reverse=True)
     used = set((int(it["pos"].x // TILE), int(it["pos"].y // TILE)) for it in g.treasures)
@@ -121,61 +201,60 @@ def ensure_target_gold_reachable(g):
         if current >= g.TARGET_GOLD:
             break
 
-def spawn_enemies_scaled(g, base_num, diff):
+def spawn_enemies_scaled(g, base_num, diff, rng=random):
     g.enemies.clear()
     target_num = max(4, int(base_num * diff["enemy_mult"]))
     tries = 0
+    index = SpatialHash()
     def overlaps_existing(px, py):
-        for e in g.enemies:
-            if (e["pos"].x - px)**2 + (e["pos"].y - py)**2 < (24**2):  # минимум 24px расстояния
-                return True
-        return False
+        return bool(index.query("enemies", pygame.Vector2(px, py), 24))  # минимум 24px расстояния
 
     while len(g.enemies) < target_num and tries < target_num * 400:
         tries += 1
-        tx = random.randrange(2, g.MAP_W - 2)
-        ty = random.randrange(2, g.MAP_H - 2)
-        if g.tiles[ty][tx] == 0 and (abs(tx - g.spawn_tx) + abs(ty - g.spawn_ty)) > 8:
+        tx = rng.randrange(2, g.MAP_W - 2)
+        ty = rng.randrange(2, g.MAP_H - 2)
+        if g.tiles.get(tx, ty) == 0 and (abs(tx - g.spawn_tx) + abs(ty - g.spawn_ty)) > 8:
             px = tx * TILE + TILE / 2
             py = ty * TILE + TILE / 2
             if overlaps_existing(px, py):
                 continue
             kind = "chaser"
-            if random.random() < diff["spitter_chance"]:
+            if rng.random() < diff["spitter_chance"]:
                 kind = "spitter"
             g.enemies.append({
                 "pos": pygame.Vector2(px, py),
                 "hp": 3 if kind == "chaser" else 2,
-                "t": random.random() * 10.0,
+                "t": rng.random() * 10.0,
                 "kind": kind,
                 "state": "wander",
-                "atk_cd": random.uniform(0.0, 1.2),
+                "atk_cd": rng.uniform(0.0, 1.2),
             })
+            index.insert("enemies", g.enemies[-1])
 
     # Если карта пользовательская и уже содержит врагов, не добавляем сверх указанного в файле
     # (допускаем их как есть, но гарантируем минимальные дистанции лёгким раздвижением)
-    i = 0
-    while i < len(g.enemies):
-        j = i + 1
-        while j < len(g.enemies):
-            a = g.enemies[i]; b = g.enemies[j]
+    order = {id(e): i for i, e in enumerate(g.enemies)}
+    for a in g.enemies:
+        for b in index.query("enemies", a["pos"], 20):
+            if order[id(b)] <= order[id(a)]:
+                continue
             delta = a["pos"] - b["pos"]
             if delta.length_squared() < (20*20):
                 delta = delta if delta.length() != 0 else pygame.Vector2(1, 0)
                 delta = delta.normalize() * 2
                 a["pos"] += delta
                 b["pos"] -= delta
-            j += 1
-        i += 1
+                index.move("enemies", a)
+                index.move("enemies", b)
 
-def spawn_exit_far(g):
+def spawn_exit_far(g, rng=random):
     g.exit_rect = None
     best = None
     best_d = -1
     for _ in range(1200):
-        tx = random.randrange(1, g.MAP_W - 1)
-        ty = random.randrange(1, g.MAP_H - 1)
-        if g.tiles[ty][tx] == 0:
+        tx = rng.randrange(1, g.MAP_W - 1)
+        ty = rng.randrange(1, g.MAP_H - 1)
+        if g.tiles.get(tx, ty) == 0:
             d = abs(tx - g.spawn_tx) + abs(ty - g.spawn_ty)
             if d > best_d:
                 best_d = d
@@ -188,17 +267,66 @@ def generate_new_floor(g):
     steps = g.MAP_W * g.MAP_H // 2
     rooms = 7
     room_size = 6
-    g.spawn_tx, g.spawn_ty = carve_random_walk(g, steps, rooms, room_size)
+    g.spawn_tx, g.spawn_ty = carve_random_walk(g, steps, rooms, room_size,
+                                               smooth_passes=g.settings.get("smooth_passes", 2), rng=g.rng)
 
-    # Настройки сложности
+    # Настройки сложности (enemy_mult в настройках — переопределение для нагрузочных прогонов)
     diff = DIFFS[g.settings["difficulty"]]
+    if g.settings.get("enemy_mult"):
+        diff = dict(diff, enemy_mult=g.settings["enemy_mult"])
 
     # Цель по золоту
     base_target = int((g.MAP_W * g.MAP_H) * 0.12)
     g.TARGET_GOLD = max(200, int(base_target * diff["target_mult"]))
 
     # Сокровища, враги, выход
-    spawn_treasures_by_density(g, g.settings["treasure_density"])
+    spawn_treasures_by_density(g, g.settings["treasure_density"], rng=g.rng)
+    check_cancelled(getattr(g, "cancelled", None))
     base_enemies = max(8, (g.MAP_W * g.MAP_H) // 160)
-    spawn_enemies_scaled(g, base_enemies, diff)
-    spawn_exit_far(g)
\ No newline at end of file
+    spawn_enemies_scaled(g, base_enemies, diff, rng=g.rng)
+    spawn_exit_far(g, rng=g.rng)
+
+class FloorDraft:
+    """Самостоятельный этаж: те же поля, что generate_new_floor пишет в Game.
+
+    Позволяет собрать этаж вне игрового объекта (в том числе в фоновом
+    потоке) и затем перенести его в игру через apply_floor. Если задан
+    cancelled, генерация между этапами проверяет его и при истине бросает
+    FloorCancelled.
+    """
+
+    def __init__(self, settings, seed, cancelled=None):
+        self.cancelled = cancelled
+        self.settings = dict(settings)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.MAP_W = self.settings["map_w"]
+        self.MAP_H = self.settings["map_h"]
+        self.tiles = None
+        self.treasures = []
+        self.enemies = []
+        self.shop_rect = pygame.Rect(0, 0, TILE*6, TILE*4)
+        self.exit_rect = None
+        self.spawn_tx = self.spawn_ty = 0
+        self.TARGET_GOLD = 500
+
+def build_floor(settings, seed, cancelled=None):
+    draft = FloorDraft(settings, seed, cancelled)
+    generate_new_floor(draft)
+    check_cancelled(cancelled)
+    ensure_target_gold_reachable(draft, rng=draft.rng)
+    return draft
+
+def apply_floor(g, draft):
+    g.MAP_W, g.MAP_H = draft.MAP_W, draft.MAP_H
+    g.tiles = draft.tiles
+    g.treasures[:] = draft.treasures
+    g.enemies[:] = draft.enemies
+    g.shop_rect.update(draft.shop_rect)
+    g.exit_rect = draft.exit_rect
+    g.spawn_tx, g.spawn_ty = draft.spawn_tx, draft.spawn_ty
+    g.TARGET_GOLD = draft.TARGET_GOLD
+    g.breakable_walls = {}
+    # Поток случайных чисел продолжается с того места, где закончилась генерация
+    g.run_seed = draft.seed
+    g.rng = draft.rng
\ No newline at end of file
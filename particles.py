@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pygame
+import numpy as np
+
+PARTICLE_CAPACITY = 4096
+PARTICLE_DAMPING = 0.92
+
+
+class ParticlePool:
+    """Пул частиц фиксированной ёмкости в виде структуры массивов.
+
+    Живые частицы всегда лежат в начале массивов [0, count): мёртвые
+    удаляются пачкой через булеву маску, интегрирование и затухание
+    считаются векторно, отрисовка идёт одним вызовом Surface.blits.
+    """
+
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.size = np.zeros(capacity, dtype=np.uint8)
+        # Номер заранее залитого спрайта (цвет, размер) для пакетной отрисовки
+        self.sprite = np.zeros(capacity, dtype=np.int32)
+        self.rng = np.random.default_rng(seed)
+        self._sprite_ids = {}
+        self._sprites = []
+
+    def __len__(self):
+        return self.count
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def clear(self):
+        self.count = 0
+
+    def _sprite_id(self, color, size):
+        key = (tuple(color[:3]), int(size))
+        sid = self._sprite_ids.get(key)
+        if sid is None:
+            surf = pygame.Surface((key[1], key[1]))
+            surf.fill(key[0])
+            sid = len(self._sprites)
+            self._sprites.append(surf)
+            self._sprite_ids[key] = sid
+        return sid
+
+    def emit(self, pos, color, n=10, speed=70):
+        # При переполнении лишние частицы просто не создаются
+        n = min(n, self.capacity - self.count)
+        if n <= 0:
+            return
+        a, b = self.count, self.count + n
+        ang = self.rng.random(n) * np.float32(np.pi * 2)
+        spd = self.rng.uniform(0.2, 1.0, n) * speed
+        self.pos[a:b, 0] = pos[0]
+        self.pos[a:b, 1] = pos[1]
+        self.vel[a:b, 0] = np.cos(ang) * spd
+        self.vel[a:b, 1] = np.sin(ang) * spd
+        self.life[a:b] = self.rng.uniform(0.4, 0.9, n)
+        self.color[a:b] = color[:3]
+        sizes = self.rng.integers(2, 5, n)
+        self.size[a:b] = sizes
+        for s in (2, 3, 4):
+            self.sprite[a:b][sizes == s] = self._sprite_id(color, s)
+        self.count = b
+
+    def update(self, dt):
+        n = self.count
+        if n == 0:
+            return
+        life = self.life[:n]
+        life -= dt
+        alive = life > 0
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            n = len(keep)
+            for arr in (self.pos, self.vel, self.life, self.color, self.size, self.sprite):
+                arr[:n] = arr[keep]
+            self.count = n
+        self.pos[:n] += self.vel[:n] * dt
+        self.vel[:n] *= PARTICLE_DAMPING
+
+    def draw(self, surf, cam):
+        n = self.count
+        if n == 0:
+            return
+        half = self.size[:n] // 2
+        xs = (self.pos[:n, 0] - cam.x).astype(np.int32) - half
+        ys = (self.pos[:n, 1] - cam.y).astype(np.int32) - half
+        w, h = surf.get_size()
+        vis = (xs > -4) & (xs < w) & (ys > -4) & (ys < h)
+        sprites = self._sprites
+        surf.blits(
+            [(sprites[sid], (x, y)) for sid, x, y in zip(self.sprite[:n][vis].tolist(), xs[vis].tolist(), ys[vis].tolist())],
+            doreturn=False,
+        )
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from mapgen import build_floor
+
+# Настройки, от которых зависит сгенерированный этаж
+FLOOR_KEYS = ("map_w", "map_h", "difficulty", "treasure_density", "smooth_passes", "seed", "enemy_mult")
+# Сколько секунд настройки должны не меняться, прежде чем начнётся генерация
+PREFETCH_DELAY = 0.3
+
+
+def floor_key(settings):
+    return tuple(settings.get(k) for k in FLOOR_KEYS)
+
+
+class FloorPrefetcher:
+    """Спекулятивная генерация следующего этажа в фоновом потоке.
+
+    request() вызывается каждый кадр; генерация под текущие настройки
+    запускается, когда они не менялись delay секунд (пока игрок листает
+    опции, ничего не строится). Поток один на всё время игры: устаревшая
+    генерация получает сигнал отмены и прерывается на ближайшем этапе
+    build_floor. take() отдаёт готовый этаж, если он построен под те же
+    настройки, иначе None — тогда этаж генерируется синхронно.
+    """
+
+    def __init__(self, delay=PREFETCH_DELAY, clock=time.monotonic):
+        self.delay = delay
+        self.clock = clock
+        self._executor = None
+        self._key = None       # настройки запущенной генерации
+        self._future = None
+        self._cancel = None    # threading.Event запущенной генерации
+        self._wanted = None    # последние запрошенные настройки и с какого момента
+        self._since = 0.0
+
+    def request(self, settings):
+        key = floor_key(settings)
+        now = self.clock()
+        if key != self._wanted:
+            self._wanted, self._since = key, now
+        if self._future is not None:
+            if self._key == key:
+                return
+            self._discard()
+        if now - self._since < self.delay:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="floor-pregen")
+        seed = settings.get("seed") or random.randrange(1, 2**31)
+        self._key = key
+        self._cancel = threading.Event()
+        self._future = self._executor.submit(build_floor, dict(settings), seed, self._cancel.is_set)
+
+    def take(self, settings):
+        future, key = self._future, self._key
+        self._wanted = None
+        if future is None:
+            return None
+        if key != floor_key(settings):
+            self._discard()
+            return None
+        self._future = self._key = self._cancel = None
+        try:
+            # Если генерация ещё идёт — дожидаемся её, это быстрее, чем начинать заново
+            return future.result()
+        except Exception:
+            return None
+
+    def _discard(self):
+        # Устаревший этаж: ещё не начатую генерацию снимаем из очереди,
+        # идущую просим прерваться — поток освободится на следующем этапе
+        self._future.cancel()
+        self._cancel.set()
+        self._future = self._key = self._cancel = None
+
+    def shutdown(self):
+        if self._future is not None:
+            self._discard()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._wanted = None
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+import numpy as np
+
+# Окно усреднения, кадров
+PROFILER_WINDOW = 120
+# Бюджет кадра при 60 FPS, мс
+FRAME_BUDGET_MS = 1000.0 / 60
+
+
+class FrameProfiler:
+    """Скользящие замеры времени по системам кадра (оверлей F3).
+
+    Пока профайлер выключен, step_simulation и draw_play_frame идут по
+    обычному пути без таймеров: вся цена — одна проверка enabled за кадр.
+    """
+
+    def __init__(self, window=PROFILER_WINDOW):
+        self.window = window
+        self.enabled = False
+        self.samples = {}                  # имя -> deque длительностей, с
+        self.frames = deque(maxlen=window)  # полное время кадра, с
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        # Старые замеры после паузы только исказили бы окно
+        self.samples.clear()
+        self.frames.clear()
+
+    def record(self, name, seconds):
+        q = self.samples.get(name)
+        if q is None:
+            q = self.samples[name] = deque(maxlen=self.window)
+        q.append(seconds)
+
+    def end_frame(self, seconds):
+        self.frames.append(seconds)
+
+    def rows(self):
+        """(имя, среднее мс, максимум мс) в порядке первого замера."""
+        out = []
+        for name, q in self.samples.items():
+            if q:
+                out.append((name, sum(q) * 1000.0 / len(q), max(q) * 1000.0))
+        return out
+
+    def frame_ms(self):
+        return np.fromiter(self.frames, dtype=np.float64, count=len(self.frames)) * 1000.0
+
+    def percentiles(self, qs=(50, 95, 99)):
+        ms = self.frame_ms()
+        if ms.size == 0:
+            return tuple(0.0 for _ in qs)
+        return tuple(float(v) for v in np.percentile(ms, qs))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from config import TILE, WALL_NORMAL, WALL_BREAKABLE
+
+# С какого числа снарядов выгоднее один векторный проход, чем цикл по одному
+SWEEP_BATCH_MIN = 16
+
+
+def segment_wall_hit(g, x0, y0, x1, y1, breakable=True):
+    """Первая стена на отрезке (x0, y0) -> (x1, y1) в мировых координатах.
+
+    Обход тайлов по Amanatides–Woo: проверяется каждый тайл, который задевает
+    отрезок, начиная с исходного, поэтому быстрый снаряд не проскакивает
+    тонкие стены при любом шаге. breakable=False пропускает ломаемые стены.
+    Возвращает (tx, ty) или None; за краем карты стен нет.
+    """
+    tx, ty = int(x0 // TILE), int(y0 // TILE)
+    ex, ey = int(x1 // TILE), int(y1 // TILE)
+    dx, dy = x1 - x0, y1 - y0
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    if dx != 0:
+        t_delta_x = TILE / abs(dx)
+        t_max_x = ((tx + (step_x > 0)) * TILE - x0) / dx
+    else:
+        t_delta_x = t_max_x = float("inf")
+    if dy != 0:
+        t_delta_y = TILE / abs(dy)
+        t_max_y = ((ty + (step_y > 0)) * TILE - y0) / dy
+    else:
+        t_delta_y = t_max_y = float("inf")
+
+    W, H = g.MAP_W, g.MAP_H
+    cells = g.tiles.cells
+    for _ in range(abs(ex - tx) + abs(ey - ty) + 1):
+        if not (0 <= tx < W and 0 <= ty < H):
+            return None
+        v = cells[ty * W + tx]
+        if v == WALL_NORMAL or (breakable and v == WALL_BREAKABLE):
+            return tx, ty
+        if t_max_x < t_max_y:
+            tx += step_x
+            t_max_x += t_delta_x
+        else:
+            ty += step_y
+            t_max_y += t_delta_y
+    return None
+
+
+def segment_wall_hits(g, x0, y0, x1, y1, breakable):
+    """Пакетный вариант segment_wall_hit для массивов отрезков.
+
+    Все лучи идут одним векторным проходом: итераций столько, сколько тайлов
+    пересекает самый длинный отрезок (для снарядов за шаг — обычно 1–2).
+    Возвращает массивы (hx, hy); -1 там, где стены нет.
+    """
+    tiles = g.tiles.array()
+    H, W = tiles.shape
+    x0 = np.asarray(x0, dtype=np.float64)
+    y0 = np.asarray(y0, dtype=np.float64)
+    dx = np.asarray(x1, dtype=np.float64) - x0
+    dy = np.asarray(y1, dtype=np.float64) - y0
+    breakable = np.asarray(breakable, dtype=bool)
+
+    tx = np.floor(x0 / TILE).astype(np.int64)
+    ty = np.floor(y0 / TILE).astype(np.int64)
+    n = (np.abs(np.floor((x0 + dx) / TILE).astype(np.int64) - tx)
+         + np.abs(np.floor((y0 + dy) / TILE).astype(np.int64) - ty))
+    step_x = np.where(dx > 0, 1, -1)
+    step_y = np.where(dy > 0, 1, -1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_delta_x = np.where(dx != 0, TILE / np.abs(dx), np.inf)
+        t_delta_y = np.where(dy != 0, TILE / np.abs(dy), np.inf)
+        t_max_x = np.where(dx != 0, ((tx + (step_x > 0)) * TILE - x0) / dx, np.inf)
+        t_max_y = np.where(dy != 0, ((ty + (step_y > 0)) * TILE - y0) / dy, np.inf)
+
+    hx = np.full(len(x0), -1, dtype=np.int64)
+    hy = np.full(len(x0), -1, dtype=np.int64)
+    active = np.ones(len(x0), dtype=bool)
+    for k in range(int(n.max(initial=0)) + 1):
+        active &= (k <= n) & (tx >= 0) & (tx < W) & (ty >= 0) & (ty < H)
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        v = tiles[ty[idx], tx[idx]]
+        solid = (v == WALL_NORMAL) | ((v == WALL_BREAKABLE) & breakable[idx])
+        hit = idx[solid]
+        hx[hit] = tx[hit]
+        hy[hit] = ty[hit]
+        active[hit] = False
+        adv_x = t_max_x < t_max_y
+        tx = np.where(adv_x, tx + step_x, tx)
+        ty = np.where(adv_x, ty, ty + step_y)
+        t_max_x = np.where(adv_x, t_max_x + t_delta_x, t_max_x)
+        t_max_y = np.where(adv_x, t_max_y, t_max_y + t_delta_y)
+    return hx, hy
@@ -1,199 +1,167 @@
 # -*- coding: utf-8 -*-
 import pygame
 import math
+from time import perf_counter
 from config import (
-    TILE, COL_BG, COL_FLOOR, COL_WALL, COL_BREAKABLE_WALL, COL_GOLD, COL_RED, COL_UI, COL_DIM, COL_GREEN,
-    LIGHT_RADIUS, LIGHT_SOFT, STATE_MENU, STATE_PLAY, STATE_DEAD, STATE_WIN, TREASURE_TYPES, draw_round_rect,
-    WALL_NORMAL, WALL_BREAKABLE
+    COL_BG, COL_GOLD, COL_RED, COL_UI, COL_DIM, COL_GREEN,
+    LIGHT_RADIUS, LIGHT_SOFT, LIGHT_DARK_ALPHA, LIGHT_AMBIENT_ALPHA, LIGHT_QUALITIES, STATE_MENU, STATE_PLAY, STATE_DEAD, STATE_WIN, draw_round_rect
 )
 from systems import update_particles, update_float_texts
-from mapgen import world_to_tile
+from profiler import FRAME_BUDGET_MS
+from text_cache import render_text, text_cache
+from sprites import sprite_cache
+
+# Запас вокруг экрана при отсечении сущностей, px
+CULL_MARGIN = 32
+
+def render_pos(g, obj):
+    # Положение между двумя последними шагами симуляции (render_alpha = 1 — текущее)
+    prev = obj.get("prev")
+    if prev is None or g.render_alpha >= 1.0:
+        return obj["pos"]
+    return prev.lerp(obj["pos"], g.render_alpha)
+
+def render_cam(g):
+    if g.cam_prev is None or g.render_alpha >= 1.0:
+        return g.cam
+    return g.cam_prev.lerp(g.cam, g.render_alpha)
 
 def draw_world(g):
     W, H = g.screen.get_width(), g.screen.get_height()
     g.screen.fill(COL_BG)
+    cam = render_cam(g)
 
-    start_tx = max(0, int(g.cam.x // TILE) - 2)
-    end_tx = min(g.MAP_W, int((g.cam.x + W) // TILE) + 3)
-    start_ty = max(0, int(g.cam.y // TILE) - 2)
-    end_ty = min(g.MAP_H, int((g.cam.y + H) // TILE) + 3)
-
-    for ty in range(start_ty, end_ty):
-        for tx in range(start_tx, end_tx):
-            r = pygame.Rect(tx * TILE - g.cam.x, ty * TILE - g.cam.y, TILE, TILE)
-            if g.tiles[ty][tx] == 0:
-                shade = (tx + ty) % 2
-                col = (COL_FLOOR[0] + shade*3, COL_FLOOR[1] + shade*3, COL_FLOOR[2] + shade*3)
-                pygame.draw.rect(g.screen, col, r)
-            elif g.tiles[ty][tx] == WALL_NORMAL:
-                pygame.draw.rect(g.screen, COL_WALL, r)
-                pygame.draw.line(g.screen, (COL_WALL[0]+10, COL_WALL[1]+10, COL_WALL[2]+10), (r.left, r.top), (r.right, r.top), 2)
-            elif g.tiles[ty][tx] == WALL_BREAKABLE:
-                # Ломаемые стены - коричневые с трещинами
-                pygame.draw.rect(g.screen, COL_BREAKABLE_WALL, r)
-                # Показываем трещины в зависимости от здоровья
-                wall_hp = g.breakable_walls.get((tx, ty), 15)
-                if wall_hp < 15:
-                    # Рисуем трещины
-                    crack_color = (60, 40, 20)
-                    if wall_hp < 10:
-                        pygame.draw.line(g.screen, crack_color, (r.left + 4, r.top + 4), (r.right - 4, r.bottom - 4), 2)
-                    if wall_hp < 5:
-                        pygame.draw.line(g.screen, crack_color, (r.left + 4, r.bottom - 4), (r.right - 4, r.top + 4), 2)
+    # Пол и стены — из кэша чанков
+    g.tile_layer.draw(g, g.screen, cam)
 
     # Магазин
-    shop_vis = g.shop_rect.move(-g.cam.x, -g.cam.y)
+    shop_vis = g.shop_rect.move(-cam.x, -cam.y)
     draw_round_rect(g.screen, shop_vis, (35, 55, 80), radius=10, border=2, border_color=(90, 140, 200))
     pygame.draw.circle(g.screen, (120, 180, 255), (shop_vis.centerx, shop_vis.centery), 10)
-    label = g.font.render("МАГАЗИН (E — продать)", True, (200, 230, 255))
+    label = render_text(g.font, "МАГАЗИН (E — продать)", (200, 230, 255))
     g.screen.blit(label, (shop_vis.x + 8, shop_vis.y - 22))
 
     # Выход
     if g.exit_rect:
-        ex = g.exit_rect.move(-g.cam.x, -g.cam.y)
+        ex = g.exit_rect.move(-cam.x, -cam.y)
         if g.exit_open:
             draw_round_rect(g.screen, ex, (120, 255, 160), radius=6, border=2, border_color=(30, 60, 40))
-            txt = g.font.render("ВХОД ОТКРЫТ", True, (20, 40, 30))
+            txt = render_text(g.font, "ВХОД ОТКРЫТ", (20, 40, 30))
             g.screen.blit(txt, (ex.x + 6, ex.y - 22))
         else:
             draw_round_rect(g.screen, ex, (200, 60, 60), radius=6, border=2, border_color=(90, 20, 20))
             need = g.missing_gold()
-            txt = g.font.render(f"ВХОД ЗАКРЫТ — нужно ещё: {need}", True, (255, 220, 220))
+            txt = render_text(g.font, f"ВХОД ЗАКРЫТ — нужно ещё: {need}", (255, 220, 220))
             g.screen.blit(txt, (ex.x - 20, ex.y - 22))
 
+    # Сущности берутся из пространственного индекса только в пределах экрана
+    # (с запасом на размер фигур и сдвиг интерполяции)
+    view = pygame.Rect(int(cam.x) - CULL_MARGIN, int(cam.y) - CULL_MARGIN, W + CULL_MARGIN * 2, H + CULL_MARGIN * 2)
+
+    # Каждый слой — готовые спрайты одним вызовом blits
+    screen = g.screen
+    ticks = pygame.time.get_ticks()
+
     # Сокровища
-    for it in g.treasures:
-        p = it["pos"] - g.cam
-        t = TREASURE_TYPES[it["type"]]
-        s = 6 + math.sin(pygame.time.get_ticks()/300 + p.x*0.01) * 2
-        pygame.draw.circle(g.screen, (20,20,20), (int(p.x), int(p.y)+1), int(s)+2)
-        pygame.draw.circle(g.screen, t["color"], (int(p.x), int(p.y)), int(s))
-        pygame.draw.circle(g.screen, (255,255,255), (int(p.x), int(p.y - int(s/2))), 2)
-
-    # Враги
-    for e in g.enemies:
-        p = e["pos"] - g.cam
-        base_col = (180, 60, 60) if e["kind"] == "chaser" else (200, 130, 80)
-        col = base_col if e["hp"] >= 2 else (240, 180, 120)
-        pygame.draw.circle(g.screen, (10,10,10), (int(p.x), int(p.y)+2), 12)
-        pygame.draw.circle(g.screen, col, (int(p.x), int(p.y)), 12)
-        # HP
-        w = 20
-        hpw = int(w * (e["hp"]/3))
-        pygame.draw.rect(g.screen, (30,30,30), pygame.Rect(p.x - w/2, p.y - 18, w, 4), border_radius=3)
-        pygame.draw.rect(g.screen, (255,100,100), pygame.Rect(p.x - w/2, p.y - 18, hpw, 4), border_radius=3)
+    batch = []
+    for it in g.spatial.query_rect("treasures", view):
+        px = it["pos"].x - cam.x
+        py = it["pos"].y - cam.y
+        s = 6 + math.sin(ticks/300 + px*0.01) * 2
+        surf, ox, oy = sprite_cache.treasure(it["type"], int(s))
+        batch.append((surf, (int(px) - ox, int(py) - oy)))
+    screen.blits(batch, doreturn=False)
+
+    # Враги (снизу вверх по экрану: порядок не зависит от ячеек хэша)
+    batch = []
+    for e in sorted(g.spatial.query_rect("enemies", view), key=lambda e: e["pos"].y):
+        p = render_pos(g, e) - cam
+        surf, ox, oy = sprite_cache.enemy(e["kind"], e["hp"])
+        batch.append((surf, (int(p.x) - ox, int(p.y) - oy)))
+    screen.blits(batch, doreturn=False)
 
     # Снаряды
-    for p in g.projectiles:
-        pp = p["pos"] - g.cam
-        c = (255, 240, 200) if not p["from_enemy"] else (255, 150, 150)
-        pygame.draw.circle(g.screen, c, (int(pp.x), int(pp.y)), 3)
+    batch = []
+    for p in g.spatial.query_rect("projectiles", view):
+        pp = render_pos(g, p) - cam
+        surf, ox, oy = sprite_cache.projectile(p["from_enemy"])
+        batch.append((surf, (int(pp.x) - ox, int(pp.y) - oy)))
+    screen.blits(batch, doreturn=False)
 
     # Игрок
-    pp = g.player["pos"] - g.cam
-    pygame.draw.circle(g.screen, (20,20,20), (int(pp.x), int(pp.y)+3), 14)
-    pygame.draw.circle(g.screen, (30, 60, 80), (int(pp.x), int(pp.y)), 14)
-    pygame.draw.circle(g.screen, (90, 200, 255), (int(pp.x), int(pp.y)), 12)
-    pygame.draw.circle(g.screen, (255,255,255), (int(pp.x + g.player["dir"].x*6), int(pp.y + g.player["dir"].y*6)), 3)
+    pp = render_pos(g, g.player) - cam
+    surf, ox, oy = sprite_cache.player(g.player["dir"])
+    screen.blit(surf, (int(pp.x) - ox, int(pp.y) - oy))
+
+# Кэш маски освещения: перестраивается только при смене параметров
+_light_cache = {"key": None, "mask": None}
+
+def _light_mask(g):
+    quality = g.settings.get("lighting_quality", "Среднее")
+    key = (LIGHT_RADIUS, LIGHT_SOFT, quality, g.screen.get_size())
+    if _light_cache["key"] != key:
+        # Маска умножается на кадр (BLEND_MULT): 255 — без изменений,
+        # 255 - alpha — как наложение чёрного с этой прозрачностью
+        steps = LIGHT_QUALITIES.get(quality, 12)
+        outer = LIGHT_RADIUS + LIGHT_SOFT
+        mask = pygame.Surface((outer * 2, outer * 2))
+        dark = 255 - LIGHT_DARK_ALPHA
+        mask.fill((dark, dark, dark))
+        for i in range(steps, 0, -1):
+            rr = int(LIGHT_RADIUS + i * (LIGHT_SOFT / steps))
+            alpha = LIGHT_AMBIENT_ALPHA + (LIGHT_DARK_ALPHA - LIGHT_AMBIENT_ALPHA) * i // (steps + 1)
+            pygame.draw.circle(mask, (255 - alpha,) * 3, (outer, outer), rr)
+        v = 255 - LIGHT_AMBIENT_ALPHA
+        pygame.draw.circle(mask, (v, v, v), (outer, outer), LIGHT_RADIUS)
+        _light_cache["key"] = key
+        _light_cache["mask"] = mask
+    return _light_cache["mask"]
 
 def draw_lighting(g):
     if not g.settings["lighting"]:
         return
-    overlay = pygame.Surface(g.screen.get_size(), pygame.SRCALPHA)
-    center = (int(g.player["pos"].x - g.cam.x), int(g.player["pos"].y - g.cam.y))
-    rings = 12
-    for i in range(rings):
-        rr = int(LIGHT_RADIUS + i * (LIGHT_SOFT / rings))
-        alpha = min(220, i * 18)
-        pygame.draw.circle(overlay, (0, 0, 0, alpha), center, rr)
-    pygame.draw.rect(overlay, (0, 0, 0, 24), overlay.get_rect())
-    g.screen.blit(overlay, (0, 0))
+    mask = _light_mask(g)
+    screen_rect = g.screen.get_rect()
+    pp = render_pos(g, g.player) - render_cam(g)
+    center = (int(pp.x), int(pp.y))
+    lit = mask.get_rect(center=center)
+    g.screen.blit(mask, lit, special_flags=pygame.BLEND_MULT)
+
+    # Всё вне маски — сплошная тьма прямоугольными заливками
+    dark = (255 - LIGHT_DARK_ALPHA,) * 3
+    lit = lit.clip(screen_rect)
+    if lit.w == 0 or lit.h == 0:
+        g.screen.fill(dark, screen_rect, special_flags=pygame.BLEND_MULT)
+        return
+    W, H = screen_rect.size
+    for r in (
+        pygame.Rect(0, 0, W, lit.top),
+        pygame.Rect(0, lit.bottom, W, H - lit.bottom),
+        pygame.Rect(0, lit.top, lit.left, lit.h),
+        pygame.Rect(lit.right, lit.top, W - lit.right, lit.h),
+    ):
+        if r.w > 0 and r.h > 0:
+            g.screen.fill(dark, r, special_flags=pygame.BLEND_MULT)
 
 def draw_minimap(g):
     if not g.show_minimap:
         return
-    W = g.screen.get_width()
-    max_w = 280
-    max_h = 220
-    scale_x = max_w / g.MAP_W
-    scale_y = max_h / g.MAP_H
-    scale = min(scale_x, scale_y)
-    mm_w = int(g.MAP_W * scale)
-    mm_h = int(g.MAP_H * scale)
-
-    panel = pygame.Surface((mm_w + 16, mm_h + 16), pygame.SRCALPHA)
-    draw_round_rect(panel, panel.get_rect(), (0, 0, 0, 160), radius=10, border=2, border_color=(90, 140, 200))
-    mm = pygame.Surface((mm_w, mm_h), pygame.SRCALPHA)
-
-    for ty in range(g.MAP_H):
-        for tx in range(g.MAP_W):
-            if not g.visited[ty][tx]:
-                continue
-            rx = int(tx * scale)
-            ry = int(ty * scale)
-            r = pygame.Rect(rx, ry, max(1, int(scale)), max(1, int(scale)))
-            if g.tiles[ty][tx] == 0:
-                mm.fill((90, 95, 110, 200), r)
-            elif g.tiles[ty][tx] == WALL_NORMAL:
-                mm.fill((50, 55, 70, 220), r)
-            elif g.tiles[ty][tx] == WALL_BREAKABLE:
-                # Ломаемые стены на мини-карте
-                wall_hp = g.breakable_walls.get((tx, ty), 15)
-                if wall_hp > 0:
-                    mm.fill((120, 80, 60, 220), r)  # Коричневый для ломаемых стен
-                else:
-                    mm.fill((90, 95, 110, 200), r)  # Пол после разрушения
-
-    # Магазин
-    stx, sty = g.shop_rect.x // TILE, g.shop_rect.y // TILE
-    if 0 <= stx < g.MAP_W and 0 <= sty < g.MAP_H and g.visited[sty][stx]:
-        pygame.draw.rect(mm, (120, 180, 255), pygame.Rect(int(stx*scale), int(sty*scale), int(2*scale), int(2*scale)))
-
-    # Выход
-    if g.exit_rect:
-        etx, ety = g.exit_rect.x // TILE, g.exit_rect.y // TILE
-        if 0 <= etx < g.MAP_W and 0 <= ety < g.MAP_H and g.visited[ety][etx]:
-            col = (120, 255, 160) if g.exit_open else (200, 60, 60)
-            pygame.draw.rect(mm, col, pygame.Rect(int(etx*scale), int(ety*scale), int(2*scale), int(2*scale)))
-
-    # Игрок
-    ptx, pty = world_to_tile(g.player["pos"].x, g.player["pos"].y)
-    px = int(ptx * scale); py = int(pty * scale)
-    pygame.draw.rect(mm, (255, 255, 255), pygame.Rect(px, py, max(2, int(scale)), max(2, int(scale))))
-
-    panel.blit(mm, (8, 8))
-    g.screen.blit(panel, (W - panel.get_width() - 16, 16))
+    g.minimap.draw(g, g.screen)
 
 def draw_ui(g):
-    W = g.screen.get_width()
-    panel = pygame.Surface((W, 48), pygame.SRCALPHA)
-    draw_round_rect(panel, pygame.Rect(10, 6, W-20, 36), (0,0,0,120), radius=12)
-    # HP
-    for i in range(g.player["hp_max"]):
-        x = 24 + i*20
-        col = COL_RED if i < g.player["hp"] else (80,80,80)
-        pygame.draw.circle(panel, col, (x, 24), 8)
-    # Золото
-    g_text = g.font.render(f"Золото: {g.gold}", True, COL_GOLD)
-    panel.blit(g_text, (180, 14))
-    # Инвентарь
-    inv_val = sum(TREASURE_TYPES[it["type"]]["value"] for it in g.inventory)
-    inv_text = g.font.render(f"В инвентаре: {len(g.inventory)} шт. (~{inv_val})", True, (200,230,255))
-    panel.blit(inv_text, (330, 14))
-    # Цель
-    tgt = g.font.render(f"Цель: {g.TARGET_GOLD}", True, (200, 255, 200))
-    panel.blit(tgt, (620, 14))
-    g.screen.blit(panel, (0,0))
+    # Панель HP/золота/инвентаря пересобирается только при изменении
+    g.hud.draw(g)
 
     # Плавающий текст
+    cam = render_cam(g)
     for ft in g.float_texts:
-        p = ft["pos"] - g.cam
-        img = g.font.render(ft["text"], True, ft["color"])
+        p = ft["pos"] - cam
+        img = render_text(g.font, ft["text"], ft["color"])
         g.screen.blit(img, (p.x, p.y))
 
     # Подсказка у магазина
     if g.shop_rect.collidepoint(g.player["pos"].x, g.player["pos"].y):
-        tip = g.font.render("E — продать всё из инвентаря", True, (220, 240, 255))
+        tip = render_text(g.font, "E — продать всё из инвентаря", (220, 240, 255))
         g.screen.blit(tip, (20, 60))
 
     draw_minimap(g)
@@ -202,7 +170,7 @@ def draw_ui(g):
 def draw_controls_help(g):
     if not g.show_controls: return
     W, H = g.screen.get_width(), g.screen.get_height()
-    panel_w, panel_h = 520, 320
+    panel_w, panel_h = 520, 348
     panel = pygame.Surface((panel_w, panel_h), pygame.SRCALPHA)
     draw_round_rect(panel, panel.get_rect(), (0, 0, 0, 200), radius=12, border=2, border_color=(90, 140, 200))
     lines = [
@@ -213,12 +181,13 @@ def draw_controls_help(g):
         "E — продать предметы в магазине",
         "Tab — миникарта",
         "F1 — показать/скрыть справку",
+        "F3 — замеры времени по системам",
         "R — начать заново (после смерти/победы)",
         "M — вернуться в меню (после смерти/победы)",
         "Esc — выйти из игры"
     ]
     for i, text in enumerate(lines):
-        img = (g.font_mid if i == 0 else g.font).render(text, True, (230, 240, 255) if i == 0 else COL_UI)
+        img = render_text(g.font_mid if i == 0 else g.font, text, (230, 240, 255) if i == 0 else COL_UI)
         panel.blit(img, (24, 24 + i * 28))
     g.screen.blit(panel, (W//2 - panel_w//2, H//2 - panel_h//2))
 
@@ -246,7 +215,7 @@ def draw_death_or_win_overlay(g, title, buttons=None):
 
     is_dead = title.startswith("Ты пал")
     title_col = (255, 220, 220) if is_dead else (160, 255, 180)
-    txt = g.font_big.render(title, True, title_col)
+    txt = render_text(g.font_big, title, title_col)
     g.screen.blit(txt, (g.screen.get_width() // 2 - txt.get_width() // 2, g.screen.get_height() // 2 - 72))
 
     if buttons is None:
@@ -259,8 +228,79 @@ def draw_death_or_win_overlay(g, title, buttons=None):
         border_color = (120, 180, 255) if hovered else (90, 140, 200)
         draw_round_rect(g.screen, rect, base_color, radius=10, border=3, border_color=border_color)
         label = "ЗАНОВО (R)" if key == "restart" else "МЕНЮ (M)"
-        img = g.font_mid.render(label, True, COL_UI)
+        img = render_text(g.font_mid, label, COL_UI)
         g.screen.blit(img, (rect.centerx - img.get_width() // 2, rect.centery - img.get_height() // 2))
 
-    hint = g.font.render("Нажми R или кликни — начать заново. Нажми M — меню.", True, COL_DIM)
+    hint = render_text(g.font, "Нажми R или кликни — начать заново. Нажми M — меню.", COL_DIM)
     g.screen.blit(hint, (W // 2 - hint.get_width() // 2, buttons["restart"].bottom + 12))
+    seed = render_text(g.font, f"Сид карты: {g.run_seed}", COL_DIM)
+    g.screen.blit(seed, (W // 2 - seed.get_width() // 2, buttons["restart"].bottom + 36))
+
+# Проходы отрисовки кадра игры в порядке вызова
+RENDER_PASSES = (
+    ("draw_world", draw_world),
+    ("draw_lighting", draw_lighting),
+    ("draw_ui", draw_ui),
+)
+
+def draw_play_frame(g):
+    prof = g.profiler
+    if not prof.enabled:
+        for _, draw in RENDER_PASSES:
+            draw(g)
+        return
+    for name, draw in RENDER_PASSES:
+        t0 = perf_counter()
+        draw(g)
+        prof.record(name, perf_counter() - t0)
+    draw_profiler(g)
+
+def draw_profiler(g):
+    prof = g.profiler
+    rows = prof.rows()
+    H = g.screen.get_height()
+    line_h = 16
+    graph_w, graph_h = 240, 56
+    panel_w = 16 + graph_w + 16
+    panel_h = 12 + len(rows) * line_h + 6 + 3 * line_h + 6 + graph_h + 6 + line_h + 10
+    panel = pygame.Surface((panel_w, panel_h), pygame.SRCALPHA)
+    draw_round_rect(panel, panel.get_rect(), (0, 0, 0, 190), radius=10, border=2, border_color=(90, 140, 200))
+
+    # Системы: среднее / максимум за окно и полоска доли бюджета кадра
+    y = 12
+    for name, avg, peak in rows:
+        share = min(1.0, avg / FRAME_BUDGET_MS)
+        col = COL_GREEN if share < 0.25 else (COL_GOLD if share < 0.5 else COL_RED)
+        pygame.draw.rect(panel, (40, 50, 60), pygame.Rect(16, y + 12, graph_w, 2))
+        pygame.draw.rect(panel, col, pygame.Rect(16, y + 12, max(1, int(graph_w * share)), 2))
+        panel.blit(render_text(g.font, name, COL_UI), (16, y - 2))
+        nums = render_text(g.font, f"{avg:5.2f} / {peak:5.2f} мс", COL_UI)
+        panel.blit(nums, (panel_w - 16 - nums.get_width(), y - 2))
+        y += line_h
+    y += 6
+
+    # Счётчики сущностей
+    counts = (f"враги {len(g.enemies)}  снаряды {len(g.projectiles)}  частицы {len(g.particles)}",
+              f"тексты {len(g.float_texts)}  сокровища {len(g.treasures)}",
+              f"кэш строк: {text_cache.hits} / {text_cache.misses} промахов")
+    for text in counts:
+        panel.blit(render_text(g.font, text, COL_DIM), (16, y - 2))
+        y += line_h
+    y += 6
+
+    # График времени кадра; жёлтая линия — бюджет 60 FPS
+    ms = prof.frame_ms()[-(graph_w // 2):]
+    top = max(FRAME_BUDGET_MS * 2, float(ms.max()) if ms.size else 0.0)
+    graph = pygame.Rect(16, y, graph_w, graph_h)
+    pygame.draw.rect(panel, (20, 24, 30, 220), graph)
+    for i, v in enumerate(ms.tolist()):
+        hgt = max(1, int(graph_h * v / top))
+        col = COL_GREEN if v <= FRAME_BUDGET_MS else COL_RED
+        pygame.draw.rect(panel, col, pygame.Rect(graph.x + i * 2, graph.bottom - hgt, 2, hgt))
+    by = graph.bottom - int(graph_h * FRAME_BUDGET_MS / top)
+    pygame.draw.line(panel, COL_GOLD, (graph.x, by), (graph.right - 1, by))
+    y = graph.bottom + 6
+
+    p50, p95, p99 = prof.percentiles()
+    panel.blit(render_text(g.font, f"кадр p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f} мс", COL_UI), (16, y - 2))
+    g.screen.blit(panel, (16, H - panel_h - 16))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from config import TILE
+
+# Размер ячейки хэша: два тайла — больше радиусов всех взаимодействий (22 px),
+# поэтому любой запрос соседства затрагивает не больше 3x3 ячеек.
+SPATIAL_CELL = TILE * 2
+
+
+class SpatialHash:
+    """Равномерная сетка-хэш для врагов, снарядов и сокровищ.
+
+    Объекты — обычные словари с ключом "pos"; каждая коллекция хранится
+    в своём слое. После перемещения объекта нужно вызвать move():
+    перекладывание в другую ячейку происходит только при смене ячейки.
+    """
+
+    def __init__(self, cell=SPATIAL_CELL):
+        self.cell = cell
+        self.layers = {}  # слой -> {(cx, cy): {id(obj): obj}}
+        self.where = {}   # слой -> {id(obj): (cx, cy)}
+
+    def cell_of(self, x, y):
+        return int(x // self.cell), int(y // self.cell)
+
+    def clear(self):
+        self.layers.clear()
+        self.where.clear()
+
+    def rebuild(self, layer, objs):
+        self.layers[layer] = {}
+        self.where[layer] = {}
+        for obj in objs:
+            self.insert(layer, obj)
+
+    def insert(self, layer, obj):
+        buckets = self.layers.setdefault(layer, {})
+        where = self.where.setdefault(layer, {})
+        key = self.cell_of(obj["pos"].x, obj["pos"].y)
+        buckets.setdefault(key, {})[id(obj)] = obj
+        where[id(obj)] = key
+
+    def remove(self, layer, obj):
+        key = self.where.get(layer, {}).pop(id(obj), None)
+        if key is None:
+            return
+        bucket = self.layers[layer][key]
+        bucket.pop(id(obj), None)
+        if not bucket:
+            del self.layers[layer][key]
+
+    def move(self, layer, obj):
+        where = self.where.get(layer)
+        old = where.get(id(obj)) if where is not None else None
+        if old is None:
+            self.insert(layer, obj)
+            return
+        key = self.cell_of(obj["pos"].x, obj["pos"].y)
+        if key == old:
+            return
+        buckets = self.layers[layer]
+        bucket = buckets[old]
+        bucket.pop(id(obj), None)
+        if not bucket:
+            del buckets[old]
+        buckets.setdefault(key, {})[id(obj)] = obj
+        where[id(obj)] = key
+
+    def query(self, layer, pos, radius):
+        """Объекты слоя, чьи центры лежат не дальше radius от pos."""
+        buckets = self.layers.get(layer)
+        if not buckets:
+            return []
+        x, y = pos.x, pos.y
+        r2 = radius * radius
+        cx0, cy0 = self.cell_of(x - radius, y - radius)
+        cx1, cy1 = self.cell_of(x + radius, y + radius)
+        out = []
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                bucket = buckets.get((cx, cy))
+                if not bucket:
+                    continue
+                for obj in bucket.values():
+                    p = obj["pos"]
+                    dx = p.x - x
+                    dy = p.y - y
+                    if dx * dx + dy * dy < r2:
+                        out.append(obj)
+        return out
+
+    def query_rect(self, layer, rect):
+        """Все объекты слоя из ячеек, пересекающих rect (мировые координаты)."""
+        buckets = self.layers.get(layer)
+        if not buckets:
+            return []
+        cx0, cy0 = self.cell_of(rect.left, rect.top)
+        cx1, cy1 = self.cell_of(rect.right, rect.bottom)
+        out = []
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                bucket = buckets.get((cx, cy))
+                if bucket:
+                    out.extend(bucket.values())
+        return out
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import math
+import pygame
+from config import TREASURE_TYPES
+
+# Цвет прозрачного фона спрайтов (в палитре игры не встречается)
+_KEY = (255, 0, 255)
+# Число заранее отрисованных направлений взгляда игрока
+PLAYER_DIRS = 32
+# HP, соответствующее полной полоске; больше — рисуется как полная
+ENEMY_HP_MAX = 3
+
+
+class SpriteCache:
+    """Заранее отрисованные спрайты сущностей.
+
+    Каждый вариант (тип врага и HP, тип сокровища и фаза покачивания,
+    направление взгляда игрока, снаряд) рисуется примитивами один раз при
+    первом запросе. get-методы возвращают (surface, ox, oy): спрайт ставится
+    в точку (x - ox, y - oy), поэтому слой сущностей отдаётся на экран одним
+    Surface.blits.
+    """
+
+    def __init__(self):
+        self.sprites = {}
+
+    def clear(self):
+        self.sprites.clear()
+
+    @staticmethod
+    def _surface(w, h):
+        surf = pygame.Surface((w, h))
+        surf.fill(_KEY)
+        return surf
+
+    @staticmethod
+    def _done(surf, ox, oy):
+        surf.set_colorkey(_KEY, pygame.RLEACCEL)
+        return surf, ox, oy
+
+    def enemy(self, kind, hp):
+        # Ступени HP ограничены: карта с большим hp не плодит спрайты
+        hp = max(0, min(ENEMY_HP_MAX, int(hp)))
+        key = ("enemy", kind, hp)
+        spr = self.sprites.get(key)
+        if spr is None:
+            # Тень, тело и полоска HP над головой; центр врага — (13, 18)
+            surf = self._surface(26, 33)
+            cx, cy = 13, 18
+            base_col = (180, 60, 60) if kind == "chaser" else (200, 130, 80)
+            col = base_col if hp >= 2 else (240, 180, 120)
+            pygame.draw.circle(surf, (10,10,10), (cx, cy+2), 12)
+            pygame.draw.circle(surf, col, (cx, cy), 12)
+            w = 20
+            hpw = int(w * (hp/ENEMY_HP_MAX))
+            pygame.draw.rect(surf, (30,30,30), pygame.Rect(cx - w//2, cy - 18, w, 4), border_radius=3)
+            pygame.draw.rect(surf, (255,100,100), pygame.Rect(cx - w//2, cy - 18, hpw, 4), border_radius=3)
+            spr = self.sprites[key] = self._done(surf, cx, cy)
+        return spr
+
+    def treasure(self, type_idx, size):
+        key = ("treasure", type_idx, size)
+        spr = self.sprites.get(key)
+        if spr is None:
+            r = size + 2
+            surf = self._surface(r*2 + 1, r*2 + 2)
+            cx, cy = r, r
+            pygame.draw.circle(surf, (20,20,20), (cx, cy+1), size+2)
+            pygame.draw.circle(surf, TREASURE_TYPES[type_idx]["color"], (cx, cy), size)
+            pygame.draw.circle(surf, (255,255,255), (cx, cy - size//2), 2)
+            spr = self.sprites[key] = self._done(surf, cx, cy)
+        return spr
+
+    def player(self, direction):
+        # Направление квантуется на PLAYER_DIRS секторов
+        ang = math.atan2(direction.y, direction.x)
+        k = int(round(ang / (2 * math.pi) * PLAYER_DIRS)) % PLAYER_DIRS
+        key = ("player", k)
+        spr = self.sprites.get(key)
+        if spr is None:
+            a = k * 2 * math.pi / PLAYER_DIRS
+            surf = self._surface(30, 33)
+            cx, cy = 15, 15
+            pygame.draw.circle(surf, (20,20,20), (cx, cy+3), 14)
+            pygame.draw.circle(surf, (30, 60, 80), (cx, cy), 14)
+            pygame.draw.circle(surf, (90, 200, 255), (cx, cy), 12)
+            pygame.draw.circle(surf, (255,255,255), (cx + int(round(math.cos(a)*6)), cy + int(round(math.sin(a)*6))), 3)
+            spr = self.sprites[key] = self._done(surf, cx, cy)
+        return spr
+
+    def projectile(self, from_enemy):
+        key = ("projectile", from_enemy)
+        spr = self.sprites.get(key)
+        if spr is None:
+            surf = self._surface(7, 7)
+            c = (255, 240, 200) if not from_enemy else (255, 150, 150)
+            pygame.draw.circle(surf, c, (3, 3), 3)
+            spr = self.sprites[key] = self._done(surf, 3, 3)
+        return spr
+
+
+sprite_cache = SpriteCache()
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 import pygame
-import random
 import math
+from time import perf_counter
+import numpy as np
 from config import (
     TILE, COL_GOLD, COL_RED, LIGHT_RADIUS, LIGHT_SOFT, TREASURE_TYPES, DIFFS,
-    WALL_NORMAL, WALL_BREAKABLE
+    WALL_NORMAL,
+    LOD_NEAR_DIST, LOD_FAR_DIST, LOD_VIEW_MARGIN, LOD_MID_STEP, LOD_FAR_STEP
 )
-from mapgen import world_to_tile, in_bounds, collide_move, is_wall_at_world
+from mapgen import world_to_tile, in_bounds, collide_move, can_stand_at, is_wall_at_world
+from raycast import SWEEP_BATCH_MIN, segment_wall_hit, segment_wall_hits
 
 # Плавающий текст и частицы
 def add_float_text(g, text, pos, color=(230,230,230)):
@@ -39,72 +42,105 @@ def update_float_texts(g, dt):
         i += 1
 
 def add_particles(g, pos, color, n=10, speed=70):
-    for _ in range(n):
-        ang = random.random() * math.tau
-        v = pygame.Vector2(math.cos(ang), math.sin(ang)) * random.uniform(0.2, 1.0) * speed
-        g.particles.append({
-            "pos": pygame.Vector2(pos),
-            "vel": v,
-            "life": random.uniform(0.4, 0.9),
-            "color": color,
-            "size": random.randint(2, 4)
-        })
+    g.particles.emit(pos, color, n=n, speed=speed)
 
 def update_particles(g, dt):
-    i = 0
-    while i < len(g.particles):
-        prt = g.particles[i]
-        prt["life"] -= dt
-        if prt["life"] <= 0:
-            g.particles.pop(i); continue
-        prt["pos"] += prt["vel"] * dt
-        prt["vel"] *= 0.92
-        i += 1
+    g.particles.update(dt)
 
 # Камера
 def clamp_camera(g):
     g.cam.x = max(0, min(g.player["pos"].x - g.screen.get_width()/2, g.MAP_W * TILE - g.screen.get_width()))
     g.cam.y = max(0, min(g.player["pos"].y - g.screen.get_height()/2, g.MAP_H * TILE - g.screen.get_height()))
 
+def snapshot_positions(g):
+    # Положения перед шагом симуляции — для интерполяции при отрисовке
+    g.cam_prev = pygame.Vector2(g.cam)
+    g.player["prev"] = pygame.Vector2(g.player["pos"])
+    for e in g.enemies:
+        e["prev"] = pygame.Vector2(e["pos"])
+    for p in g.projectiles:
+        p["prev"] = pygame.Vector2(p["pos"])
+
 # Туман войны
 def mark_visited_radius(g, tx, ty, r=1):
     for dy in range(-r, r+1):
         for dx in range(-r, r+1):
             x = tx + dx
             y = ty + dy
-            if in_bounds(g, x, y):
-                g.visited[y][x] = True
+            if in_bounds(g, x, y) and not g.visited.get(x, y):
+                g.visited.set(x, y, 1)
+                g.minimap.invalidate(x, y)
 
 def update_visited_by_player(g):
     tx, ty = world_to_tile(g.player["pos"].x, g.player["pos"].y)
     if in_bounds(g, tx, ty):
         mark_visited_radius(g, tx, ty, r=2)
 
+# Пространственный индекс
+def reindex_entities(g):
+    # Полная перестройка — после генерации/загрузки карты
+    g.spatial.clear()
+    g.spatial.rebuild("enemies", g.enemies)
+    g.spatial.rebuild("treasures", g.treasures)
+    g.spatial.rebuild("projectiles", g.projectiles)
+
+def _in_list_order(objs, found):
+    # Найденные через хэш объекты в порядке их списка (как при полном переборе)
+    if len(found) > 1:
+        order = {id(o): i for i, o in enumerate(objs)}
+        found.sort(key=lambda o: order[id(o)])
+    return found
+
+def _drop_from_list(objs, gone):
+    # Удаление пачкой в конце обработки: один проход по списку, порядок
+    # оставшихся объектов не меняется
+    if gone:
+        ids = {id(obj) for obj in gone}
+        objs[:] = [obj for obj in objs if id(obj) not in ids]
+
+def spawn_projectile(g, pos, vel, life, dmg, from_enemy):
+    p = {
+        "pos": pygame.Vector2(pos),
+        "vel": vel,
+        "life": life,
+        "dmg": dmg,
+        "from_enemy": from_enemy
+    }
+    g.projectiles.append(p)
+    g.spatial.insert("projectiles", p)
+    return p
+
+def _drop_projectile(g, i):
+    g.spatial.remove("projectiles", g.projectiles.pop(i))
+
+def notify_tile_changed(g, tx, ty):
+    # Тайл сменил тип или стадию трещин — перерисовать его в кэшах
+    g.tile_layer.invalidate(tx, ty)
+    g.minimap.invalidate(tx, ty)
+
 # Игровые системы
 def pick_up_items(g):
-    i = 0
-    while i < len(g.treasures):
-        it = g.treasures[i]
-        if (it["pos"] - g.player["pos"]).length_squared() < (12+10)**2:
-            g.inventory.append({"type": it["type"]})
-            t = TREASURE_TYPES[it["type"]]
-            add_particles(g, it["pos"], t["color"], n=12, speed=110)
-            add_float_text(g, f"+{t['value']}", it["pos"], t["color"])
-            g.treasures.pop(i)
-        else:
-            i += 1
+    picked = _in_list_order(g.treasures, g.spatial.query("treasures", g.player["pos"], 12+10))
+    for it in picked:
+        g.inventory.append({"type": it["type"]})
+        t = TREASURE_TYPES[it["type"]]
+        g.inventory_value += t["value"]
+        add_particles(g, it["pos"], t["color"], n=12, speed=110)
+        add_float_text(g, f"+{t['value']}", it["pos"], t["color"])
+        g.spatial.remove("treasures", it)
+    _drop_from_list(g.treasures, picked)
 
 def sell_all(g):
     diff = DIFFS[g.settings["difficulty"]]
     if not g.inventory:
         return
-    value = sum(TREASURE_TYPES[it["type"]]["value"] for it in g.inventory)
-    value = int(value * diff["sell_mult"])
+    value = int(g.inventory_value * diff["sell_mult"])
     if value > 0:
         g.gold += value
         add_particles(g, g.player["pos"], COL_GOLD, n=24, speed=150)
         add_float_text(g, f"+{value} золота", g.player["pos"], COL_GOLD)
         g.inventory.clear()
+        g.inventory_value = 0
         g.open_exit_if_ready()
 
 def fire_projectile(g, target_pos):
@@ -116,54 +152,74 @@ def fire_projectile(g, target_pos):
         return
     dir = dir.normalize()
     vel = dir * g.player["proj_speed"]
-    g.projectiles.append({
-        "pos": pygame.Vector2(src + dir * 14),
-        "vel": vel,
-        "life": 1.2,
-        "dmg": 1,
-        "from_enemy": False
-    })
+    spawn_projectile(g, src + dir * 14, vel, life=1.2, dmg=1, from_enemy=False)
     # отдача
     g.player["pos"] = collide_move(g, g.player["pos"], -dir * g.player["recoil"], radius=10)
     add_particles(g, src + dir * 10, (220, 240, 255), n=6, speed=90)
     g.player["shoot_cd"] = g.player["fire_rate"]
 
 def update_projectiles(g, dt):
+    # Стены ищутся обходом тайлов вдоль всего отрезка шага (не только в
+    # конечной точке); при большом числе снарядов — одним векторным проходом.
+    hits = None
+    n = len(g.projectiles)
+    if n >= SWEEP_BATCH_MIN:
+        x0 = np.fromiter((p["pos"].x for p in g.projectiles), np.float64, n)
+        y0 = np.fromiter((p["pos"].y for p in g.projectiles), np.float64, n)
+        vx = np.fromiter((p["vel"].x for p in g.projectiles), np.float64, n)
+        vy = np.fromiter((p["vel"].y for p in g.projectiles), np.float64, n)
+        own = np.fromiter((not p["from_enemy"] for p in g.projectiles), bool, n)
+        hx, hy = segment_wall_hits(g, x0, y0, x0 + vx * dt, y0 + vy * dt, own)
+        hits = dict(zip(map(id, g.projectiles), zip(hx.tolist(), hy.tolist())))
+
+    killed = []
     i = 0
     while i < len(g.projectiles):
         p = g.projectiles[i]
         p["life"] -= dt
         if p["life"] <= 0:
-            g.projectiles.pop(i); continue
+            _drop_projectile(g, i); continue
         new_pos = p["pos"] + p["vel"] * dt
         
         # Проверяем столкновение со стенами
-        tx, ty = world_to_tile(new_pos.x, new_pos.y)
-        if in_bounds(g, tx, ty):
-            if g.tiles[ty][tx] == WALL_NORMAL:
+        if hits is not None:
+            wall = hits[id(p)]
+            # Стену мог разрушить предыдущий снаряд этого же шага — тогда путь пересчитывается
+            if wall[0] < 0:
+                wall = None
+            elif g.tiles.get(*wall) == 0:
+                wall = segment_wall_hit(g, p["pos"].x, p["pos"].y, new_pos.x, new_pos.y, not p["from_enemy"])
+        else:
+            wall = segment_wall_hit(g, p["pos"].x, p["pos"].y, new_pos.x, new_pos.y, not p["from_enemy"])
+        if wall is not None:
+            tx, ty = wall
+            if g.tiles.get(tx, ty) == WALL_NORMAL:
                 # Обычные стены - снаряд уничтожается
                 add_particles(g, p["pos"], (255, 230, 160) if not p["from_enemy"] else (255, 120, 120), n=8, speed=120)
-                g.projectiles.pop(i); continue
-            elif g.tiles[ty][tx] == WALL_BREAKABLE and not p["from_enemy"]:
-                # Ломаемые стены - только игрок может их разрушать
+                _drop_projectile(g, i); continue
+            else:
+                # Ломаемые стены - только игрок может их разрушать (снаряды врагов их не видят)
                 wall_key = (tx, ty)
                 if wall_key not in g.breakable_walls:
                     g.breakable_walls[wall_key] = 15  # Начальное здоровье
                 
                 g.breakable_walls[wall_key] -= 1
+                notify_tile_changed(g, tx, ty)
                 add_particles(g, p["pos"], (255, 180, 100), n=12, speed=150)
                 add_float_text(g, f"Стена: {g.breakable_walls[wall_key]}/15", p["pos"], (255, 200, 100))
                 
                 if g.breakable_walls[wall_key] <= 0:
                     # Стена разрушена
-                    g.tiles[ty][tx] = 0  # Превращаем в пол
+                    g.tiles.set(tx, ty, 0)  # Превращаем в пол
+                    g.flow.invalidate()
                     add_particles(g, p["pos"], (255, 150, 80), n=20, speed=200)
                     add_float_text(g, "Стена разрушена!", p["pos"], (255, 180, 100))
                     del g.breakable_walls[wall_key]
                 
-                g.projectiles.pop(i); continue
+                _drop_projectile(g, i); continue
         
         p["pos"] = new_pos
+        g.spatial.move("projectiles", p)
 
         if p["from_enemy"]:
             # Безопасная зона: в магазине урон не проходит
@@ -176,36 +232,80 @@ def update_projectiles(g, dt):
                     add_float_text(g, f"-{p['dmg']} HP", g.player["pos"], COL_RED)
                     if g.player["hp"] <= 0:
                         g.game_over = True
-                g.projectiles.pop(i); continue
+                _drop_projectile(g, i); continue
         else:
             hit = False
-            for e in g.enemies[:]:
-                if (p["pos"] - e["pos"]).length_squared() < (12+4)**2:
-                    e["hp"] -= p["dmg"]
-                    add_particles(g, e["pos"], (255, 200, 160), n=10, speed=120)
-                    add_float_text(g, f"-{p['dmg']}", e["pos"], (255, 150, 150))
-                    if e["hp"] <= 0:
-                        if random.random() < 0.33:
-                            weights = [t["weight"] for t in TREASURE_TYPES]
-                            g.treasures.append({
-                                "pos": pygame.Vector2(e["pos"]),
-                                "type": random.choices(range(len(TREASURE_TYPES)), weights=weights)[0]
-                            })
-                        g.enemies.remove(e)
-                    hit = True
-                    break
+            for e in _in_list_order(g.enemies, g.spatial.query("enemies", p["pos"], 12+4)):
+                e["hp"] -= p["dmg"]
+                add_particles(g, e["pos"], (255, 200, 160), n=10, speed=120)
+                add_float_text(g, f"-{p['dmg']}", e["pos"], (255, 150, 150))
+                if e["hp"] <= 0:
+                    if g.rng.random() < 0.33:
+                        weights = [t["weight"] for t in TREASURE_TYPES]
+                        drop = {
+                            "pos": pygame.Vector2(e["pos"]),
+                            "type": g.rng.choices(range(len(TREASURE_TYPES)), weights=weights)[0]
+                        }
+                        g.treasures.append(drop)
+                        g.spatial.insert("treasures", drop)
+                    # Из хэша — сразу, чтобы следующие снаряды его не задели
+                    g.spatial.remove("enemies", e)
+                    killed.append(e)
+                hit = True
+                break
             if hit:
-                g.projectiles.pop(i); continue
+                _drop_projectile(g, i); continue
         i += 1
+    _drop_from_list(g.enemies, killed)
 
 def enemy_ai_and_collisions(g, dt):
     ppos = pygame.Vector2(g.player["pos"])
     diff = DIFFS[g.settings["difficulty"]]
     player_in_shop = g.shop_rect.collidepoint(ppos.x, ppos.y)
-    for e in g.enemies[:]:
-        e["t"] += dt
+    flow_ready = False
+
+    # Уровни детализации: ближние и видимые враги обновляются каждый кадр,
+    # средние копят dt и обновляются реже, дальние блуждают без коллизий.
+    view = pygame.Rect(int(g.cam.x), int(g.cam.y), g.screen.get_width(), g.screen.get_height())
+    view.inflate_ip(LOD_VIEW_MARGIN * 2, LOD_VIEW_MARGIN * 2)
+    near2 = LOD_NEAR_DIST * LOD_NEAR_DIST
+    far2 = LOD_FAR_DIST * LOD_FAR_DIST
+    active = []
+    active_dt = []  # прошедшее время для каждого обновлённого врага (у средних — накопленное)
+    for i, e in enumerate(g.enemies):
         to_p = ppos - e["pos"]
-        dist = to_p.length()
+        d2 = to_p.length_squared()
+        step_dt = dt
+        if d2 < near2 or view.collidepoint(e["pos"].x, e["pos"].y):
+            e["lod_dt"] = None
+        else:
+            far = d2 >= far2
+            period = LOD_FAR_STEP if far else LOD_MID_STEP
+            acc = e.get("lod_dt")
+            if acc is None:
+                # Разносим обновления по кадрам, чтобы не обновлять всех разом
+                acc = (i % 8) * period / 8
+            acc += dt
+            if acc < period:
+                e["lod_dt"] = acc
+                continue
+            e["lod_dt"] = 0.0
+            step_dt = acc
+            if far:
+                e["t"] += step_dt
+                e["state"] = "wander"
+                desired = pygame.Vector2(math.cos(e["t"]*0.8), math.sin(e["t"]*0.7)) * (40 * diff["enemy_speed"])
+                # Шаг короче тайла: одна проверка конечной точки не проскочит стену
+                np_ = e["pos"] + desired * min(step_dt, LOD_FAR_STEP)
+                if can_stand_at(g, np_.x, np_.y, radius=10):
+                    e["pos"] = np_
+                    g.spatial.move("enemies", e)
+                continue
+
+        active.append(e)
+        active_dt.append(step_dt)
+        e["t"] += step_dt
+        dist = math.sqrt(d2)
         if player_in_shop:
             e["state"] = "wander"
         elif dist < 240:
@@ -214,6 +314,14 @@ def enemy_ai_and_collisions(g, dt):
             e["state"] = "wander"
 
         if e["state"] == "chase":
+            # Путь в обход стен — по общему полю (считается не чаще смены тайла игрока)
+            if not flow_ready:
+                g.flow.update(g)
+                flow_ready = True
+            nxt = g.flow.next_tile(e["pos"].x, e["pos"].y)
+            if nxt is not None:
+                to_p = pygame.Vector2((nxt[0] + 0.5) * TILE, (nxt[1] + 0.5) * TILE) - e["pos"]
+                dist = to_p.length()
             if dist > 1:
                 to_p.scale_to_length(65 * diff["enemy_speed"])
                 desired = to_p
@@ -222,50 +330,48 @@ def enemy_ai_and_collisions(g, dt):
         else:
             desired = pygame.Vector2(math.cos(e["t"]*0.8), math.sin(e["t"]*0.7)) * (40 * diff["enemy_speed"])
 
-        e["pos"] = collide_move(g, e["pos"], desired * dt, radius=10)
+        e["pos"] = collide_move(g, e["pos"], desired * step_dt, radius=10)
+        g.spatial.move("enemies", e)
 
-    # Разрешение взаимного пересечения врагов (простое раздвигание)
-    i = 0
-    while i < len(g.enemies):
-        j = i + 1
-        while j < len(g.enemies):
-            a = g.enemies[i]; b = g.enemies[j]
+    # Разрешение взаимного пересечения врагов (простое раздвигание).
+    # Пары берутся из соседних ячеек хэша для обновлённых в этом кадре врагов;
+    # пара из двух обновлённых обрабатывается один раз, как в прежнем
+    # переборе i < j по списку.
+    min_dist = 22.0
+    order = {id(e): i for i, e in enumerate(g.enemies)}
+    updated = {id(e) for e in active}
+    for a in active:
+        ia = order[id(a)]
+        for b in g.spatial.query("enemies", a["pos"], min_dist):
+            if id(b) in updated and order[id(b)] <= ia:
+                continue
             delta = a["pos"] - b["pos"]
             dist2 = delta.length_squared()
-            min_dist = 22.0
             if dist2 > 0 and dist2 < (min_dist * min_dist):
                 d = delta.length()
-                if d == 0:
-                    dir = pygame.Vector2(1, 0)
-                else:
-                    dir = delta / d
+                dir = delta / d
                 push = (min_dist - d) * 0.5
                 a["pos"] = collide_move(g, a["pos"], dir * push, radius=10)
                 b["pos"] = collide_move(g, b["pos"], -dir * push, radius=10)
-            j += 1
-        i += 1
+                g.spatial.move("enemies", a)
+                g.spatial.move("enemies", b)
 
-    # Атаки и контактный урон для каждого врага
-    for e in g.enemies[:]:
+    # Атаки и контактный урон — только у обновлённых (дальше LOD_NEAR_DIST
+    # до игрока не достать ни плевком, ни касанием)
+    for e, step_dt in zip(active, active_dt):
         to_p = ppos - e["pos"]
         dist = to_p.length()
         
         # Плевок (не стреляет по игроку в магазине)
         if e["kind"] == "spitter" and not player_in_shop:
-            e["atk_cd"] -= dt
+            e["atk_cd"] -= step_dt
             if e["atk_cd"] <= 0 and dist < 320 and dist > 80:  # Стреляет только на дистанции
                 dir = (ppos - e["pos"])
                 if dir.length() > 0:
                     dir = dir.normalize()
                     vel = dir * 260.0
-                    g.projectiles.append({
-                        "pos": pygame.Vector2(e["pos"]),
-                        "vel": vel,
-                        "life": 2.0,
-                        "dmg": 1,
-                        "from_enemy": True
-                    })
-                    e["atk_cd"] = random.uniform(0.9, 1.4)
+                    spawn_projectile(g, e["pos"], vel, life=2.0, dmg=1, from_enemy=True)
+                    e["atk_cd"] = g.rng.uniform(0.9, 1.4)
 
         # Контактный урон
         # Проверяем заново, не в магазине ли игрок сейчас
@@ -283,8 +389,12 @@ def enemy_ai_and_collisions(g, dt):
                 if g.player["hp"] <= 0:
                     g.game_over = True
 
-def handle_input(g, dt, events):
-    keys = pygame.key.get_pressed()
+def handle_input(g, dt, events, keys=None, mouse_pos=None):
+    # keys/mouse_pos можно подать извне (сценарный ввод без окна)
+    if keys is None:
+        keys = pygame.key.get_pressed()
+    if mouse_pos is None:
+        mouse_pos = pygame.mouse.get_pos()
     move = pygame.Vector2(0, 0)
     if keys[pygame.K_w]: move.y -= 1
     if keys[pygame.K_s]: move.y += 1
@@ -301,12 +411,12 @@ def handle_input(g, dt, events):
 
     for e in events:
         if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
-            mx, my = pygame.mouse.get_pos()
+            mx, my = mouse_pos
             world_target = pygame.Vector2(mx + g.cam.x, my + g.cam.y)
             fire_projectile(g, world_target)
         if e.type == pygame.KEYDOWN:
             if e.key == pygame.K_SPACE:
-                mx, my = pygame.mouse.get_pos()
+                mx, my = mouse_pos
                 world_target = pygame.Vector2(mx + g.cam.x, my + g.cam.y)
                 fire_projectile(g, world_target)
             if e.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
@@ -322,6 +432,8 @@ def handle_input(g, dt, events):
                 g.show_controls = not g.show_controls
             if e.key == pygame.K_TAB:
                 g.show_minimap = not g.show_minimap
+            if e.key == pygame.K_F3:
+                g.profiler.toggle()
 
     # Тики кулдаунов
     g.player["dash_cd"] = max(0.0, g.player["dash_cd"] - dt)
@@ -333,4 +445,30 @@ def handle_input(g, dt, events):
 def check_exit(g):
     if not g.exit_rect or not g.exit_open: return
     if g.exit_rect.collidepoint(g.player["pos"].x, g.player["pos"].y):
-        g.win = True
\ No newline at end of file
+        g.win = True
+
+# Один шаг симуляции (ветка STATE_PLAY): системы в порядке вызова.
+# Каждая принимает (g, dt, inp), где inp = (events, keys, mouse_pos).
+SIM_SYSTEMS = (
+    ("handle_input", lambda g, dt, inp: handle_input(g, dt, inp[0], inp[1], inp[2])),
+    ("update_visited_by_player", lambda g, dt, inp: update_visited_by_player(g)),
+    ("clamp_camera", lambda g, dt, inp: clamp_camera(g)),
+    ("pick_up_items", lambda g, dt, inp: pick_up_items(g)),
+    ("enemy_ai_and_collisions", lambda g, dt, inp: enemy_ai_and_collisions(g, dt)),
+    ("update_projectiles", lambda g, dt, inp: update_projectiles(g, dt)),
+    ("update_particles", lambda g, dt, inp: update_particles(g, dt)),
+    ("update_float_texts", lambda g, dt, inp: update_float_texts(g, dt)),
+    ("check_exit", lambda g, dt, inp: check_exit(g)),
+)
+
+def step_simulation(g, dt, events, keys=None, mouse_pos=None):
+    inp = (events, keys, mouse_pos)
+    prof = g.profiler
+    if prof.enabled:
+        for name, system in SIM_SYSTEMS:
+            t0 = perf_counter()
+            system(g, dt, inp)
+            prof.record(name, perf_counter() - t0)
+        return
+    for _, system in SIM_SYSTEMS:
+        system(g, dt, inp)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pygame
+
+from edit_history import EditHistory
+from grid import Grid
+from tile_index import TileIndex, tile_of
+from config import TILE
+
+
+def make_game(w=40, h=30):
+    return SimpleNamespace(tiles=Grid(w, h, 0), treasures=[], enemies=[],
+                           exit_rect=None, shop_rect=pygame.Rect(0, 0, 48, 48), spawn_tx=1, spawn_ty=1)
+
+
+def snapshot(g):
+    return (bytes(g.tiles.cells),
+            sorted((tile_of(o), o["type"]) for o in g.treasures),
+            None if g.exit_rect is None else tuple(g.exit_rect),
+            (g.spawn_tx, g.spawn_ty))
+
+
+def random_edit(g, h, index, rng):
+    # Одна правка: мазок по тайлам, пачка, объекты и атрибуты вперемешку
+    w, hh = g.tiles.w, g.tiles.h
+    h.begin()
+    for _ in range(rng.randrange(1, 30)):
+        op = rng.random()
+        tx, ty = rng.randrange(w), rng.randrange(hh)
+        if op < 0.5:
+            old, new = g.tiles.get(tx, ty), rng.randrange(3)
+            if old != new:
+                g.tiles.set(tx, ty, new)
+                h.tile(tx, ty, old, new)
+        elif op < 0.6:
+            idx = np.unique(np.array([rng.randrange(w * hh) for _ in range(40)], dtype=np.uint32))
+            flat = g.tiles.array().reshape(-1)
+            old, new = flat[idx].copy(), rng.randrange(3)
+            flat[idx] = new
+            h.tiles_bulk(idx, old, new)
+        elif op < 0.75:
+            obj = {"pos": pygame.Vector2(tx * TILE + TILE / 2, ty * TILE + TILE / 2), "type": rng.randrange(4)}
+            index.add(obj)
+            h.add(index, obj)
+        elif op < 0.85 and g.treasures:
+            obj = rng.choice(g.treasures)
+            index.remove(obj)
+            h.remove(index, obj)
+        elif op < 0.95 and g.treasures:
+            obj = rng.choice(g.treasures)
+            old = pygame.Vector2(obj["pos"])
+            index.move(obj, pygame.Vector2(tx * TILE + TILE / 2, ty * TILE + TILE / 2))
+            h.move(index, obj, old, obj["pos"])
+        else:
+            old = h.get_attr("exit_rect")
+            g.exit_rect = pygame.Rect(tx * TILE, ty * TILE, 2 * TILE, 2 * TILE)
+            h.attr("exit_rect", old, g.exit_rect)
+            h.attr("spawn", (g.spawn_tx, g.spawn_ty), (tx, ty))
+            g.spawn_tx, g.spawn_ty = tx, ty
+    return h.commit()
+
+
+def test_undo_and_redo_restore_every_state():
+    rng = random.Random(4)
+    g = make_game()
+    index = TileIndex(g, "treasures")
+    changed = []
+    h = EditHistory(g, on_tiles=lambda idx: changed.append(idx))
+    states = [snapshot(g)]
+    for _ in range(60):
+        if random_edit(g, h, index, rng):
+            states.append(snapshot(g))
+    assert len(h.undo_stack) == len(states) - 1
+    for state in reversed(states[:-1]):
+        assert h.undo()
+        assert snapshot(g) == state
+    assert not h.undo()
+    for state in states[1:]:
+        assert h.redo()
+        assert snapshot(g) == state
+    assert not h.redo()
+    assert changed
+
+
+def test_stroke_over_the_same_tile_is_one_step_keeping_first_value():
+    g = make_game()
+    h = EditHistory(g)
+    h.begin()
+    for value in (1, 2, 1, 2):
+        old = g.tiles.get(3, 4)
+        g.tiles.set(3, 4, value)
+        h.tile(3, 4, old, value)
+    h.commit()
+    assert h.undo()
+    assert g.tiles.get(3, 4) == 0
+    # Мазок, вернувший всё как было, в историю не попадает
+    h.begin()
+    g.tiles.set(1, 1, 1); h.tile(1, 1, 0, 1)
+    g.tiles.set(1, 1, 0); h.tile(1, 1, 1, 0)
+    assert not h.commit()
+
+
+def test_new_edit_drops_redo_and_budget_drops_oldest():
+    g = make_game()
+    h = EditHistory(g, budget=2000)
+    for i in range(50):
+        h.begin()
+        h.tile(i % 40, 0, 0, 1)
+        g.tiles.set(i % 40, 0, 1)
+        h.commit()
+    assert h.bytes <= 2000 and 1 <= len(h.undo_stack) < 50
+    assert h.bytes == sum(tx.size for tx in h.undo_stack)
+    h.undo()
+    assert h.redo_stack
+    h.begin(); h.tile(0, 5, 0, 2); g.tiles.set(0, 5, 2); h.commit()
+    assert not h.redo_stack
+
+
+def test_history_is_dropped_when_the_grid_is_replaced():
+    g = make_game()
+    h = EditHistory(g)
+    h.begin(); h.tile(0, 0, 0, 1); g.tiles.set(0, 0, 1); h.commit()
+    g.tiles = Grid(40, 30, 0)
+    assert not h.undo()
+    assert g.tiles.get(0, 0) == 0
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+
+import numpy as np
+
+from edit_tools import flood_cells, line_cells, rect_cells, set_cells
+from grid import Grid
+
+
+def bfs_region(grid, x, y):
+    a = grid.array()
+    h, w = a.shape
+    value = a[y, x]
+    seen = {(x, y)}
+    queue = deque([(x, y)])
+    while queue:
+        cx, cy = queue.popleft()
+        for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+            if 0 <= nx < w and 0 <= ny < h and (nx, ny) not in seen and a[ny, nx] == value:
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return {cy * w + cx for cx, cy in seen}
+
+
+def bresenham(x0, y0, x1, y1):
+    cells = []
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx, sy = (1 if x1 > x0 else -1), (1 if y1 > y0 else -1)
+    err = dx + dy
+    while True:
+        cells.append((x0, y0))
+        if (x0, y0) == (x1, y1):
+            return cells
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+def test_flood_fill_matches_bfs():
+    rng = np.random.default_rng(11)
+    for _ in range(150):
+        w, h = (int(v) for v in rng.integers(1, 50, 2))
+        grid = Grid(w, h)
+        grid.array()[:] = rng.random((h, w)) < rng.uniform(0.2, 0.6)
+        x, y = int(rng.integers(w)), int(rng.integers(h))
+        assert set(flood_cells(grid, x, y).tolist()) == bfs_region(grid, x, y)
+
+
+def test_flood_fill_outside_the_map_is_empty():
+    assert len(flood_cells(Grid(4, 4), 4, 0)) == 0
+
+
+def test_line_is_connected_and_matches_bresenham_up_to_ties():
+    rng = np.random.default_rng(12)
+    for _ in range(300):
+        x0, y0, x1, y1 = (int(v) for v in rng.integers(0, 40, 4))
+        cells = [(i % 40, i // 40) for i in line_cells(40, 40, x0, y0, x1, y1).tolist()]
+        ref = bresenham(x0, y0, x1, y1)
+        assert cells[0] == (x0, y0) and cells[-1] == (x1, y1)
+        assert len(cells) == len(ref) == max(abs(x1 - x0), abs(y1 - y0)) + 1
+        # Соседние клетки касаются друг друга, а от эталона отличаются не больше чем на клетку
+        assert all(max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 1 for a, b in zip(cells, cells[1:]))
+        assert all(max(abs(a[0] - b[0]), abs(a[1] - b[1])) <= 1 for a, b in zip(cells, ref))
+
+
+def test_line_is_clipped_to_the_map():
+    idx = line_cells(10, 10, -5, 2, 14, 2)
+    assert sorted(idx.tolist()) == [20 + x for x in range(10)]
+
+
+def test_rect_outline_and_fill():
+    filled = set(rect_cells(10, 8, 6, 5, 2, 1).tolist())
+    assert filled == {y * 10 + x for y in range(1, 6) for x in range(2, 7)}
+    outline = set(rect_cells(10, 8, 2, 1, 6, 5, filled=False).tolist())
+    assert outline == {y * 10 + x for y in range(1, 6) for x in range(2, 7) if x in (2, 6) or y in (1, 5)}
+    assert set(rect_cells(10, 8, -3, -3, 20, 20).tolist()) == set(range(80))
+    assert len(rect_cells(10, 8, 12, 1, 15, 3)) == 0
+
+
+def test_set_cells_reports_only_changed_cells():
+    grid = Grid(5, 5, 0)
+    grid.set(1, 0, 1)
+    idx, old = set_cells(grid, np.arange(5, dtype=np.uint32), 1)
+    assert idx.tolist() == [0, 2, 3, 4]
+    assert old.tolist() == [0, 0, 0, 0]
+    assert list(grid.cells[:5]) == [1] * 5
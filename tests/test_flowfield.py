@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import pygame
+
+from config import TILE, WALL_NORMAL
+from flowfield import FlowField
+from grid import Grid
+
+
+def make_game(w=30, h=20, walls=(), player=(5, 5)):
+    tiles = Grid(w, h, 0)
+    for tx, ty in walls:
+        tiles.set(tx, ty, WALL_NORMAL)
+    return SimpleNamespace(MAP_W=w, MAP_H=h, tiles=tiles,
+                           player={"pos": pygame.Vector2(centre(*player))})
+
+
+def centre(tx, ty):
+    return (tx + 0.5) * TILE, (ty + 0.5) * TILE
+
+
+def solid(g, tx, ty):
+    return bool(g.tiles.solid()[ty, tx])
+
+
+def walk(flow, tx, ty, limit=200):
+    # Путь по полю от тайла до игрока
+    path = [(tx, ty)]
+    while len(path) < limit:
+        nxt = flow.next_tile(*centre(*path[-1]))
+        if nxt is None:
+            return path
+        path.append(nxt)
+    raise AssertionError("поле зациклилось")
+
+
+def test_path_reaches_player_around_wall():
+    # Вертикальная стена с проходом снизу
+    wall = [(10, y) for y in range(0, 15)]
+    g = make_game(walls=wall, player=(5, 5))
+    flow = FlowField(radius=24)
+    flow.update(g)
+    path = walk(flow, 15, 5)
+    assert path[-1] == (5, 5)
+    assert all(not solid(g, x, y) for x, y in path)
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert max(abs(ax - bx), abs(ay - by)) == 1
+        if ax != bx and ay != by:
+            # диагональ не срезает угол стены
+            assert not solid(g, bx, ay) and not solid(g, ax, by)
+
+
+def test_player_tile_and_unreachable_tiles_have_no_step():
+    # Замкнутая комната из стен вокруг (20, 10)
+    room = [(x, y) for x in range(18, 23) for y in range(8, 13) if x in (18, 22) or y in (8, 12)]
+    g = make_game(walls=room, player=(5, 5))
+    flow = FlowField(radius=24)
+    flow.update(g)
+    assert flow.next_tile(*centre(5, 5)) is None
+    assert flow.next_tile(*centre(20, 10)) is None
+    assert flow.next_tile(*centre(17, 10)) is not None
+
+
+def test_window_edge():
+    g = make_game(w=60, h=20, player=(10, 10))
+    flow = FlowField(radius=8)
+    flow.update(g)
+    # Последний столбец окна ведёт внутрь, следующий — уже вне поля
+    assert flow.next_tile(*centre(18, 10)) == (17, 10)
+    assert flow.next_tile(*centre(19, 10)) is None
+    assert flow.next_tile(-TILE, -TILE) is None
+
+
+def test_recomputed_only_when_needed():
+    g = make_game(player=(5, 5))
+    flow = FlowField(radius=24)
+    flow.update(g)
+    steps = flow.steps
+    flow.update(g)
+    assert flow.steps is steps
+    g.player["pos"] = pygame.Vector2(centre(6, 5))
+    flow.update(g)
+    assert flow.steps is not steps
+    assert flow.next_tile(*centre(5, 5)) == (6, 5)
+    # Стену поставили (или разрушили) — поле пересчитывается после invalidate()
+    g.tiles.set(7, 5, WALL_NORMAL)
+    flow.invalidate()
+    flow.update(g)
+    assert flow.next_tile(*centre(8, 5)) != (7, 5)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import pygame
+
+from headless import HeadlessGame, ScriptedInput, WanderInput, key_down
+
+SETTINGS = {"size_name": "Маленький", "map_w": 60, "map_h": 40, "difficulty": "Нормальная", "seed": 5}
+
+
+def state(g):
+    return (round(g.player["pos"].x, 6), round(g.player["pos"].y, 6), g.player["hp"], len(g.inventory),
+            [(round(e["pos"].x, 6), round(e["pos"].y, 6), e["hp"]) for e in g.enemies],
+            len(g.treasures), len(g.projectiles))
+
+
+def test_same_seed_and_input_give_the_same_run():
+    a = HeadlessGame(SETTINGS, WanderInput(3))
+    a.run(300)
+    b = HeadlessGame(SETTINGS, WanderInput(3))
+    b.run(300)
+    assert a.ticks == b.ticks == 300
+    assert state(a.game) == state(b.game)
+
+
+def test_scripted_input_drives_the_player():
+    frames = [((pygame.K_d,), [key_down(pygame.K_SPACE)] if i == 0 else [], (900, 300)) for i in range(30)]
+    runner = HeadlessGame(SETTINGS, ScriptedInput(frames), auto_restart=False)
+    start = pygame.Vector2(runner.game.player["pos"])
+    stats = runner.run(30)
+    assert stats["ticks"] == 30
+    assert stats["sim_seconds"] == 30 * runner.dt
+    assert runner.game.player["pos"].x > start.x
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+
+from grid import Grid
+from map_io import convert_map, load_map, save_map
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KING_CITY = os.path.join(ROOT, "maps", "DS_map_KingCity.json")
+
+
+@pytest.fixture(autouse=True)
+def _cwd(tmp_path, monkeypatch):
+    # save_map создаёт maps/ в текущем каталоге
+    monkeypatch.chdir(tmp_path)
+
+
+def test_json_dsm_json_round_trip(tmp_path):
+    dsm = str(tmp_path / "k.dsm")
+    back = str(tmp_path / "k2.json")
+    convert_map(KING_CITY, dsm)
+    assert isinstance(load_map(dsm)["tiles"], Grid)
+    convert_map(dsm, back)
+    with open(KING_CITY, encoding="utf-8") as f:
+        original = json.load(f)
+    with open(back, encoding="utf-8") as f:
+        restored = json.load(f)
+    assert restored == original
+
+
+def test_failed_save_keeps_existing_map(tmp_path):
+    path = str(tmp_path / "m.json")
+    save_map(path, {"tiles": [[0, 1], [1, 0]]})
+    with open(path, "rb") as f:
+        before = f.read()
+    with pytest.raises(TypeError):
+        save_map(path, {"tiles": [[0, 1], [1, 0]], "bad": object()})
+    with open(path, "rb") as f:
+        assert f.read() == before
+    assert not os.path.exists(path + ".tmp")
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import random
+
+from mapgen import build_floor
+
+SETTINGS = {"map_w": 80, "map_h": 60, "difficulty": "Нормальная", "treasure_density": 0.05,
+            "smooth_passes": 2}
+
+
+def fingerprint(floor):
+    return (bytes(floor.tiles.cells),
+            [(t["pos"].x, t["pos"].y, t["type"]) for t in floor.treasures],
+            [(e["pos"].x, e["pos"].y, e["kind"], e["hp"]) for e in floor.enemies],
+            tuple(floor.exit_rect), (floor.spawn_tx, floor.spawn_ty), floor.TARGET_GOLD,
+            floor.rng.random())
+
+
+def test_same_seed_builds_the_same_floor():
+    random.seed(1)
+    a = fingerprint(build_floor(SETTINGS, 1234))
+    # Глобальный random не участвует в генерации
+    random.seed(2)
+    b = fingerprint(build_floor(SETTINGS, 1234))
+    assert a == b
+
+
+def test_different_seeds_build_different_floors():
+    assert fingerprint(build_floor(SETTINGS, 1)) != fingerprint(build_floor(SETTINGS, 2))
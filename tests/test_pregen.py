@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import pregen
+from mapgen import FloorCancelled, build_floor
+
+SETTINGS = {"map_w": 60, "map_h": 50, "difficulty": "Нормальная", "treasure_density": 0.05,
+            "smooth_passes": 2, "seed": 7}
+
+
+def test_request_waits_for_stable_settings():
+    now = [0.0]
+    p = pregen.FloorPrefetcher(delay=0.3, clock=lambda: now[0])
+    try:
+        p.request(dict(SETTINGS, seed=1))
+        now[0] = 0.2
+        p.request(dict(SETTINGS, seed=2))  # настройки сменились — отсчёт заново
+        now[0] = 0.4
+        p.request(dict(SETTINGS, seed=2))
+        assert p.take(dict(SETTINGS, seed=2)) is None
+        for t in (1.0, 1.1, 1.4):
+            now[0] = t
+            p.request(dict(SETTINGS, seed=2))
+        floor = p.take(dict(SETTINGS, seed=2))
+        assert floor is not None and floor.seed == 2
+    finally:
+        p.shutdown()
+
+
+def test_superseded_floor_is_cancelled_on_the_same_worker(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    cancelled_seeds = []
+
+    def build(settings, seed, cancelled):
+        if seed == 1:
+            started.set()
+            while not release.wait(0.01):
+                if cancelled():
+                    cancelled_seeds.append(seed)
+                    raise FloorCancelled()
+        return seed
+
+    monkeypatch.setattr(pregen, "build_floor", build)
+    p = pregen.FloorPrefetcher(delay=0)
+    try:
+        p.request({"seed": 1})
+        assert started.wait(1)
+        for seed in range(2, 12):
+            p.request({"seed": seed})
+        t0 = time.perf_counter()
+        assert p.take({"seed": 11}) == 11
+        assert time.perf_counter() - t0 < 1.0
+        assert cancelled_seeds == [1]
+        assert len(p._executor._threads) == 1
+        # Этаж под другие настройки не отдаётся
+        p.request({"seed": 3})
+        assert p.take({"seed": 4}) is None
+    finally:
+        release.set()
+        p.shutdown()
+
+
+def test_build_floor_stops_when_cancelled():
+    calls = []
+
+    def cancelled():
+        calls.append(1)
+        return len(calls) > 1
+
+    with pytest.raises(FloorCancelled):
+        build_floor(SETTINGS, 7, cancelled)
+    assert build_floor(SETTINGS, 7, lambda: False).seed == 7
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import numpy as np
+
+from config import TILE, WALL_NORMAL, WALL_BREAKABLE
+from grid import Grid
+from raycast import segment_wall_hit, segment_wall_hits
+
+
+def make_game(w=12, h=10, walls=(), breakable=()):
+    tiles = Grid(w, h, 0)
+    for tx, ty in walls:
+        tiles.set(tx, ty, WALL_NORMAL)
+    for tx, ty in breakable:
+        tiles.set(tx, ty, WALL_BREAKABLE)
+    return SimpleNamespace(MAP_W=w, MAP_H=h, tiles=tiles)
+
+
+def centre(tx, ty):
+    return (tx + 0.5) * TILE, (ty + 0.5) * TILE
+
+
+def sampled_hit(g, x0, y0, x1, y1, breakable=True):
+    # Эталон: плотная выборка точек отрезка, первый непроходимый тайл по пути
+    n = int(np.hypot(x1 - x0, y1 - y0) * 40) + 2
+    t = np.linspace(0.0, 1.0, n)
+    tx = np.floor((x0 + (x1 - x0) * t) / TILE).astype(int)
+    ty = np.floor((y0 + (y1 - y0) * t) / TILE).astype(int)
+    for x, y in zip(tx.tolist(), ty.tolist()):
+        if not (0 <= x < g.MAP_W and 0 <= y < g.MAP_H):
+            return None
+        v = g.tiles.get(x, y)
+        if v == WALL_NORMAL or (breakable and v == WALL_BREAKABLE):
+            return x, y
+    return None
+
+
+def test_fast_segment_does_not_tunnel_through_thin_wall():
+    g = make_game(walls=[(5, y) for y in range(10)])
+    x0, y0 = centre(2, 4)
+    x1, y1 = centre(9, 4)
+    assert segment_wall_hit(g, x0, y0, x1, y1) == (5, 4)
+
+
+def test_zero_length_and_start_inside_wall():
+    g = make_game(walls=[(3, 3)])
+    x, y = centre(3, 3)
+    assert segment_wall_hit(g, x, y, x, y) == (3, 3)
+    x, y = centre(1, 1)
+    assert segment_wall_hit(g, x, y, x, y) is None
+
+
+def test_axis_aligned_segments_in_all_directions():
+    g = make_game(walls=[(6, 5), (2, 5), (4, 8), (4, 1)])
+    x, y = centre(4, 5)
+    for (ex, ey), hit in (((10, 5), (6, 5)), ((0, 5), (2, 5)), ((4, 9), (4, 8)), ((4, 0), (4, 1))):
+        assert segment_wall_hit(g, x, y, *centre(ex, ey)) == hit
+
+
+def test_segment_ending_exactly_on_tile_boundary():
+    g = make_game(walls=[(5, 2)])
+    y = 2.5 * TILE
+    # Конец отрезка — ровно на левой грани стены: стена уже задета
+    assert segment_wall_hit(g, 1.5 * TILE, y, 5 * TILE, y) == (5, 2)
+    assert segment_wall_hit(g, 1.5 * TILE, y, 5 * TILE - 0.01, y) is None
+
+
+def test_breakable_walls_can_be_skipped():
+    g = make_game(walls=[(8, 4)], breakable=[(5, 4)])
+    x0, y0 = centre(2, 4)
+    x1, y1 = centre(10, 4)
+    assert segment_wall_hit(g, x0, y0, x1, y1, breakable=True) == (5, 4)
+    assert segment_wall_hit(g, x0, y0, x1, y1, breakable=False) == (8, 4)
+
+
+def test_leaving_the_map_finds_no_wall():
+    g = make_game(walls=[(11, 0)])
+    assert segment_wall_hit(g, *centre(9, 5), -50.0, -50.0) is None
+    assert segment_wall_hit(g, -30.0, 5.0, -5.0, 5.0) is None
+
+
+def test_scalar_and_batch_match_dense_sampling():
+    rng = np.random.default_rng(7)
+    g = make_game(30, 20)
+    cells = g.tiles.array()
+    cells[:] = rng.choice([0, WALL_NORMAL, WALL_BREAKABLE], size=cells.shape, p=[0.8, 0.1, 0.1])
+    n = 400
+    x0 = rng.uniform(-TILE, 31 * TILE, n)
+    y0 = rng.uniform(-TILE, 21 * TILE, n)
+    x1 = x0 + rng.uniform(-6, 6, n) * TILE
+    y1 = y0 + rng.uniform(-6, 6, n) * TILE
+    brk = rng.random(n) < 0.5
+    hx, hy = segment_wall_hits(g, x0, y0, x1, y1, brk)
+    for i in range(n):
+        args = (g, x0[i], y0[i], x1[i], y1[i], bool(brk[i]))
+        expected = sampled_hit(*args)
+        assert segment_wall_hit(*args) == expected
+        assert (None if hx[i] < 0 else (hx[i], hy[i])) == expected
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import random
+
+import numpy as np
+import pygame
+
+from headless import HeadlessGame
+from render import draw_world
+from systems import reindex_entities
+
+SETTINGS = {"size_name": "Средний", "map_w": 80, "map_h": 50, "difficulty": "Нормальная", "seed": 11}
+
+
+def test_culled_entities_draw_like_full_lists(monkeypatch):
+    monkeypatch.setattr(pygame.time, "get_ticks", lambda: 1234)
+    g = HeadlessGame(SETTINGS).game
+    # Левый и верхний края экрана — на границах ячеек хэша
+    g.cam = pygame.Vector2(480, 336)
+    g.cam_prev = None
+    W, H = g.screen.get_size()
+    # Сущности решёткой поверх экрана и полосы за его краями
+    rng = random.Random(2)
+    spots = [pygame.Vector2(g.cam.x + x, g.cam.y + y)
+             for x in range(-90, W + 90, 41) for y in range(-90, H + 90, 43)]
+    rng.shuffle(spots)
+    third = len(spots) // 3
+    g.treasures[:] = [{"pos": p, "type": rng.randrange(3)} for p in spots[:third]]
+    g.enemies[:] = [{"pos": p, "hp": rng.randrange(1, 4), "kind": "chaser", "t": 0.0, "state": "wander",
+                     "atk_cd": 0.0} for p in spots[third:2 * third]]
+    g.projectiles[:] = [{"pos": p, "vel": pygame.Vector2(), "life": 1.0, "dmg": 1, "from_enemy": bool(i % 2)}
+                        for i, p in enumerate(spots[2 * third:])]
+    reindex_entities(g)
+
+    draw_world(g)
+    culled = pygame.surfarray.array3d(g.screen)
+    monkeypatch.setattr(g.spatial, "query_rect", lambda layer, rect: list(getattr(g, layer)))
+    draw_world(g)
+    assert np.array_equal(culled, pygame.surfarray.array3d(g.screen))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pygame
+
+from spatial import SPATIAL_CELL, SpatialHash
+
+
+def brute_query(objs, pos, radius):
+    return {id(o) for o in objs if (o["pos"] - pos).length_squared() < radius * radius}
+
+
+def test_query_matches_brute_force_after_moves_and_removals():
+    rng = random.Random(3)
+    h = SpatialHash()
+    objs = [{"pos": pygame.Vector2(rng.uniform(-100, 900), rng.uniform(-100, 700))} for _ in range(300)]
+    h.rebuild("enemies", objs)
+    for step in range(200):
+        for o in rng.sample(objs, 20):
+            o["pos"] += pygame.Vector2(rng.uniform(-80, 80), rng.uniform(-80, 80))
+            h.move("enemies", o)
+        if step % 10 == 0:
+            gone = objs.pop(rng.randrange(len(objs)))
+            h.remove("enemies", gone)
+        pos = pygame.Vector2(rng.uniform(-100, 900), rng.uniform(-100, 700))
+        radius = rng.uniform(1, 2 * SPATIAL_CELL)
+        assert {id(o) for o in h.query("enemies", pos, radius)} == brute_query(objs, pos, radius)
+
+
+def test_query_rect_covers_every_object_inside():
+    rng = random.Random(5)
+    h = SpatialHash()
+    objs = [{"pos": pygame.Vector2(rng.uniform(0, 1000), rng.uniform(0, 1000))} for _ in range(500)]
+    h.rebuild("treasures", objs)
+    rect = pygame.Rect(130, 270, 410, 333)
+    found = {id(o) for o in h.query_rect("treasures", rect)}
+    inside = {id(o) for o in objs if rect.collidepoint(o["pos"].x, o["pos"].y)}
+    assert inside <= found
+    # Лишними могут быть только объекты из ячеек на границе прямоугольника
+    grown = rect.inflate(2 * SPATIAL_CELL, 2 * SPATIAL_CELL)
+    assert all(grown.collidepoint(o["pos"].x, o["pos"].y) for o in objs if id(o) in found)
+
+
+def test_layers_are_independent_and_unknown_objects_are_ignored():
+    h = SpatialHash()
+    a = {"pos": pygame.Vector2(10, 10)}
+    b = {"pos": pygame.Vector2(12, 12)}
+    h.insert("enemies", a)
+    h.insert("projectiles", b)
+    h.remove("enemies", b)
+    assert h.query("enemies", pygame.Vector2(10, 10), 5) == [a]
+    assert h.query("treasures", pygame.Vector2(10, 10), 5) == []
+    # move() для объекта не из слоя просто добавляет его
+    c = {"pos": pygame.Vector2(11, 11)}
+    h.move("enemies", c)
+    assert {id(o) for o in h.query("enemies", pygame.Vector2(10, 10), 5)} == {id(a), id(c)}
+
+
+def test_picked_treasures_leave_list_in_order_and_hash():
+    from types import SimpleNamespace
+    from particles import ParticlePool
+    import systems
+
+    rng = random.Random(9)
+    treasures = [{"pos": pygame.Vector2(rng.uniform(0, 500), rng.uniform(0, 500)), "type": 0}
+                 for _ in range(200)]
+    g = SimpleNamespace(spatial=SpatialHash(), projectiles=[], enemies=[], treasures=list(treasures),
+                        player={"pos": pygame.Vector2()}, inventory=[], inventory_value=0,
+                        particles=ParticlePool(seed=1), float_texts=[])
+    systems.reindex_entities(g)
+    for _ in range(40):
+        g.player["pos"] = pygame.Vector2(rng.uniform(0, 500), rng.uniform(0, 500))
+        systems.pick_up_items(g)
+        near = [t for t in treasures if (t["pos"] - g.player["pos"]).length_squared() < 22 ** 2]
+        treasures = [t for t in treasures if all(t is not n for n in near)]
+        # Оставшиеся — в прежнем порядке, как при удалении по одному
+        assert len(g.treasures) == len(treasures)
+        assert all(a is b for a, b in zip(g.treasures, treasures))
+        assert all(o is not t for t in near for o in g.spatial.query("treasures", t["pos"], 1))
+    assert len(g.inventory) == 200 - len(g.treasures)
+
+
+def test_projectile_hits_the_first_enemy_in_list_order():
+    from types import SimpleNamespace
+    from config import TILE
+    from grid import Grid
+    from particles import ParticlePool
+    import systems
+
+    g = SimpleNamespace(MAP_W=20, MAP_H=20, tiles=Grid(20, 20, 0), breakable_walls={},
+                        spatial=SpatialHash(), projectiles=[], treasures=[],
+                        shop_rect=pygame.Rect(-100, -100, 1, 1), player={"pos": pygame.Vector2()},
+                        particles=ParticlePool(seed=1), float_texts=[], rng=random.Random(1))
+    at = pygame.Vector2(10 * TILE, 10 * TILE)
+    # Хвост списка с тем же положением не должен перехватывать попадания
+    g.enemies = [{"pos": pygame.Vector2(at), "hp": 5, "n": i} for i in range(6)]
+    g.enemies[0]["hp"] = 1
+    systems.reindex_entities(g)
+    # Порядок в ячейке хэша — обратный списку
+    g.spatial.rebuild("enemies", g.enemies[::-1])
+    for _ in range(3):
+        systems.spawn_projectile(g, at, pygame.Vector2(), 1.0, 1, False)
+    systems.update_projectiles(g, 1 / 60)
+    assert [e["n"] for e in g.enemies] == [1, 2, 3, 4, 5]
+    assert [e["hp"] for e in g.enemies] == [3, 5, 5, 5, 5]
+    assert not g.projectiles
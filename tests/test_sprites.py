@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pygame
+import pytest
+
+from sprites import ENEMY_HP_MAX, PLAYER_DIRS, SpriteCache
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _display():
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    yield
+    pygame.display.quit()
+
+
+def test_sprites_are_built_once_per_variant():
+    cache = SpriteCache()
+    assert cache.enemy("chaser", 2) is cache.enemy("chaser", 2)
+    assert cache.enemy("chaser", 2)[0] is not cache.enemy("spitter", 2)[0]
+    # HP сверх полной полоски и ниже нуля не плодят новых спрайтов
+    assert cache.enemy("chaser", 50) is cache.enemy("chaser", ENEMY_HP_MAX)
+    assert cache.enemy("chaser", -1) is cache.enemy("chaser", 0)
+    # Близкие направления взгляда попадают в один сектор
+    assert cache.player(pygame.Vector2(1, 0)) is cache.player(pygame.Vector2(1, 0.01))
+    for k in range(PLAYER_DIRS * 2):
+        cache.player(pygame.Vector2(1, 0).rotate(k * 360 / (PLAYER_DIRS * 2)))
+    assert len([key for key in cache.sprites if key[0] == "player"]) == PLAYER_DIRS
+
+
+def test_enemy_sprite_matches_direct_drawing():
+    # Спрайт, поставленный в (x - ox, y - oy), даёт те же пиксели, что и
+    # отрисовка примитивами прямо на экран
+    cache = SpriteCache()
+    for kind, hp in (("chaser", 3), ("spitter", 1)):
+        direct = pygame.Surface((80, 80))
+        direct.fill((16, 18, 24))
+        x, y = 40, 40
+        col = ((180, 60, 60) if kind == "chaser" else (200, 130, 80)) if hp >= 2 else (240, 180, 120)
+        pygame.draw.circle(direct, (10, 10, 10), (x, y + 2), 12)
+        pygame.draw.circle(direct, col, (x, y), 12)
+        pygame.draw.rect(direct, (30, 30, 30), pygame.Rect(x - 10, y - 18, 20, 4), border_radius=3)
+        pygame.draw.rect(direct, (255, 100, 100), pygame.Rect(x - 10, y - 18, int(20 * hp / 3), 4), border_radius=3)
+
+        cached = pygame.Surface((80, 80))
+        cached.fill((16, 18, 24))
+        surf, ox, oy = cache.enemy(kind, hp)
+        cached.blit(surf, (x - ox, y - oy))
+        assert np.array_equal(pygame.surfarray.array3d(direct), pygame.surfarray.array3d(cached))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pygame
+import pytest
+
+from text_cache import TextCache
+
+
+@pytest.fixture(scope="module")
+def font():
+    pygame.font.init()
+    return pygame.font.Font(None, 18)
+
+
+def test_repeated_string_is_rendered_once(font):
+    cache = TextCache()
+    a = cache.render(font, "Золото: 10", (255, 255, 255))
+    b = cache.render(font, "Золото: 10", [255, 255, 255])
+    assert a is b
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Другой цвет или сглаживание — другая поверхность
+    assert cache.render(font, "Золото: 10", (255, 0, 0)) is not a
+    assert cache.render(font, "Золото: 10", (255, 255, 255), antialias=False) is not a
+    assert len(cache) == 3
+
+
+def test_least_recently_used_string_is_evicted(font):
+    cache = TextCache(capacity=2)
+    a = cache.render(font, "a", (1, 1, 1))
+    cache.render(font, "b", (1, 1, 1))
+    assert cache.render(font, "a", (1, 1, 1)) is a
+    cache.render(font, "c", (1, 1, 1))
+    assert len(cache) == 2
+    assert cache.render(font, "a", (1, 1, 1)) is a
+    misses = cache.misses
+    cache.render(font, "b", (1, 1, 1))
+    assert cache.misses == misses + 1
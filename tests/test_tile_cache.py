@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import numpy as np
+import pygame
+import pytest
+
+from grid import Grid
+from config import TILE, WALL_BREAKABLE, WALL_NORMAL
+from tile_cache import EditorChunkCache, TileLayer
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _display():
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    yield
+    pygame.display.quit()
+
+
+ZOOMS = (1.0, 0.5, 0.683013, 2.143589)
+CAM = pygame.Vector2(37, 55)
+
+
+def shot(g, cache, zoom):
+    surf = pygame.Surface((640, 480))
+    surf.fill((0, 0, 0))
+    cache.draw(g, surf, CAM, zoom)
+    return pygame.surfarray.array3d(surf)
+
+
+def make_game(w=90, h=70):
+    return SimpleNamespace(MAP_W=w, MAP_H=h, tiles=Grid(w, h, 0))
+
+
+def test_invalidated_chunks_match_a_fresh_render():
+    rng = np.random.default_rng(1)
+    g = make_game()
+    cache = EditorChunkCache()
+    for zoom in ZOOMS:
+        shot(g, cache, zoom)
+    a = g.tiles.array()
+    ys, xs = rng.integers(0, 70, 80), rng.integers(0, 90, 80)
+    a[ys, xs] = rng.integers(1, 3, 80)
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        cache.invalidate(x, y)
+    a[10:30, 5:25] = 2
+    cache.invalidate_area(5, 10, 24, 29)
+    a[40:45, 60:70] = 1
+    cache.invalidate_chunks({(60 // 16, 40 // 16), (69 // 16, 44 // 16)})
+    for zoom in ZOOMS:
+        assert np.array_equal(shot(g, cache, zoom), shot(g, EditorChunkCache(), zoom))
+
+
+def test_replacing_the_grid_resets_the_cache():
+    g = make_game()
+    cache = EditorChunkCache()
+    shot(g, cache, 1.0)
+    g.tiles = Grid(g.MAP_W, g.MAP_H, 1)
+    assert np.array_equal(shot(g, cache, 1.0), shot(g, EditorChunkCache(), 1.0))
+
+
+def test_budget_evicts_least_recently_used_chunks():
+    g = make_game()
+    cache = EditorChunkCache(budget=200_000)
+    for zoom in ZOOMS:
+        shot(g, cache, zoom)
+        assert cache.pixels <= 200_000 or len(cache.chunks) == 1
+    assert cache.pixels == sum(s.get_width() * s.get_height() for s in cache.chunks.values())
+    assert np.array_equal(shot(g, cache, ZOOMS[0]), shot(g, EditorChunkCache(), ZOOMS[0]))
+
+
+def layer_shot(g, layer, cam):
+    surf = pygame.Surface((640, 480))
+    surf.fill((0, 0, 0))
+    layer.draw(g, surf, cam)
+    return pygame.surfarray.array3d(surf)
+
+
+def test_tile_layer_redraws_only_invalidated_tiles():
+    g = make_game()
+    g.breakable_walls = {}
+    a = g.tiles.array()
+    a[::7, ::5] = WALL_NORMAL
+    a[3:6, 3:9] = WALL_BREAKABLE
+    layer = TileLayer()
+    cam = pygame.Vector2(TILE * 2 + 5, TILE + 3)
+    layer_shot(g, layer, cam)
+    # Разрушенная стена и трещины на ломаемой стене
+    g.tiles.set(0, 7, 0)
+    layer.invalidate(0, 7)
+    g.breakable_walls[(4, 4)] = 3
+    layer.invalidate(4, 4)
+    assert np.array_equal(layer_shot(g, layer, cam), layer_shot(g, TileLayer(), cam))
+    # Без invalidate кэш показывает прежний тайл
+    g.tiles.set(5, 7, 0)
+    assert not np.array_equal(layer_shot(g, layer, cam), layer_shot(g, TileLayer(), cam))
+    # Новая сетка сбрасывает кэш целиком
+    g.tiles = g.tiles.copy()
+    assert np.array_equal(layer_shot(g, layer, cam), layer_shot(g, TileLayer(), cam))
+
+
+def test_minimap_follows_fog_and_tile_changes():
+    from tile_cache import MinimapCache
+    import systems
+
+    g = make_game()
+    g.breakable_walls = {}
+    g.tiles.array()[::4, ::3] = WALL_NORMAL
+    g.tiles.array()[20:24, 30:40] = WALL_BREAKABLE
+    g.visited = Grid(g.MAP_W, g.MAP_H, 0)
+    g.shop_rect = pygame.Rect(TILE * 5, TILE * 5, TILE * 6, TILE * 4)
+    g.exit_rect, g.exit_open = None, False
+    g.player = {"pos": pygame.Vector2(TILE * 10, TILE * 10)}
+    g.minimap = MinimapCache()
+
+    def mm_shot(cache):
+        surf = pygame.Surface((640, 480))
+        surf.fill((0, 0, 0))
+        cache.draw(g, surf)
+        return pygame.surfarray.array3d(surf)
+
+    mm_shot(g.minimap)
+    for tx, ty in ((10, 10), (35, 21), (80, 60)):
+        systems.mark_visited_radius(g, tx, ty, r=3)
+        assert np.array_equal(mm_shot(g.minimap), mm_shot(MinimapCache()))
+    # Разрушенная ломаемая стена на уже открытой клетке
+    g.tiles.set(35, 21, 0)
+    g.minimap.invalidate(35, 21)
+    assert np.array_equal(mm_shot(g.minimap), mm_shot(MinimapCache()))
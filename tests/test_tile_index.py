@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import pygame
+
+from config import TILE
+from grid import Grid
+from map_io import apply_map_to_game
+from tile_index import TileIndex
+
+
+def at(tx, ty, **kw):
+    return dict(pos=pygame.Vector2(tx * TILE + TILE / 2, ty * TILE + TILE / 2), **kw)
+
+
+def make_game(w=20, h=20):
+    return SimpleNamespace(MAP_W=w, MAP_H=h, tiles=Grid(w, h, 0), treasures=[], enemies=[],
+                           shop_rect=pygame.Rect(0, 0, 48, 48), exit_rect=None,
+                           spawn_tx=1, spawn_ty=1, player={"pos": pygame.Vector2()},
+                           TARGET_GOLD=0, exit_open=False, breakable_walls={})
+
+
+def test_add_and_lookup():
+    g = make_game()
+    index = TileIndex(g, "treasures")
+    a, b = at(3, 4, type=0), at(3, 4, type=1)
+    index.add(a)
+    index.add(b)
+    assert g.treasures == [a, b]
+    assert index.at(3, 4) == [a, b]
+    assert index.first_at(3, 4) is a
+    assert index.first_at(4, 3) is None
+    assert a in index
+
+
+def test_remove_by_identity():
+    g = make_game()
+    index = TileIndex(g, "treasures")
+    # одинаковые по содержимому словари — удалить нужно именно переданный
+    a, b, c = at(1, 1, type=0), at(1, 1, type=0), at(5, 5, type=2)
+    for obj in (a, b, c):
+        index.add(obj)
+    assert index.remove(a)
+    assert not index.remove(a)
+    assert a not in index
+    assert len(g.treasures) == 2 and all(o is not a for o in g.treasures)
+    assert index.at(1, 1) == [b]
+    assert index.remove_at(1, 1) == [b]
+    assert g.treasures == [c]
+    assert index.at(1, 1) == ()
+
+
+def test_move_between_cells():
+    g = make_game()
+    index = TileIndex(g, "enemies")
+    e = at(2, 2, hp=3)
+    index.add(e)
+    assert index.move(e, pygame.Vector2(7 * TILE + 1, 8 * TILE + 1))
+    assert index.at(2, 2) == ()
+    assert index.first_at(7, 8) is e
+    assert not index.move(at(0, 0), pygame.Vector2())
+
+
+def test_replaced_list_is_reindexed():
+    g = make_game()
+    index = TileIndex(g, "treasures")
+    index.add(at(1, 1, type=0))
+    g.treasures = [at(6, 6, type=0)]
+    assert index.at(1, 1) == ()
+    assert index.first_at(6, 6) is g.treasures[0]
+
+
+def test_open_with_same_object_count_is_reindexed():
+    # Загрузка перезаполняет списки на месте; число объектов то же
+    g = make_game()
+    treasures = TileIndex(g, "treasures")
+    enemies = TileIndex(g, "enemies")
+    treasures.add(at(1, 1, type=0))
+    enemies.add(at(2, 2, hp=3))
+    apply_map_to_game(g, {"tiles": [[0] * 20 for _ in range(20)],
+                          "treasures": [{"tx": 9, "ty": 9, "type": 1}],
+                          "enemies": [{"tx": 4, "ty": 5}]})
+    assert treasures.at(1, 1) == () and enemies.at(2, 2) == ()
+    assert treasures.first_at(9, 9) is g.treasures[0]
+    assert enemies.first_at(4, 5) is g.enemies[0]
+    assert treasures.remove_at(9, 9) and g.treasures == []
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import pytest
+
+import timestep
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    # Шаги симуляции записываются вместо выполнения: (dt, события шага)
+    log = []
+    monkeypatch.setattr(timestep, "snapshot_positions", lambda g: None)
+    monkeypatch.setattr(timestep, "step_simulation", lambda g, dt, events: log.append((dt, list(events))))
+    return log
+
+
+def make_game():
+    return SimpleNamespace(game_over=False, win=False, render_alpha=1.0)
+
+
+def test_steps_are_fixed_and_remainder_drives_alpha(steps):
+    g = make_game()
+    fs = timestep.FixedStep(dt=0.01, max_steps=5)
+    assert fs.advance(g, 0.025, []) == 2
+    assert [dt for dt, _ in steps] == [0.01, 0.01]
+    assert g.render_alpha == pytest.approx(0.5)
+    assert fs.advance(g, 0.005, []) == 1
+    assert g.render_alpha == pytest.approx(0.0, abs=1e-9)
+
+
+def test_long_frame_is_capped_and_lag_dropped(steps):
+    g = make_game()
+    fs = timestep.FixedStep(dt=0.01, max_steps=3)
+    assert fs.advance(g, 1.0, []) == 3
+    assert len(steps) == 3
+    # Отставание отбрасывается целыми шагами, остаток меньше шага
+    assert fs.dropped + fs.acc == pytest.approx(0.97)
+    assert fs.acc < fs.dt and 0.0 <= g.render_alpha < 1.0
+    # Следующий обычный кадр не догоняет отброшенное
+    assert fs.advance(g, 0.01, []) == 1
+
+
+def test_events_wait_for_the_next_step(steps):
+    g = make_game()
+    fs = timestep.FixedStep(dt=0.01, max_steps=5)
+    assert fs.advance(g, 0.004, ["a"]) == 0
+    assert fs.advance(g, 0.004, ["b"]) == 0
+    assert fs.advance(g, 0.004, ["c"]) == 1
+    # Все события кадров без шага достаются первому шагу, и только ему
+    assert fs.advance(g, 0.02, ["d"]) == 2
+    assert [ev for _, ev in steps] == [["a", "b", "c"], ["d"], []]
+
+
+def test_game_over_stops_stepping(steps, monkeypatch):
+    g = make_game()
+
+    def step(g, dt, events):
+        steps.append((dt, list(events)))
+        g.game_over = True
+
+    monkeypatch.setattr(timestep, "step_simulation", step)
+    fs = timestep.FixedStep(dt=0.01, max_steps=5)
+    assert fs.advance(g, 0.045, []) == 1
+    assert fs.acc == 0.0 and g.render_alpha == 0.0
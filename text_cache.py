@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+TEXT_CACHE_SIZE = 512
+
+
+class TextCache:
+    """LRU-кэш отрисованных строк: (шрифт, текст, цвет, сглаживание) -> Surface.
+
+    Неизменившаяся строка растеризуется один раз. Возвращаемые поверхности
+    общие — их можно только блитить, но не менять.
+    """
+
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.entries[key] = surf
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return surf
+
+
+text_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    return text_cache.render(font, text, color, antialias)
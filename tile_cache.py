@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+import pygame
+import numpy as np
+from config import TILE, COL_BG, COL_FLOOR, COL_WALL, COL_BREAKABLE_WALL, WALL_NORMAL, WALL_BREAKABLE, draw_round_rect
+
+# Сторона чанка в тайлах (32 * 24 = 768 px)
+CHUNK_TILES = 32
+# Чанки редактора: сторона в тайлах и общий бюджет кэша по всем зумам, пикселей
+EDITOR_CHUNK_TILES = 16
+EDITOR_CACHE_PIXELS = 16_000_000
+
+
+def draw_tile(surf, g, tx, ty, x, y):
+    # Рисует один тайл карты в точке (x, y) поверхности surf
+    r = pygame.Rect(x, y, TILE, TILE)
+    tile = g.tiles.get(tx, ty)
+    if tile == 0:
+        shade = (tx + ty) % 2
+        col = (COL_FLOOR[0] + shade*3, COL_FLOOR[1] + shade*3, COL_FLOOR[2] + shade*3)
+        pygame.draw.rect(surf, col, r)
+    elif tile == WALL_NORMAL:
+        pygame.draw.rect(surf, COL_WALL, r)
+        pygame.draw.line(surf, (COL_WALL[0]+10, COL_WALL[1]+10, COL_WALL[2]+10), (r.left, r.top), (r.right, r.top), 2)
+    elif tile == WALL_BREAKABLE:
+        # Ломаемые стены - коричневые с трещинами
+        pygame.draw.rect(surf, COL_BREAKABLE_WALL, r)
+        # Показываем трещины в зависимости от здоровья
+        wall_hp = g.breakable_walls.get((tx, ty), 15)
+        if wall_hp < 15:
+            crack_color = (60, 40, 20)
+            if wall_hp < 10:
+                pygame.draw.line(surf, crack_color, (r.left + 4, r.top + 4), (r.right - 4, r.bottom - 4), 2)
+            if wall_hp < 5:
+                pygame.draw.line(surf, crack_color, (r.left + 4, r.bottom - 4), (r.right - 4, r.top + 4), 2)
+
+
+class TileLayer:
+    """Пререндер пола и стен по чанкам.
+
+    Чанк рисуется целиком один раз при первом появлении в кадре; после этого
+    перерисовываются только тайлы, переданные в invalidate() (разрушенная
+    стена, новая трещина). Замена g.tiles целиком сбрасывает кэш.
+    """
+
+    def __init__(self):
+        self.tiles = None
+        self.size = (0, 0)
+        self.chunks = {}   # (cx, cy) -> Surface
+        self.dirty = set()
+
+    def reset(self):
+        self.tiles = None
+        self.chunks.clear()
+        self.dirty.clear()
+
+    def invalidate(self, tx, ty):
+        self.dirty.add((tx, ty))
+
+    def _sync(self, g):
+        if self.tiles is not g.tiles or self.size != (g.MAP_W, g.MAP_H):
+            self.reset()
+            self.tiles = g.tiles
+            self.size = (g.MAP_W, g.MAP_H)
+            return
+        for tx, ty in self.dirty:
+            surf = self.chunks.get((tx // CHUNK_TILES, ty // CHUNK_TILES))
+            if surf is not None and 0 <= tx < g.MAP_W and 0 <= ty < g.MAP_H:
+                draw_tile(surf, g, tx, ty, (tx % CHUNK_TILES) * TILE, (ty % CHUNK_TILES) * TILE)
+        self.dirty.clear()
+
+    def _build_chunk(self, g, cx, cy):
+        x0, y0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        x1, y1 = min(g.MAP_W, x0 + CHUNK_TILES), min(g.MAP_H, y0 + CHUNK_TILES)
+        surf = pygame.Surface(((x1 - x0) * TILE, (y1 - y0) * TILE))
+        for ty in range(y0, y1):
+            for tx in range(x0, x1):
+                draw_tile(surf, g, tx, ty, (tx - x0) * TILE, (ty - y0) * TILE)
+        self.chunks[(cx, cy)] = surf
+        return surf
+
+    def draw(self, g, surf, cam):
+        self._sync(g)
+        W, H = surf.get_size()
+        span = CHUNK_TILES * TILE
+        cx0 = max(0, int(cam.x // span))
+        cy0 = max(0, int(cam.y // span))
+        cx1 = min((g.MAP_W - 1) // CHUNK_TILES, int((cam.x + W) // span))
+        cy1 = min((g.MAP_H - 1) // CHUNK_TILES, int((cam.y + H) // span))
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is None:
+                    chunk = self._build_chunk(g, cx, cy)
+                surf.blit(chunk, (int(cx * span - cam.x), int(cy * span - cam.y)))
+
+
+class MinimapCache:
+    """Постоянная поверхность миникарты.
+
+    Клетки дорисовываются только когда становятся посещёнными
+    (mark_visited_radius) или меняют тип (разрушение стены). Игрок, магазин
+    и выход рисуются поверх готовой панели каждый кадр.
+    """
+
+    MAX_W, MAX_H = 280, 220
+
+    def __init__(self):
+        self.tiles = None
+        self.visited = None
+        self.size = (0, 0)
+        self.scale = 1.0
+        self.mm = None
+        self.bg = None
+        self.panel = None
+        self.dirty = set()
+        self.stale = True
+
+    def invalidate(self, tx, ty):
+        self.dirty.add((tx, ty))
+
+    def _paint(self, g, tx, ty):
+        if not g.visited.get(tx, ty):
+            return
+        scale = self.scale
+        r = pygame.Rect(int(tx * scale), int(ty * scale), max(1, int(scale)), max(1, int(scale)))
+        tile = g.tiles.get(tx, ty)
+        if tile == 0:
+            self.mm.fill((90, 95, 110, 200), r)
+        elif tile == WALL_NORMAL:
+            self.mm.fill((50, 55, 70, 220), r)
+        elif tile == WALL_BREAKABLE:
+            # Ломаемые стены на мини-карте
+            wall_hp = g.breakable_walls.get((tx, ty), 15)
+            if wall_hp > 0:
+                self.mm.fill((120, 80, 60, 220), r)  # Коричневый для ломаемых стен
+            else:
+                self.mm.fill((90, 95, 110, 200), r)  # Пол после разрушения
+
+    def _rebuild(self, g):
+        self.tiles, self.visited = g.tiles, g.visited
+        self.size = (g.MAP_W, g.MAP_H)
+        self.scale = min(self.MAX_W / g.MAP_W, self.MAX_H / g.MAP_H)
+        mm_w = int(g.MAP_W * self.scale)
+        mm_h = int(g.MAP_H * self.scale)
+        self.bg = pygame.Surface((mm_w + 16, mm_h + 16), pygame.SRCALPHA)
+        draw_round_rect(self.bg, self.bg.get_rect(), (0, 0, 0, 160), radius=10, border=2, border_color=(90, 140, 200))
+        self.mm = pygame.Surface((mm_w, mm_h), pygame.SRCALPHA)
+        ys, xs = np.nonzero(g.visited.array())
+        for tx, ty in zip(xs.tolist(), ys.tolist()):
+            self._paint(g, tx, ty)
+        self.dirty.clear()
+        self.stale = True
+
+    def _sync(self, g):
+        if self.tiles is not g.tiles or self.visited is not g.visited or self.size != (g.MAP_W, g.MAP_H):
+            self._rebuild(g)
+        elif self.dirty:
+            for tx, ty in self.dirty:
+                if 0 <= tx < g.MAP_W and 0 <= ty < g.MAP_H:
+                    self._paint(g, tx, ty)
+            self.dirty.clear()
+            self.stale = True
+        if self.stale:
+            self.panel = self.bg.copy()
+            self.panel.blit(self.mm, (8, 8))
+            self.stale = False
+
+    def draw(self, g, surf):
+        self._sync(g)
+        scale = self.scale
+        x0 = surf.get_width() - self.panel.get_width() - 16
+        y0 = 16
+        surf.blit(self.panel, (x0, y0))
+        ox, oy = x0 + 8, y0 + 8
+
+        # Магазин
+        stx, sty = g.shop_rect.x // TILE, g.shop_rect.y // TILE
+        if 0 <= stx < g.MAP_W and 0 <= sty < g.MAP_H and g.visited.get(stx, sty):
+            pygame.draw.rect(surf, (120, 180, 255), pygame.Rect(ox + int(stx*scale), oy + int(sty*scale), int(2*scale), int(2*scale)))
+
+        # Выход
+        if g.exit_rect:
+            etx, ety = g.exit_rect.x // TILE, g.exit_rect.y // TILE
+            if 0 <= etx < g.MAP_W and 0 <= ety < g.MAP_H and g.visited.get(etx, ety):
+                col = (120, 255, 160) if g.exit_open else (200, 60, 60)
+                pygame.draw.rect(surf, col, pygame.Rect(ox + int(etx*scale), oy + int(ety*scale), int(2*scale), int(2*scale)))
+
+        # Игрок
+        ptx, pty = int(g.player["pos"].x // TILE), int(g.player["pos"].y // TILE)
+        px = int(ptx * scale); py = int(pty * scale)
+        pygame.draw.rect(surf, (255, 255, 255), pygame.Rect(ox + px, oy + py, max(2, int(scale)), max(2, int(scale))))
+
+
+class EditorChunkCache:
+    """Чанки сетки тайлов редактора, отрисованные под конкретный зум.
+
+    Ключ чанка — (зум, cx, cy), поэтому при возврате к прежнему зуму
+    готовые чанки используются снова. Тайл, изменённый в paint_at,
+    перерисовывается во всех закэшированных зумах при следующей отрисовке;
+    давно не показанные чанки вытесняются, когда их суммарная площадь
+    превышает бюджет.
+    """
+
+    def __init__(self, budget=EDITOR_CACHE_PIXELS):
+        self.budget = budget
+        self.tiles = None
+        self.size = (0, 0)
+        self.chunks = OrderedDict()   # (zoom, cx, cy) -> Surface
+        self.zooms = set()
+        self.pixels = 0
+        self.dirty = set()
+
+    def reset(self):
+        self.tiles = None
+        self.chunks.clear()
+        self.zooms.clear()
+        self.pixels = 0
+        self.dirty.clear()
+
+    def invalidate(self, tx, ty):
+        self.dirty.add((tx, ty))
+
+    def invalidate_area(self, x0, y0, x1, y1):
+        # Прямоугольник тайлов [x0, x1] x [y0, y1]: задетые чанки строятся заново
+        n = EDITOR_CHUNK_TILES
+        self.invalidate_chunks({(cx, cy) for cx in range(x0 // n, x1 // n + 1) for cy in range(y0 // n, y1 // n + 1)})
+
+    def invalidate_chunks(self, cells):
+        # cells — множество (cx, cy); чанки выбрасываются во всех зумах
+        for key in [k for k in self.chunks if (k[1], k[2]) in cells]:
+            surf = self.chunks.pop(key)
+            self.pixels -= surf.get_width() * surf.get_height()
+
+    @staticmethod
+    def _paint(surf, g, zoom, tx, ty, lx, ly):
+        size = int(TILE * zoom)
+        r = pygame.Rect(int(lx * TILE * zoom), int(ly * TILE * zoom), size, size)
+        tile = g.tiles.get(tx, ty)
+        if tile == WALL_NORMAL:
+            col = COL_WALL
+        elif tile == WALL_BREAKABLE:
+            col = COL_BREAKABLE_WALL
+        else:
+            col = COL_FLOOR
+        pygame.draw.rect(surf, col, r)
+        pygame.draw.rect(surf, (30,30,35), r, 1)
+
+    def _sync(self, g):
+        if self.tiles is not g.tiles or self.size != (g.MAP_W, g.MAP_H):
+            self.reset()
+            self.tiles = g.tiles
+            self.size = (g.MAP_W, g.MAP_H)
+            return
+        n = EDITOR_CHUNK_TILES
+        for tx, ty in self.dirty:
+            if not (0 <= tx < g.MAP_W and 0 <= ty < g.MAP_H):
+                continue
+            for zoom in self.zooms:
+                surf = self.chunks.get((zoom, tx // n, ty // n))
+                if surf is not None:
+                    self._paint(surf, g, zoom, tx, ty, tx % n, ty % n)
+        self.dirty.clear()
+
+    def _build(self, g, zoom, cx, cy):
+        n = EDITOR_CHUNK_TILES
+        x0, y0 = cx * n, cy * n
+        x1, y1 = min(g.MAP_W, x0 + n), min(g.MAP_H, y0 + n)
+        surf = pygame.Surface((int((x1 - x0) * TILE * zoom) + 1, int((y1 - y0) * TILE * zoom) + 1))
+        surf.fill(COL_BG)
+        for ty in range(y0, y1):
+            for tx in range(x0, x1):
+                self._paint(surf, g, zoom, tx, ty, tx - x0, ty - y0)
+        self.chunks[(zoom, cx, cy)] = surf
+        self.zooms.add(zoom)
+        self.pixels += surf.get_width() * surf.get_height()
+        while self.pixels > self.budget and len(self.chunks) > 1:
+            _, old = self.chunks.popitem(last=False)
+            self.pixels -= old.get_width() * old.get_height()
+        return surf
+
+    def draw(self, g, surf, cam, zoom):
+        self._sync(g)
+        W, H = surf.get_size()
+        span = EDITOR_CHUNK_TILES * TILE
+        cx0 = max(0, int(cam.x // span))
+        cy0 = max(0, int(cam.y // span))
+        cx1 = min((g.MAP_W - 1) // EDITOR_CHUNK_TILES, int((cam.x + W / zoom) // span))
+        cy1 = min((g.MAP_H - 1) // EDITOR_CHUNK_TILES, int((cam.y + H / zoom) // span))
+        batch = []
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                key = (zoom, cx, cy)
+                chunk = self.chunks.get(key)
+                if chunk is None:
+                    chunk = self._build(g, zoom, cx, cy)
+                else:
+                    self.chunks.move_to_end(key)
+                batch.append((chunk, (int((cx * span - cam.x) * zoom), int((cy * span - cam.y) * zoom))))
+        surf.blits(batch, doreturn=False)
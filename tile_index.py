@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from config import TILE
+
+
+def tile_of(obj):
+    return int(obj["pos"].x // TILE), int(obj["pos"].y // TILE)
+
+
+class TileIndex:
+    """Индекс «клетка -> объекты» для списка g.<attr> (сокровища, враги редактора).
+
+    Все изменения списка идут через add/remove/move: удаление переставляет
+    последний элемент на место удалённого, поэтому поиск по клетке, проверка
+    занятости и удаление стоят O(1) при любом числе объектов. Если подменили
+    сам список или карту (загрузка перезаполняет списки на месте, но всегда
+    создаёт новую сетку g.tiles), индекс перестраивается при следующем
+    обращении.
+    """
+
+    def __init__(self, g, attr):
+        self.g = g
+        self.attr = attr
+        self.items = None
+        self.tiles = None
+        self.cells = {}  # (tx, ty) -> [obj, ...]
+        self.slot = {}   # id(obj) -> позиция в списке
+
+    def _sync(self):
+        items = getattr(self.g, self.attr)
+        if (items is not self.items or self.tiles is not self.g.tiles
+                or len(items) != len(self.slot)):
+            self.rebuild(items)
+        return items
+
+    def rebuild(self, items):
+        self.items = items
+        self.tiles = self.g.tiles
+        self.cells = {}
+        self.slot = {}
+        for i, obj in enumerate(items):
+            self.slot[id(obj)] = i
+            self.cells.setdefault(tile_of(obj), []).append(obj)
+
+    def __contains__(self, obj):
+        self._sync()
+        return id(obj) in self.slot
+
+    def at(self, tx, ty):
+        self._sync()
+        return self.cells.get((tx, ty), ())
+
+    def first_at(self, tx, ty):
+        objs = self.at(tx, ty)
+        return objs[0] if objs else None
+
+    def add(self, obj):
+        items = self._sync()
+        self.slot[id(obj)] = len(items)
+        items.append(obj)
+        self.cells.setdefault(tile_of(obj), []).append(obj)
+
+    def _unlink(self, obj):
+        key = tile_of(obj)
+        bucket = self.cells[key]
+        # по идентичности: словари с одинаковыми полями равны между собой
+        del bucket[next(i for i, o in enumerate(bucket) if o is obj)]
+        if not bucket:
+            del self.cells[key]
+
+    def remove(self, obj):
+        items = self._sync()
+        i = self.slot.pop(id(obj), None)
+        if i is None:
+            return False
+        self._unlink(obj)
+        last = items.pop()
+        if last is not obj:
+            items[i] = last
+            self.slot[id(last)] = i
+        return True
+
+    def remove_at(self, tx, ty):
+        # Возвращает удалённые объекты (пустой список — в клетке ничего не было)
+        objs = list(self.at(tx, ty))
+        for obj in objs:
+            self.remove(obj)
+        return objs
+
+    def move(self, obj, pos):
+        # Перемещение объекта в новую точку (Vector2) с переносом между клетками
+        self._sync()
+        if id(obj) not in self.slot:
+            return False
+        self._unlink(obj)
+        obj["pos"] = pos
+        self.cells.setdefault(tile_of(obj), []).append(obj)
+        return True
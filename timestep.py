@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from config import SIM_DT, MAX_SIM_STEPS
+from systems import step_simulation, snapshot_positions
+
+
+class FixedStep:
+    """Аккумулятор фиксированного шага для ветки STATE_PLAY.
+
+    Реальное время кадра копится и расходуется шагами ровно по dt, но не
+    больше max_steps за кадр: после долгой паузы (загрузка, перетаскивание
+    окна) отставание отбрасывается, а не догоняется. События копятся до
+    ближайшего шага, поэтому на частых дисплеях кадры без шага их не теряют.
+    Остаток аккумулятора задаёт g.render_alpha — долю пути между двумя
+    последними состояниями для отрисовки.
+    """
+
+    def __init__(self, dt=SIM_DT, max_steps=MAX_SIM_STEPS):
+        self.dt = dt
+        self.max_steps = max_steps
+        self.acc = 0.0
+        self.pending = []
+        self.dropped = 0.0   # отброшенное время симуляции, с
+
+    def reset(self):
+        self.acc = 0.0
+        self.pending = []
+
+    def advance(self, g, frame_dt, events):
+        self.pending.extend(events)
+        self.acc += frame_dt
+        steps = 0
+        while self.acc >= self.dt:
+            if steps == self.max_steps:
+                rest = self.acc % self.dt
+                self.dropped += self.acc - rest
+                self.acc = rest
+                break
+            snapshot_positions(g)
+            step_simulation(g, self.dt, self.pending)
+            self.pending = []
+            self.acc -= self.dt
+            steps += 1
+            if g.game_over or g.win:
+                self.acc = 0.0
+                break
+        g.render_alpha = self.acc / self.dt
+        return steps